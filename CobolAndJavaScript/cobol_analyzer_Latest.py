@@ -17,6 +17,7 @@ import json
 import csv
 from pathlib import Path
 from collections import defaultdict, Counter
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
 # Optional dependencies for Excel export
@@ -28,11 +29,84 @@ try:
 except ImportError:
     EXCEL_AVAILABLE = False
 
+# JCL DD parameters, matched in one pass over a DD statement. Only "KEY=" is
+# consumed; the lookaheads capture the value both as "(...)" and as a bare run
+# up to the next comma or space, so a value containing another key is still
+# scanned. No key ends with another, so the keys found cannot overlap.
+_DD_PARAMETER = re.compile(
+    r'(?P<key>DSN|DISP|VOLUME|VOL|UNIT|SPACE|DCB|SYSOUT)='
+    r'(?=(?:\((?P<paren>[^)]+)\))?)'
+    r'(?=(?P<bare>[^,\s]+)?)'
+)
+
+# Dataset fields taken from the first DD parameter with a value in the given
+# form, trying each (key, form) in turn. The DSN='...', DSN="...", DSN=(...),
+# VOL=(...) and UNIT=(...) alternatives of the old per-field searches are left
+# out: they only applied when the bare form had already matched.
+_DD_FIELDS = {
+    'dataset_name': [('DSN', 'bare')],
+    'volume': [('VOL', 'bare'), ('VOLUME', 'bare')],
+    'unit': [('UNIT', 'bare')],
+    'space': [('SPACE', 'paren')],
+    'dcb': [('DCB', 'paren')]
+}
+
+_PROC_PARAMETER = re.compile(r'PROC=([^,\s]+)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+class IoPatternTable:
+    """Precompiled COBOL I/O patterns.
+
+    Each pattern is compiled twice: case-insensitive, as before, and
+    case-sensitive. IGNORECASE stops the regex engine from skipping ahead to
+    a pattern's leading verb, which makes a scan about ten times slower, so
+    ASCII source that is already upper case is scanned with the
+    case-sensitive set. For upper-case patterns the matches are identical.
+    Other source, or patterns with lower-case letters, use IGNORECASE.
+    """
+
+    def __init__(self, io_patterns):
+        self.patterns = []
+        self.upper_case = True
+        for operations, operation in (('input_operations', 'INPUT'), ('output_operations', 'OUTPUT')):
+            for pattern in io_patterns[operations]:
+                self.patterns.append((re.compile(pattern), re.compile(pattern, re.IGNORECASE), operation))
+                # Escapes such as \s and \w are not letters to match
+                if re.search(r'[a-z]', re.sub(r'\\.', '', pattern)):
+                    self.upper_case = False
+
+    def findall(self, content):
+        """(file name, 'INPUT' or 'OUTPUT') pairs: each pattern's matches in order, input patterns first."""
+        case_sensitive = self.upper_case and content.isascii() and content == content.upper()
+        return [
+            (match, operation)
+            for exact, ignore_case, operation in self.patterns
+            for match in (exact if case_sensitive else ignore_case).findall(content)
+        ]
+
+
+# Analyzer used by each scan worker process, built once by the pool initializer
+_worker_analyzer = None
+
+
+def _init_scan_worker(root_directory, file_patterns, io_patterns):
+    global _worker_analyzer
+    _worker_analyzer = CobolFileAnalyzer(root_directory, workers=1)
+    _worker_analyzer.file_patterns = file_patterns
+    _worker_analyzer.io_patterns = io_patterns
+
+
+def _scan_in_worker(task):
+    file_path, folder_path = task
+    return _worker_analyzer._scan_file(Path(file_path), folder_path)
+
 
 class CobolFileAnalyzer:
-    def __init__(self, root_directory=None):
-        """Initialize the analyzer with a root directory to scan."""
+    def __init__(self, root_directory=None, workers=None):
+        """Initialize the analyzer with a root directory to scan and the number of scan processes."""
         self.root_directory = Path(root_directory) if root_directory else Path('.')
+        self.workers = max(1, workers or os.cpu_count() or 1)
         
         # File extension patterns for different file types
         self.file_patterns = {
@@ -77,6 +151,11 @@ class CobolFileAnalyzer:
                 r'SELECT\s+(\w+)\s+ASSIGN\s+TO\s+.*OUTPUT'
             ]
         }
+        # Compiled from io_patterns on first use
+        self._io_table = None
+        # Last file whose relative path was computed, see _relative_path
+        self._relative_path_for = None
+        self._relative_path_text = ''
         
         self.results = {
             'scan_timestamp': datetime.now().isoformat(),
@@ -94,13 +173,19 @@ class CobolFileAnalyzer:
         }
 
     def scan_directory(self):
-        """Recursively scan the directory structure and analyze files."""
+        """Recursively scan the directory structure and analyze files.
+
+        Each file is read once and analyzed on its own, spread over `workers`
+        processes. Results are merged in directory-walk order, so the report
+        is the same whichever worker finishes first.
+        """
         print(f"Starting analysis of directory: {self.root_directory}")
         
         if not self.root_directory.exists():
             print(f"Directory {self.root_directory} does not exist!")
             return
             
+        tasks = []
         for root, dirs, files in os.walk(self.root_directory):
             root_path = Path(root)
             relative_path = root_path.relative_to(self.root_directory)
@@ -108,74 +193,123 @@ class CobolFileAnalyzer:
             print(f"Scanning folder: {relative_path}")
             
             for file in files:
-                file_path = root_path / file
-                self._analyze_file(file_path, relative_path)
+                tasks.append((str(root_path / file), str(relative_path)))
+        
+        if self.workers > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_scan_worker,
+                initargs=(str(self.root_directory), self.file_patterns, self.io_patterns)
+            ) as pool:
+                # map() yields in submission order; batches keep inter-process overhead low
+                chunksize = max(1, min(256, len(tasks) // (self.workers * 4)))
+                for file_result in pool.map(_scan_in_worker, tasks, chunksize=chunksize):
+                    self._merge_file_result(file_result)
+        else:
+            for file_path, folder_path in tasks:
+                self._merge_file_result(self._scan_file(Path(file_path), folder_path))
         
         self._finalize_analysis()
 
-    def _should_exclude_file(self, file_path):
-        """Check if file should be excluded from analysis based on content."""
+    def _read_file(self, file_path):
+        """Read a file once for every analysis step; unreadable files are analyzed as empty."""
         try:
             with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read().upper()
-                
-                # Check for exclusion patterns
-                if 'THIS JOB IS ALREADY ON LINUX' in content:
-                    return True
-                    
-                return False
-                
+                return f.read()
         except Exception as e:
-            print(f"Error checking exclusion for file {file_path}: {e}")
-            return False
+            print(f"Error reading file {file_path}: {e}")
+            return ''
+
+    def _should_exclude_file(self, upper_content):
+        """Check if file should be excluded from analysis based on its upper-cased content."""
+        return 'THIS JOB IS ALREADY ON LINUX' in upper_content
 
-    def _analyze_file(self, file_path, folder_path):
-        """Analyze a single file and categorize it."""
+    def _scan_file(self, file_path, folder_path):
+        """Analyze a single file from one read, without touching self.results.
+
+        Returns what _merge_file_result adds to the results, so it can run in
+        a worker process.
+        """
         file_extension = file_path.suffix.lower()
-        file_name = file_path.name
+        file_result = {
+            'name': file_path.name,
+            'folder': folder_path,
+            'category': 'other_files',
+            'excluded': False,
+            'file_info': None,
+            'io_references': [],
+            'jcl_datasets': []
+        }
         
         # Categorize file by extension
         for category, config in self.file_patterns.items():
             if file_extension in config['extensions']:
-                # Check if file should be excluded
-                if self._should_exclude_file(file_path):
-                    # Track excluded files but don't count them
-                    self.results['excluded_counts'][category] += 1
-                    print(f"   Excluding {file_name} - contains 'THIS JOB IS ALREADY ON LINUX'")
-                    return
-                
-                # Count lines of code
-                line_count = self._count_lines_of_code(file_path)
-                
-                self.results['file_counts'][category] += 1
-                self.results['folder_analysis'][str(folder_path)][category] += 1
-                
-                file_info = {
-                    'name': file_name,
-                    'path': str(file_path.relative_to(self.root_directory)),
-                    'size': file_path.stat().st_size if file_path.exists() else 0,
-                    'lines_of_code': line_count['total_lines'],
-                    'non_empty_lines': line_count['non_empty_lines'],
-                    'comment_lines': line_count['comment_lines'],
-                    'code_lines': line_count['code_lines']
-                }
-                
-                self.results['detailed_files'][category].append(file_info)
-                
-                # If it's a COBOL program, analyze I/O operations
-                if category == 'cobol_programs':
-                    self._analyze_cobol_io(file_path)
-                # If it's a JCL file or procedure, extract dataset information
-                elif category in ['jcl_files', 'procedures']:
-                    self._analyze_jcl_datasets(file_path)
-                
                 break
         else:
             # File doesn't match known patterns
-            self.results['file_counts']['other_files'] += 1
-            self.results['folder_analysis'][str(folder_path)]['other_files'] += 1
+            return file_result
+        
+        file_result['category'] = category
+        content = self._read_file(file_path)
+        upper_content = content.upper()  # COBOL and JCL are case-insensitive
+        
+        # Check if file should be excluded
+        if self._should_exclude_file(upper_content):
+            file_result['excluded'] = True
+            return file_result
+        
+        # Count lines of code
+        line_count = self._count_lines_of_code(file_path, content)
+        
+        file_result['file_info'] = {
+            'name': file_path.name,
+            'path': str(file_path.relative_to(self.root_directory)),
+            'size': file_path.stat().st_size if file_path.exists() else 0,
+            'lines_of_code': line_count['total_lines'],
+            'non_empty_lines': line_count['non_empty_lines'],
+            'comment_lines': line_count['comment_lines'],
+            'code_lines': line_count['code_lines']
+        }
+        
+        # If it's a COBOL program, analyze I/O operations
+        if category == 'cobol_programs':
+            file_result['io_references'] = self._analyze_cobol_io(file_path, upper_content)
+        # If it's a JCL file or procedure, extract dataset information
+        elif category in ['jcl_files', 'procedures']:
+            file_result['jcl_datasets'] = self._analyze_jcl_datasets(file_path, content)
+        
+        return file_result
+
+    def _merge_file_result(self, file_result):
+        """Add one file's analysis from _scan_file to the results."""
+        category = file_result['category']
+        
+        if file_result['excluded']:
+            # Track excluded files but don't count them
+            self.results['excluded_counts'][category] += 1
+            print(f"   Excluding {file_result['name']} - contains 'THIS JOB IS ALREADY ON LINUX'")
+            return
+        
+        self.results['file_counts'][category] += 1
+        self.results['folder_analysis'][file_result['folder']][category] += 1
+        
+        file_info = file_result['file_info']
+        if file_info is None:
+            return
+        
+        self.results['detailed_files'][category].append(file_info)
+        
+        for match, operation in file_result['io_references']:
+            io_files = 'input_files' if operation == 'INPUT' else 'output_files'
+            self.results['io_analysis'][io_files].add(match)
+            self.results['io_analysis']['file_references'][match].append({
+                'file': file_info['path'],
+                'operation': operation
+            })
+        
+        self.results['jcl_datasets'].extend(file_result['jcl_datasets'])
 
-    def _count_lines_of_code(self, file_path):
+    def _count_lines_of_code(self, file_path, content):
         """Count lines of code in a file, distinguishing between comments, empty lines, and code."""
         line_stats = {
             'total_lines': 0,
@@ -184,171 +318,163 @@ class CobolFileAnalyzer:
             'code_lines': 0
         }
         
-        try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                for line in f:
-                    line_stats['total_lines'] += 1
-                    stripped_line = line.strip()
-                    
-                    if not stripped_line:
-                        # Empty line
-                        continue
-                    
-                    line_stats['non_empty_lines'] += 1
-                    
-                    # Check for comment lines based on file type
-                    file_extension = file_path.suffix.lower()
-                    is_comment = False
-                    
-                    if file_extension in ['.cbl', '.cob', '.cobol', '.pgm', '.cpy', '.copy', '.inc', '.prc']:
-                        # COBOL comments: * in column 7 or entire line starting with *
-                        if (len(stripped_line) > 0 and stripped_line[0] == '*') or \
-                           (len(line) > 6 and line[6] == '*'):
-                            is_comment = True
-                        # COBOL also uses // for comments in some dialects
-                        elif stripped_line.startswith('//'):
-                            is_comment = True
-                    elif file_extension in ['.jcl', '.job', '.proc']:
-                        # JCL comments: //* or lines starting with //
-                        if stripped_line.startswith('//*'):
-                            is_comment = True
-                    elif file_extension in ['.ctc', '.ctl', '.card', '.cc', '.ctrl']:
-                        # Control card comments: * at beginning, # for some systems, or //
-                        if stripped_line.startswith('*') or stripped_line.startswith('#') or \
-                           stripped_line.startswith('//') or stripped_line.startswith('//*'):
-                            is_comment = True
-                    
-                    if is_comment:
-                        line_stats['comment_lines'] += 1
-                    else:
-                        line_stats['code_lines'] += 1
-                        
-        except Exception as e:
-            print(f"Error counting lines in file {file_path}: {e}")
+        # Same lines as iterating the file: text mode has already translated line endings
+        lines = content.split('\n')
+        if lines[-1] == '':
+            lines.pop()
+        
+        # Check for comment lines based on file type
+        file_extension = file_path.suffix.lower()
+        
+        for line in lines:
+            line_stats['total_lines'] += 1
+            stripped_line = line.strip()
+            
+            if not stripped_line:
+                # Empty line
+                continue
+            
+            line_stats['non_empty_lines'] += 1
+            
+            is_comment = False
+            
+            if file_extension in ['.cbl', '.cob', '.cobol', '.pgm', '.cpy', '.copy', '.inc', '.prc']:
+                # COBOL comments: * in column 7 or entire line starting with *
+                if (len(stripped_line) > 0 and stripped_line[0] == '*') or \
+                   (len(line) > 6 and line[6] == '*'):
+                    is_comment = True
+                # COBOL also uses // for comments in some dialects
+                elif stripped_line.startswith('//'):
+                    is_comment = True
+            elif file_extension in ['.jcl', '.job', '.proc']:
+                # JCL comments: //* or lines starting with //
+                if stripped_line.startswith('//*'):
+                    is_comment = True
+            elif file_extension in ['.ctc', '.ctl', '.card', '.cc', '.ctrl']:
+                # Control card comments: * at beginning, # for some systems, or //
+                if stripped_line.startswith('*') or stripped_line.startswith('#') or \
+                   stripped_line.startswith('//') or stripped_line.startswith('//*'):
+                    is_comment = True
+            
+            if is_comment:
+                line_stats['comment_lines'] += 1
+            else:
+                line_stats['code_lines'] += 1
         
         return line_stats
 
-    def _analyze_cobol_io(self, file_path):
-        """Analyze COBOL file for input/output operations."""
+    def _analyze_cobol_io(self, file_path, content):
+        """Analyze upper-cased COBOL source for input/output operations.
+
+        Returns (file name, 'INPUT' or 'OUTPUT') pairs in the order found.
+        """
+        references = []
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read().upper()  # COBOL is case-insensitive
-                
-                # Find input operations
-                for pattern in self.io_patterns['input_operations']:
-                    matches = re.findall(pattern, content, re.IGNORECASE)
-                    for match in matches:
-                        self.results['io_analysis']['input_files'].add(match)
-                        self.results['io_analysis']['file_references'][match].append({
-                            'file': str(file_path.relative_to(self.root_directory)),
-                            'operation': 'INPUT'
-                        })
-                
-                # Find output operations
-                for pattern in self.io_patterns['output_operations']:
-                    matches = re.findall(pattern, content, re.IGNORECASE)
-                    for match in matches:
-                        self.results['io_analysis']['output_files'].add(match)
-                        self.results['io_analysis']['file_references'][match].append({
-                            'file': str(file_path.relative_to(self.root_directory)),
-                            'operation': 'OUTPUT'
-                        })
-                        
+            if self._io_table is None:
+                self._io_table = IoPatternTable(self.io_patterns)
+            references = self._io_table.findall(content)
         except Exception as e:
             print(f"Error analyzing COBOL file {file_path}: {e}")
+        
+        return references
+
+    def _analyze_jcl_datasets(self, file_path, content):
+        """Analyze JCL/PROC source to extract dataset names and DISP parameters.
 
-    def _analyze_jcl_datasets(self, file_path):
-        """Analyze JCL/PROC file to extract dataset names and DISP parameters."""
+        Returns the dataset entries in statement order.
+        """
+        datasets = []
         try:
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                lines = f.readlines()
+            lines = content.split('\n')
+            
+            current_job = None
+            current_step = None
+            current_proc = None
+            line_number = 0
+            current_dd_statement = ""
+            current_dd_line_start = 0
+            
+            for line in lines:
+                line_number += 1
+                stripped_line = line.strip()
                 
-                current_job = None
-                current_step = None
-                current_proc = None
-                line_number = 0
-                current_dd_statement = ""
-                current_dd_line_start = 0
+                # Skip empty lines and comments
+                if not stripped_line or stripped_line.startswith('//*'):
+                    continue
                 
-                for line in lines:
-                    line_number += 1
-                    stripped_line = line.strip()
-                    
-                    # Skip empty lines and comments
-                    if not stripped_line or stripped_line.startswith('//*'):
-                        continue
+                # Extract job name
+                if stripped_line.startswith('//') and ' JOB ' in stripped_line:
+                    current_job = stripped_line.split()[0][2:]  # Remove '//' prefix
+                    continue
+                
+                # Extract step name
+                if stripped_line.startswith('//') and ' EXEC ' in stripped_line:
+                    current_step = stripped_line.split()[0][2:]  # Remove '//' prefix
+                    # Check if it's calling a PROC
+                    if 'PROC=' in stripped_line.upper():
+                        proc_match = _PROC_PARAMETER.search(stripped_line.upper())
+                        if proc_match:
+                            current_proc = proc_match.group(1)
+                    continue
+                
+                # Extract PROC name
+                if stripped_line.startswith('//') and ' PROC ' in stripped_line:
+                    current_proc = stripped_line.split()[0][2:]  # Remove '//' prefix
+                    continue
+                
+                # Handle DD statements (including multi-line)
+                if stripped_line.startswith('//') and ' DD ' in stripped_line:
+                    # Process any previous DD statement
+                    if current_dd_statement:
+                        self._process_complete_dd_statement(
+                            current_dd_statement, file_path, current_dd_line_start, 
+                            current_job, current_step, current_proc, datasets
+                        )
                     
-                    # Extract job name
-                    if stripped_line.startswith('//') and ' JOB ' in stripped_line:
-                        current_job = stripped_line.split()[0][2:]  # Remove '//' prefix
-                        continue
+                    # Start new DD statement
+                    current_dd_statement = stripped_line
+                    current_dd_line_start = line_number
                     
-                    # Extract step name
-                    if stripped_line.startswith('//') and ' EXEC ' in stripped_line:
-                        current_step = stripped_line.split()[0][2:]  # Remove '//' prefix
-                        # Check if it's calling a PROC
-                        if 'PROC=' in stripped_line.upper():
-                            proc_match = re.search(r'PROC=([^,\s]+)', stripped_line.upper())
-                            if proc_match:
-                                current_proc = proc_match.group(1)
-                        continue
+                    # Check if this line ends with continuation
+                    if not stripped_line.rstrip().endswith(','):
+                        # Complete DD statement on single line
+                        self._process_complete_dd_statement(
+                            current_dd_statement, file_path, current_dd_line_start,
+                            current_job, current_step, current_proc, datasets
+                        )
+                        current_dd_statement = ""
+                
+                # Handle continuation lines
+                elif (current_dd_statement and 
+                      stripped_line.startswith('//') and 
+                      len(stripped_line) > 2 and 
+                      not ' ' in stripped_line[2:15]):  # Continuation format
                     
-                    # Extract PROC name
-                    if stripped_line.startswith('//') and ' PROC ' in stripped_line:
-                        current_proc = stripped_line.split()[0][2:]  # Remove '//' prefix
-                        continue
+                    # Append continuation line
+                    current_dd_statement += " " + stripped_line[2:].strip()
                     
-                    # Handle DD statements (including multi-line)
-                    if stripped_line.startswith('//') and ' DD ' in stripped_line:
-                        # Process any previous DD statement
-                        if current_dd_statement:
-                            self._process_complete_dd_statement(
-                                current_dd_statement, file_path, current_dd_line_start, 
-                                current_job, current_step, current_proc
-                            )
-                        
-                        # Start new DD statement
-                        current_dd_statement = stripped_line
-                        current_dd_line_start = line_number
-                        
-                        # Check if this line ends with continuation
-                        if not stripped_line.rstrip().endswith(','):
-                            # Complete DD statement on single line
-                            self._process_complete_dd_statement(
-                                current_dd_statement, file_path, current_dd_line_start,
-                                current_job, current_step, current_proc
-                            )
-                            current_dd_statement = ""
+                    # Check if this is the end of the DD statement
+                    if not stripped_line.rstrip().endswith(','):
+                        self._process_complete_dd_statement(
+                            current_dd_statement, file_path, current_dd_line_start,
+                            current_job, current_step, current_proc, datasets
+                        )
+                        current_dd_statement = ""
+            
+            # Process any remaining DD statement
+            if current_dd_statement:
+                self._process_complete_dd_statement(
+                    current_dd_statement, file_path, current_dd_line_start,
+                    current_job, current_step, current_proc, datasets
+                )
                     
-                    # Handle continuation lines
-                    elif (current_dd_statement and 
-                          stripped_line.startswith('//') and 
-                          len(stripped_line) > 2 and 
-                          not ' ' in stripped_line[2:15]):  # Continuation format
-                        
-                        # Append continuation line
-                        current_dd_statement += " " + stripped_line[2:].strip()
-                        
-                        # Check if this is the end of the DD statement
-                        if not stripped_line.rstrip().endswith(','):
-                            self._process_complete_dd_statement(
-                                current_dd_statement, file_path, current_dd_line_start,
-                                current_job, current_step, current_proc
-                            )
-                            current_dd_statement = ""
-                
-                # Process any remaining DD statement
-                if current_dd_statement:
-                    self._process_complete_dd_statement(
-                        current_dd_statement, file_path, current_dd_line_start,
-                        current_job, current_step, current_proc
-                    )
-                        
         except Exception as e:
             print(f"Error analyzing JCL/PROC file {file_path}: {e}")
+        
+        return datasets
 
-    def _process_complete_dd_statement(self, dd_statement, file_path, line_number, job_name, step_name, proc_name):
-        """Process a complete DD statement (potentially multi-line)."""
+    def _process_complete_dd_statement(self, dd_statement, file_path, line_number, job_name, step_name, proc_name, datasets):
+        """Process a complete DD statement (potentially multi-line), appending its entry to `datasets`."""
         dataset_info = self._parse_dd_statement(
             dd_statement, file_path, line_number, job_name, step_name
         )
@@ -359,7 +485,7 @@ class CobolFileAnalyzer:
             else:
                 dataset_info['proc_name'] = ''
             
-            self.results['jcl_datasets'].append(dataset_info)
+            datasets.append(dataset_info)
 
     def _parse_dd_statement(self, line, file_path, line_number, job_name, step_name):
         """Parse a DD statement to extract dataset information."""
@@ -392,7 +518,7 @@ class CobolFileAnalyzer:
             
             # Initialize dataset info
             dataset_info = {
-                'jcl_file': str(file_path.relative_to(self.root_directory)),
+                'jcl_file': self._relative_path(file_path),
                 'job_name': job_name or 'UNKNOWN',
                 'step_name': step_name or 'UNKNOWN',
                 'dd_name': dd_name,
@@ -415,61 +541,38 @@ class CobolFileAnalyzer:
             # Handle parameters that might be quoted
             dd_params = self._clean_jcl_parameters(dd_params)
             
-            # Extract DSN (Dataset Name) - handle various formats
-            dsn_patterns = [
-                r'DSN=([^,\s]+)',           # DSN=DATASET.NAME
-                r'DSN=\'([^\']+)\'',        # DSN='DATASET.NAME'
-                r'DSN=\"([^\"]+)\"',        # DSN="DATASET.NAME"
-                r'DSN=\(([^)]+)\)'          # DSN=(DATASET.NAME)
-            ]
-            
-            for pattern in dsn_patterns:
-                dsn_match = re.search(pattern, dd_params)
-                if dsn_match:
-                    dataset_info['dataset_name'] = dsn_match.group(1).strip('\'"')
-                    break
-            
-            # Extract DISP parameter - handle various formats
-            disp_patterns = [
-                r'DISP=\(([^)]+)\)',        # DISP=(NEW,CATLG,DELETE)
-                r'DISP=([^,\s]+)'           # DISP=SHR
-            ]
-            
-            for pattern in disp_patterns:
-                disp_match = re.search(pattern, dd_params)
-                if disp_match:
-                    disp_value = disp_match.group(1)
-                    if ',' in disp_value:
-                        disp_parts = [part.strip('\'"') for part in disp_value.split(',')]
-                        if len(disp_parts) >= 1:
-                            dataset_info['disp_status'] = disp_parts[0].strip()
-                        if len(disp_parts) >= 2:
-                            dataset_info['disp_normal'] = disp_parts[1].strip()
-                        if len(disp_parts) >= 3:
-                            dataset_info['disp_abnormal'] = disp_parts[2].strip()
-                    else:
-                        dataset_info['disp_status'] = disp_value.strip('\'"')
-                    break
-            
-            # Extract other parameters with improved parsing
-            param_patterns = {
-                'volume': [r'VOL=([^,\s]+)', r'VOLUME=([^,\s]+)', r'VOL=\(([^)]+)\)'],
-                'unit': [r'UNIT=([^,\s]+)', r'UNIT=\(([^)]+)\)'],
-                'space': [r'SPACE=\(([^)]+(?:\([^)]+\))*[^)]*)\)'],
-                'dcb': [r'DCB=\(([^)]+(?:\([^)]+\))*[^)]*)\)']
-            }
-            
-            for param_name, patterns in param_patterns.items():
-                for pattern in patterns:
-                    match = re.search(pattern, dd_params)
-                    if match:
-                        dataset_info[param_name] = match.group(1).strip('\'"')
+            # Collect the first value of each DD parameter form in one pass
+            values = {}
+            for key, paren, bare in _DD_PARAMETER.findall(dd_params):
+                # Unmatched forms come back as ''; matched values are never empty
+                if paren:
+                    values.setdefault((key, 'paren'), paren)
+                if bare:
+                    values.setdefault((key, 'bare'), bare)
+            
+            for field, forms in _DD_FIELDS.items():
+                for form in forms:
+                    if form in values:
+                        dataset_info[field] = values[form].strip('\'"')
                         break
             
+            # DISP=(NEW,CATLG,DELETE) wins over DISP=SHR, wherever each appears
+            disp_value = values.get(('DISP', 'paren')) or values.get(('DISP', 'bare'))
+            if disp_value:
+                if ',' in disp_value:
+                    disp_parts = [part.strip('\'"') for part in disp_value.split(',')]
+                    if len(disp_parts) >= 1:
+                        dataset_info['disp_status'] = disp_parts[0].strip()
+                    if len(disp_parts) >= 2:
+                        dataset_info['disp_normal'] = disp_parts[1].strip()
+                    if len(disp_parts) >= 3:
+                        dataset_info['disp_abnormal'] = disp_parts[2].strip()
+                else:
+                    dataset_info['disp_status'] = disp_value.strip('\'"')
+            
             # Extract SYSOUT parameter
-            sysout_match = re.search(r'SYSOUT=([^,\s]+)', dd_params)
-            if sysout_match:
-                dataset_info['unit'] = f"SYSOUT={sysout_match.group(1)}"
+            if ('SYSOUT', 'bare') in values:
+                dataset_info['unit'] = f"SYSOUT={values[('SYSOUT', 'bare')]}"
             
             # Determine dataset type with improved logic
             if 'DUMMY' in dd_params:
@@ -499,10 +602,17 @@ class CobolFileAnalyzer:
             print(f"Error parsing DD statement at line {line_number}: {e}")
             return None
 
+    def _relative_path(self, file_path):
+        """Path relative to the root directory, as a string; remembered for the file being parsed."""
+        if file_path != self._relative_path_for:
+            self._relative_path_for = file_path
+            self._relative_path_text = str(file_path.relative_to(self.root_directory))
+        return self._relative_path_text
+
     def _clean_jcl_parameters(self, params):
         """Clean and normalize JCL parameters for parsing."""
         # Remove extra spaces and normalize
-        params = re.sub(r'\s+', ' ', params)
+        params = _WHITESPACE.sub(' ', params)
         # Handle continuation characters
         params = params.replace('...', '')
         return params
@@ -558,9 +668,9 @@ class CobolFileAnalyzer:
 
     def _finalize_analysis(self):
         """Convert sets to lists for JSON serialization and calculate totals."""
-        # Convert sets to lists
-        self.results['io_analysis']['input_files'] = list(self.results['io_analysis']['input_files'])
-        self.results['io_analysis']['output_files'] = list(self.results['io_analysis']['output_files'])
+        # Convert sets to sorted lists, so reports do not depend on set ordering
+        self.results['io_analysis']['input_files'] = sorted(self.results['io_analysis']['input_files'])
+        self.results['io_analysis']['output_files'] = sorted(self.results['io_analysis']['output_files'])
         
         # Calculate detailed line count statistics
         line_stats = {
@@ -1457,11 +1567,13 @@ def main():
                        help="Save report to file")
     parser.add_argument("--export", "-e", choices=['json', 'excel', 'csv', 'all'],
                        help="Export format (alternative to --save with format selection)")
+    parser.add_argument("--workers", "-w", type=int, default=None,
+                       help="Processes used to scan files (default: CPU count; 1 scans serially)")
     
     args = parser.parse_args()
     
     # Create analyzer and run analysis
-    analyzer = CobolFileAnalyzer(args.directory)
+    analyzer = CobolFileAnalyzer(args.directory, workers=args.workers)
     analyzer.scan_directory()
     
     # Generate report
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The analyzer and its benchmark are scripts run from this directory, not a package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,131 @@
+"""
+Golden tests: the precompiled COBOL I/O and JCL DD parsing must extract
+exactly what the per-pattern parser it replaced did.
+"""
+import random
+
+import pytest
+
+import cobol_analyzer
+import cobol_analyzer_Latest
+from benchmark_cobol_parsing import LegacyCobolFileAnalyzer, synthetic_cobol, synthetic_jcl
+
+JCL = """//PAYROLL  JOB (ACCT),'GOLDEN',CLASS=A
+//*  QUOTED, PARENTHESIZED AND BARE DSN
+//STEP1    EXEC PGM=PAYCALC
+//QUOTED   DD DSN='PROD.QUOTED.DATA',DISP=SHR
+//DQUOTED  DD DSN="PROD.DQUOTED.DATA",DISP=(OLD,KEEP)
+//PAREN    DD DSN=(PROD.PAREN.DATA),DISP=(NEW,CATLG,DELETE)
+//GDG      DD DSN=PROD.GDG(+1),DISP=(NEW,CATLG),UNIT=SYSDA
+//STEP2    EXEC PROC=NIGHTLY
+//VOLSER   DD DSN=PROD.VOL.DATA,DISP=OLD,VOL=SER=VOL001,UNIT=3390
+//VOLPAREN DD DSN=PROD.VOLP.DATA,DISP=SHR,VOL=(PRIVATE,SER=VOL002)
+//VOLUME   DD DSN=PROD.VOLUME.DATA,DISP=SHR,VOLUME=SER=VOL003
+//UNITP    DD DSN=PROD.UNIT.DATA,DISP=(NEW,PASS),UNIT=(SYSDA,2),DCB=(RECFM=FB,LRECL=80,BLKSIZE=0)
+//CONT     DD DSN=PROD.CONT.DATA,
+//SPACE=(TRK,1)
+//LOWER    DD dsn=prod.lower.data,disp=shr,unit=sysda
+//lower    dd DSN=PROD.NOT.A.DD,DISP=SHR
+//NONASCII DD DSN=PROD.DONNÉES.ÄÖÜ,DISP=SHR,VOL=SER=VÖL004
+//ESZETT   DD DSN=PROD.STRAßE,DISP=SHR
+//TEMP     DD DSN=&&TEMP,DISP=(NEW,PASS)
+//REPORT   DD SYSOUT=*
+//NOTHING  DD DUMMY
+"""
+
+COBOL = """       PROCEDURE DIVISION.
+           OPEN INPUT IN-FILE OUTPUT OUT-FILE.
+           OPEN I-O MASTER-FILE.
+           READ PAYFILE INTO WS-REC.
+           WRITE PAYREC FROM WS-REC.
+           REWRITE MASTER-REC.
+           ACCEPT WS-DATE FROM DATE.
+           DISPLAY 'TOTAL ' WS-TOT UPON CONSOLE.
+           SELECT IN-FILE ASSIGN TO INDD INPUT.
+           MOVE SPACES TO WS-READY.
+"""
+
+
+@pytest.fixture
+def analyzers(tmp_path):
+    return (
+        cobol_analyzer.CobolFileAnalyzer(str(tmp_path), workers=1),
+        LegacyCobolFileAnalyzer(str(tmp_path), workers=1),
+    )
+
+
+def parse_jcl(analyzer, root, content):
+    return analyzer._analyze_jcl_datasets(root / 'golden.jcl', content)
+
+
+def by_dd_name(datasets):
+    return {dataset['dd_name']: dataset for dataset in datasets}
+
+
+def test_jcl_matches_legacy(analyzers, tmp_path):
+    current, legacy = analyzers
+    assert parse_jcl(current, tmp_path, JCL) == parse_jcl(legacy, tmp_path, JCL)
+
+
+def test_jcl_fields(analyzers, tmp_path):
+    datasets = by_dd_name(parse_jcl(analyzers[0], tmp_path, JCL))
+
+    assert datasets['QUOTED']['dataset_name'] == 'PROD.QUOTED.DATA'
+    assert datasets['DQUOTED']['dataset_name'] == 'PROD.DQUOTED.DATA'
+    assert datasets['DQUOTED']['disp_normal'] == 'KEEP'
+    assert datasets['PAREN']['disp_abnormal'] == 'DELETE'
+    assert datasets['VOLSER']['volume'] == 'SER=VOL001'
+    assert datasets['VOLSER']['unit'] == '3390'
+    assert datasets['VOLUME']['volume'] == 'SER=VOL003'
+    assert datasets['CONT']['space'] == 'TRK,1'
+    assert datasets['UNITP']['dcb'] == 'RECFM=FB,LRECL=80,BLKSIZE=0'
+    assert datasets['LOWER']['dataset_name'] == 'PROD.LOWER.DATA'
+    assert datasets['LOWER']['unit'] == 'SYSDA'
+    assert datasets['NONASCII']['dataset_name'] == 'PROD.DONNÉES.ÄÖÜ'
+    assert datasets['NONASCII']['volume'] == 'SER=VÖL004'
+    assert datasets['ESZETT']['dataset_name'] == 'PROD.STRASSE'
+    assert datasets['TEMP']['dataset_type'] == 'TEMPORARY'
+    assert datasets['REPORT']['unit'] == 'SYSOUT=*'
+    assert datasets['NOTHING']['dataset_type'] == 'DUMMY'
+    # Only upper-case " DD " starts a DD statement
+    assert 'lower' not in datasets and 'LOWER' in datasets
+
+
+@pytest.mark.parametrize('content', [
+    COBOL,
+    COBOL.lower(),
+    COBOL.replace('IN-FILE', 'in-file').replace('WRITE', 'Write'),
+    COBOL + "           OPEN İNPUT ODD-FILE.\n           READ FICHIER-ÉTÉ.\n",
+], ids=['upper-ascii', 'lower-case', 'mixed-case', 'non-ascii'])
+def test_cobol_io_matches_legacy(analyzers, tmp_path, content):
+    current, legacy = analyzers
+    path = tmp_path / 'golden.cbl'
+    expected = legacy._analyze_cobol_io(path, content)
+    assert expected
+    assert current._analyze_cobol_io(path, content) == expected
+
+
+def test_cobol_io_operations(analyzers, tmp_path):
+    references = analyzers[0]._analyze_cobol_io(tmp_path / 'golden.cbl', COBOL)
+    assert ('PAYFILE', 'INPUT') in references
+    assert ('PAYREC', 'OUTPUT') in references
+
+
+@pytest.mark.parametrize('seed', [7, 11])
+def test_synthetic_sources_match_legacy(analyzers, tmp_path, seed):
+    current, legacy = analyzers
+    rng = random.Random(seed)
+    jcl = synthetic_jcl(500, rng)
+    cobol = synthetic_cobol(500, rng)
+    assert parse_jcl(current, tmp_path, jcl) == parse_jcl(legacy, tmp_path, jcl)
+    for content in (cobol.upper(), cobol):
+        path = tmp_path / 'synthetic.cbl'
+        assert current._analyze_cobol_io(path, content) == legacy._analyze_cobol_io(path, content)
+
+
+def test_latest_copy_parses_alike(tmp_path):
+    current = cobol_analyzer.CobolFileAnalyzer(str(tmp_path), workers=1)
+    latest = cobol_analyzer_Latest.CobolFileAnalyzer(str(tmp_path), workers=1)
+    assert parse_jcl(latest, tmp_path, JCL) == parse_jcl(current, tmp_path, JCL)
+    path = tmp_path / 'golden.cbl'
+    assert latest._analyze_cobol_io(path, COBOL.lower()) == current._analyze_cobol_io(path, COBOL.lower())
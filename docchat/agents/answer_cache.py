@@ -0,0 +1,95 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+import hashlib
+import itertools
+import logging
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def document_set_key(file_hashes: Iterable[str]) -> str:
+    """Order-independent key for a set of uploaded files."""
+    return hashlib.sha256("\n".join(sorted(file_hashes)).encode()).hexdigest()
+
+
+@dataclass
+class _Answer:
+    doc_set: str
+    question: str
+    vector: np.ndarray
+    result: Dict
+    created: float
+
+
+class AnswerCache:
+    """
+    Semantic cache of pipeline results per document set.
+
+    A question hits when its embedding's cosine similarity to a cached question
+    for the same document set reaches `threshold`. Entries expire after
+    `ttl_seconds` and the least recently used are evicted past `max_entries`.
+    """
+
+    def __init__(self, embeddings, threshold: float, ttl_seconds: int, max_entries: int):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, _Answer]" = OrderedDict()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, doc_set: str, vector: np.ndarray) -> Optional[Tuple[Dict, float]]:
+        """Return (result, similarity) for the closest fresh cached question, if close enough."""
+        now = time.time()
+        with self._lock:
+            best_id, best_similarity = None, -1.0
+            for entry_id, entry in list(self._entries.items()):
+                if now - entry.created > self.ttl_seconds:
+                    del self._entries[entry_id]
+                    continue
+                if entry.doc_set != doc_set:
+                    continue
+                similarity = float(np.dot(vector, entry.vector))
+                if similarity > best_similarity:
+                    best_id, best_similarity = entry_id, similarity
+
+            if best_id is None or best_similarity < self.threshold:
+                self._misses += 1
+                return None
+
+            self._hits += 1
+            self._entries.move_to_end(best_id)
+            entry = self._entries[best_id]
+            logger.info(f"Answer cache hit (similarity {best_similarity:.3f}) for cached question '{entry.question}'")
+            return dict(entry.result), best_similarity
+
+    def store(self, doc_set: str, question: str, vector: np.ndarray, result: Dict) -> None:
+        with self._lock:
+            self._entries[next(self._ids)] = _Answer(doc_set, question, vector, dict(result), time.time())
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+            }
@@ -0,0 +1,15 @@
+import asyncio
+from typing import Dict
+from weakref import WeakKeyDictionary
+from config.settings import settings
+
+# event loop -> model_id -> semaphore; asyncio primitives must not cross loops
+_semaphores: "WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, asyncio.Semaphore]]" = WeakKeyDictionary()
+
+
+def model_semaphore(model_id: str) -> asyncio.Semaphore:
+    """Return the semaphore bounding concurrent async calls to `model_id` on the running loop."""
+    per_loop = _semaphores.setdefault(asyncio.get_running_loop(), {})
+    if model_id not in per_loop:
+        per_loop[model_id] = asyncio.Semaphore(settings.MODEL_MAX_CONCURRENCY)
+    return per_loop[model_id]
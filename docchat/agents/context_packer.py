@@ -0,0 +1,73 @@
+from dataclasses import dataclass, field
+from typing import List, Set
+from langchain.schema import Document
+from document_processor.near_duplicates import jaccard, shingles
+from utils.tokens import count_tokens
+
+
+@dataclass
+class PackedContext:
+    text: str
+    documents: List[Document]
+    used_tokens: int
+    dropped_tokens: int = 0
+    dropped_chunks: int = 0
+    duplicate_chunks: int = 0
+
+
+@dataclass
+class _Candidate:
+    document: Document
+    score: float
+    tokens: int
+    shingles: Set = field(default_factory=set)
+
+
+class ContextPacker:
+    """
+    Build an LLM context from retrieved chunks within a token budget.
+
+    Chunks are ranked by their fused retrieval score (metadata["score"] when the
+    retriever attaches one, otherwise their position in the retriever output),
+    near-identical chunks are dropped, and the budget is filled best-first.
+    Chunks without words are never treated as duplicates.
+    """
+
+    def __init__(self, token_budget: int, dedup_threshold: float = 0.9):
+        self.token_budget = token_budget
+        self.dedup_threshold = dedup_threshold
+
+    def pack(self, documents: List[Document]) -> PackedContext:
+        candidates = []
+        for rank, doc in enumerate(documents):
+            score = doc.metadata.get("score")
+            candidates.append(_Candidate(
+                document=doc,
+                score=float(score) if score is not None else 1.0 / (rank + 1),
+                tokens=count_tokens(doc.page_content),
+                shingles=shingles(doc.page_content)
+            ))
+        candidates.sort(key=lambda c: c.score, reverse=True)
+
+        kept: List[_Candidate] = []
+        used_tokens = dropped_tokens = dropped_chunks = duplicate_chunks = 0
+        for candidate in candidates:
+            if any(jaccard(candidate.shingles, other.shingles) >= self.dedup_threshold for other in kept):
+                duplicate_chunks += 1
+                continue
+            if used_tokens + candidate.tokens > self.token_budget:
+                dropped_tokens += candidate.tokens
+                dropped_chunks += 1
+                continue
+            kept.append(candidate)
+            used_tokens += candidate.tokens
+
+        packed_docs = [c.document for c in kept]
+        return PackedContext(
+            text="\n\n".join(doc.page_content for doc in packed_docs),
+            documents=packed_docs,
+            used_tokens=used_tokens,
+            dropped_tokens=dropped_tokens,
+            dropped_chunks=dropped_chunks,
+            duplicate_chunks=duplicate_chunks
+        )
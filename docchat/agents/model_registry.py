@@ -0,0 +1,130 @@
+from collections import deque
+from typing import Dict, Tuple
+from ibm_watsonx_ai import Credentials, APIClient
+from ibm_watsonx_ai.foundation_models import ModelInference
+from config.settings import settings
+import json
+import logging
+import statistics
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class _ModelMetrics:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=1000)
+
+
+class TimedModel:
+    """Wraps a ModelInference and records the latency of every chat/achat/achat_stream call."""
+
+    def __init__(self, model, registry: "ModelRegistry"):
+        self._model = model
+        self._registry = registry
+        self.model_id = model.model_id
+
+    def chat(self, messages, **kwargs):
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = self._model.chat(messages=messages, **kwargs)
+            failed = False
+            return response
+        finally:
+            self._registry.record(self.model_id, time.perf_counter() - start, error=failed)
+
+    async def achat(self, messages, **kwargs):
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = await self._model.achat(messages=messages, **kwargs)
+            failed = False
+            return response
+        finally:
+            self._registry.record(self.model_id, time.perf_counter() - start, error=failed)
+
+    async def achat_stream(self, messages, **kwargs):
+        """Stream like ModelInference.achat_stream; latency runs until the last chunk."""
+        start = time.perf_counter()
+        try:
+            stream = await self._model.achat_stream(messages=messages, **kwargs)
+        except BaseException:
+            self._registry.record(self.model_id, time.perf_counter() - start, error=True)
+            raise
+        return self._timed_stream(stream, start)
+
+    async def _timed_stream(self, stream, start: float):
+        failed = True
+        try:
+            async for chunk in stream:
+                yield chunk
+            failed = False
+        finally:
+            self._registry.record(self.model_id, time.perf_counter() - start, error=failed)
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+
+class ModelRegistry:
+    """
+    Lazily builds one ModelInference per (model_id, params), all sharing a
+    single APIClient and therefore one authenticated HTTP connection pool.
+    """
+
+    def __init__(self):
+        self._client = None
+        self._models: Dict[Tuple[str, str], TimedModel] = {}
+        self._metrics: Dict[str, _ModelMetrics] = {}
+        self._lock = threading.Lock()
+
+    def get(self, model_id: str, params: Dict = None) -> TimedModel:
+        key = (model_id, json.dumps(params or {}, sort_keys=True))
+        with self._lock:
+            if key not in self._models:
+                logger.info(f"Creating ModelInference for {model_id} with params {params}")
+                model = ModelInference(
+                    model_id=model_id,
+                    api_client=self._api_client(),
+                    project_id=settings.WATSONX_PROJECT_ID,
+                    params=params
+                )
+                self._models[key] = TimedModel(model, self)
+            return self._models[key]
+
+    def record(self, model_id: str, seconds: float, error: bool = False) -> None:
+        with self._lock:
+            metrics = self._metrics.setdefault(model_id, _ModelMetrics())
+            metrics.calls += 1
+            metrics.errors += int(error)
+            metrics.latencies.append(seconds)
+
+    def metrics(self) -> Dict:
+        """Per-model call counts, errors and latency percentiles in seconds."""
+        with self._lock:
+            report = {}
+            for model_id, metrics in self._metrics.items():
+                ordered = sorted(metrics.latencies)
+                report[model_id] = {
+                    "calls": metrics.calls,
+                    "errors": metrics.errors,
+                    "mean": statistics.fmean(ordered) if ordered else 0.0,
+                    "p50": ordered[len(ordered) // 2] if ordered else 0.0,
+                    "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else 0.0
+                }
+            return report
+
+    def _api_client(self) -> APIClient:
+        """Create the shared client on first use. Caller holds the lock."""
+        if self._client is None:
+            credentials = Credentials(url=settings.WATSONX_URL)
+            self._client = APIClient(credentials, project_id=settings.WATSONX_PROJECT_ID)
+        return self._client
+
+
+# Shared by all agents in the process
+model_registry = ModelRegistry()
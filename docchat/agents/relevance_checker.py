@@ -1,29 +1,25 @@
-from ibm_watsonx_ai.foundation_models import ModelInference
-from ibm_watsonx_ai import Credentials, APIClient
 from config.settings import settings
+from .concurrency import model_semaphore
+from .model_registry import model_registry
+from utils.tokens import completion_tokens, count_tokens
+from utils.tracing import tracer
 import re
 import logging
 
 logger = logging.getLogger(__name__)
 
-credentials = Credentials(
-                   url = "https://us-south.ml.cloud.ibm.com",
-                  )
-client = APIClient(credentials)
-
 class RelevanceChecker:
-    def __init__(self):
-        # Initialize the WatsonX ModelInference
-        self.model = ModelInference(
-            model_id="ibm/granite-3-8b-instruct",
-            credentials=credentials,
-            project_id="skills-network",
+    def __init__(self, model=None):
+        # Shared WatsonX ModelInference from the registry unless a stand-in is injected
+        self.model = model or model_registry.get(
+            "ibm/granite-3-8b-instruct",
             params={"temperature": 0, "max_tokens": 10},
         )
 
-    def check(self, question: str, retriever, k=3) -> str:
+    def check(self, question: str, retriever, k=3, documents=None) -> str:
         """
-        1. Retrieve the top-k document chunks from the global retriever.
+        1. Retrieve the top-k document chunks from the global retriever,
+           unless the caller already retrieved them and passes `documents`.
         2. Combine them into a single text string.
         3. Pass that text + question to the LLM for classification.
 
@@ -33,11 +29,63 @@ class RelevanceChecker:
         logger.debug(f"RelevanceChecker.check called with question='{question}' and k={k}")
 
         # Retrieve doc chunks from the ensemble retriever
-        top_docs = retriever.invoke(question)
+        top_docs = documents if documents is not None else retriever.invoke(question)
         if not top_docs:
             logger.debug("No documents returned from retriever.invoke(). Classifying as NO_MATCH.")
             return "NO_MATCH"
 
+        prompt = self._build_prompt(question, top_docs, k)
+
+        # Call the LLM
+        try:
+            with tracer.span("llm_call", agent="relevance", model=self.model.model_id, prompt_tokens=count_tokens(prompt)) as span:
+                response = self.model.chat(
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": prompt  # Changed from list to string
+                        }
+                    ]
+                )
+                span.set(completion_tokens=completion_tokens(response))
+        except Exception as e:
+            logger.error(f"Error during model inference: {e}")
+            return "NO_MATCH"
+
+        return self._classify(response)
+
+    async def acheck(self, question: str, retriever, k=3, documents=None) -> str:
+        """
+        Async variant of `check`; waits on the per-model concurrency limit.
+        """
+        logger.debug(f"RelevanceChecker.acheck called with question='{question}' and k={k}")
+
+        top_docs = documents if documents is not None else await retriever.ainvoke(question)
+        if not top_docs:
+            logger.debug("No documents returned from retriever.ainvoke(). Classifying as NO_MATCH.")
+            return "NO_MATCH"
+
+        prompt = self._build_prompt(question, top_docs, k)
+
+        try:
+            async with model_semaphore(self.model.model_id):
+                with tracer.span("llm_call", agent="relevance", model=self.model.model_id, prompt_tokens=count_tokens(prompt)) as span:
+                    response = await self.model.achat(
+                        messages=[
+                            {
+                                "role": "user",
+                                "content": prompt
+                            }
+                        ]
+                    )
+                    span.set(completion_tokens=completion_tokens(response))
+        except Exception as e:
+            logger.error(f"Error during model inference: {e}")
+            return "NO_MATCH"
+
+        return self._classify(response)
+
+    def _build_prompt(self, question: str, top_docs, k: int) -> str:
         # Combine the top k chunk texts into one string
         document_content = "\n\n".join(doc.page_content for doc in top_docs[:k])
 
@@ -62,21 +110,10 @@ class RelevanceChecker:
 
         **Respond ONLY with one of the following labels: CAN_ANSWER, PARTIAL, NO_MATCH**
         """
+        return prompt
 
-        # Call the LLM
-        try:
-            response = self.model.chat(
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt  # Changed from list to string
-                    }
-                ]
-            )
-        except Exception as e:
-            logger.error(f"Error during model inference: {e}")
-            return "NO_MATCH"
-
+    def _classify(self, response) -> str:
+        """Map a chat completion onto one of the three relevance labels."""
         # Extract the content from the response
         try:
             llm_response = response['choices'][0]['message']['content'].strip().upper()
@@ -85,8 +122,6 @@ class RelevanceChecker:
             logger.error(f"Unexpected response structure: {e}")
             return "NO_MATCH"
 
-        print(f"Checker response: {llm_response}")
-
         # Validate the response
         valid_labels = {"CAN_ANSWER", "PARTIAL", "NO_MATCH"}
         if llm_response not in valid_labels:
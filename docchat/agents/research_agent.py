@@ -1,33 +1,37 @@
-from ibm_watsonx_ai.foundation_models import ModelInference
-from ibm_watsonx_ai import Credentials, APIClient
-from typing import Dict, List
+from typing import Callable, Dict, List
 from langchain.schema import Document
 from config.settings import settings
+from .concurrency import model_semaphore
+from .context_packer import ContextPacker
+from .model_registry import model_registry
+from utils.tokens import completion_tokens, count_tokens
+from utils.tracing import tracer
 import json
+import logging
 
-credentials = Credentials(
-                   url = "https://us-south.ml.cloud.ibm.com",
-                  )
-client = APIClient(credentials)
+logger = logging.getLogger(__name__)
 
 
 class ResearchAgent:
-    def __init__(self):
+    def __init__(self, model=None):
         """
-        Initialize the research agent with the IBM WatsonX ModelInference.
+        Initialize the research agent with the IBM WatsonX ModelInference,
+        or with `model` when a stand-in exposing chat/achat is injected.
         """
         # Initialize the WatsonX ModelInference
-        print("Initializing ResearchAgent with IBM WatsonX ModelInference...")
-        self.model = ModelInference(
-            model_id="meta-llama/llama-3-2-90b-vision-instruct", 
-            credentials=credentials,
-            project_id="skills-network",
+        logger.debug("Initializing ResearchAgent with IBM WatsonX ModelInference...")
+        self.model = model or model_registry.get(
+            "meta-llama/llama-3-2-90b-vision-instruct",
             params={
                 "max_tokens": 300,            # Adjust based on desired response length
                 "temperature": 0.3,           # Controls randomness; lower values make output more deterministic
             }
         )
-        print("ModelInference initialized successfully.")
+        logger.debug("ModelInference initialized successfully.")
+        self.context_packer = ContextPacker(
+            token_budget=settings.RESEARCH_CONTEXT_TOKENS,
+            dedup_threshold=settings.CONTEXT_DEDUP_THRESHOLD
+        )
 
     def sanitize_response(self, response_text: str) -> str:
         """
@@ -35,10 +39,20 @@ class ResearchAgent:
         """
         return response_text.strip()
 
-    def generate_prompt(self, question: str, context: str) -> str:
+    def generate_prompt(self, question: str, context: str, unsupported_claims: List[str] = None) -> str:
         """
         Generate a structured prompt for the LLM to generate a precise and factual answer.
+        On a re-research pass, `unsupported_claims` from the previous draft are
+        listed so the model can correct or drop them.
         """
+        feedback = ""
+        if unsupported_claims:
+            claims = "\n".join(f"        - {claim}" for claim in unsupported_claims)
+            feedback = f"""
+        **A previous answer made these claims that the context did not support.
+        Only repeat them if the context below supports them:**
+{claims}
+"""
         prompt = f"""
         You are an AI assistant designed to provide precise and factual answers based on the given context.
 
@@ -50,53 +64,124 @@ class ResearchAgent:
         **Question:** {question}
         **Context:**
         {context}
-
+        {feedback}
         **Provide your answer below:**
         """
         return prompt
 
-    def generate(self, question: str, documents: List[Document]) -> Dict:
+    def generate(self, question: str, documents: List[Document], unsupported_claims: List[str] = None,
+                 usage: Dict = None) -> Dict:
         """
         Generate an initial answer using the provided documents.
+        `usage`, if given, is filled in as soon as the model call is sent, so
+        a caller that abandons the call can still account for it.
         """
-        print(f"ResearchAgent.generate called with question='{question}' and {len(documents)} documents.")
+        logger.debug("ResearchAgent.generate called with question=%r and %d documents.", question, len(documents))
+        prompt, context = self._prepare_prompt(question, documents, unsupported_claims)
+        prompt_tokens = count_tokens(prompt)
 
-        # Combine the top document contents into one string
-        context = "\n\n".join([doc.page_content for doc in documents])
-        print(f"Combined context length: {len(context)} characters.")
+        # Call the LLM to generate the answer
+        try:
+            logger.debug("Sending prompt to the model...")
+            with tracer.span("llm_call", agent="research", model=self.model.model_id, prompt_tokens=prompt_tokens) as span:
+                self._record_usage(usage, prompt_tokens)
+                response = self.model.chat(
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": prompt  # Ensure content is a string
+                        }
+                    ]
+                )
+                span.set(completion_tokens=completion_tokens(response))
+            logger.debug("LLM response received.")
+        except Exception as e:
+            logger.error(f"Error during model inference: {e}")
+            raise RuntimeError("Failed to generate answer due to a model error.") from e
 
-        # Create a prompt for the LLM
-        prompt = self.generate_prompt(question, context)
-        print("Prompt created for the LLM.")
+        result = self._build_result(response, context)
+        result["prompt_tokens"] = prompt_tokens
+        return result
+
+    async def agenerate(self, question: str, documents: List[Document], on_token: Callable[[str], None] = None,
+                        unsupported_claims: List[str] = None, usage: Dict = None) -> Dict:
+        """
+        Async variant of `generate`; waits on the per-model concurrency limit.
+        With `on_token`, the answer is streamed and each text delta is passed
+        to it as it arrives.
+        """
+        logger.debug("ResearchAgent.agenerate called with question=%r and %d documents.", question, len(documents))
+        prompt, context = self._prepare_prompt(question, documents, unsupported_claims)
+        prompt_tokens = count_tokens(prompt)
+        messages = [
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ]
 
-        # Call the LLM to generate the answer
         try:
-            print("Sending prompt to the model...")
-            response = self.model.chat(
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt  # Ensure content is a string
-                    }
-                ]
-            )
-            print("LLM response received.")
+            async with model_semaphore(self.model.model_id):
+                with tracer.span("llm_call", agent="research", model=self.model.model_id,
+                                 prompt_tokens=prompt_tokens, streamed=on_token is not None) as span:
+                    self._record_usage(usage, prompt_tokens)
+                    if on_token is None:
+                        response = await self.model.achat(messages=messages)
+                    else:
+                        response = await self._astream_chat(messages, on_token)
+                    span.set(completion_tokens=completion_tokens(response))
         except Exception as e:
-            print(f"Error during model inference: {e}")
+            logger.error(f"Error during model inference: {e}")
             raise RuntimeError("Failed to generate answer due to a model error.") from e
 
+        result = self._build_result(response, context)
+        result["prompt_tokens"] = prompt_tokens
+        return result
+
+    async def _astream_chat(self, messages: List[Dict], on_token: Callable[[str], None]) -> Dict:
+        """Stream a chat completion, returning it in the same shape as `achat`."""
+        parts = []
+        stream = await self.model.achat_stream(messages=messages)
+        async for chunk in stream:
+            choices = chunk.get("choices") or []
+            delta = choices[0].get("delta", {}).get("content") if choices else None
+            if delta:
+                parts.append(delta)
+                on_token(delta)
+        return {"choices": [{"message": {"role": "assistant", "content": "".join(parts)}}]}
+
+    @staticmethod
+    def _record_usage(usage: Dict, prompt_tokens: int) -> None:
+        if usage is not None:
+            usage.update(model_calls=1, prompt_tokens=prompt_tokens)
+
+    def _prepare_prompt(self, question: str, documents: List[Document], unsupported_claims: List[str] = None):
+        """Pack the context and build the prompt; returns (prompt, context)."""
+        # Pack the best-ranked, de-duplicated chunks into the token budget
+        packed = self.context_packer.pack(documents)
+        context = packed.text
+        logger.debug("Packed context: %d tokens from %d chunks (%d tokens over budget, %d near-duplicates dropped).",
+                     packed.used_tokens, len(packed.documents), packed.dropped_tokens, packed.duplicate_chunks)
+
+        # Create a prompt for the LLM
+        prompt = self.generate_prompt(question, context, unsupported_claims)
+        logger.debug("Prompt created for the LLM.")
+        return prompt, context
+
+    def _build_result(self, response: Dict, context: str) -> Dict:
+        """Turn a chat completion into the agent's result dict."""
         # Extract and process the LLM's response
         try:
             llm_response = response['choices'][0]['message']['content'].strip()
-            print(f"Raw LLM response:\n{llm_response}")
+            logger.debug("Raw LLM response:\n%s", llm_response)
         except (IndexError, KeyError) as e:
-            print(f"Unexpected response structure: {e}")
+            logger.error(f"Unexpected response structure: {e}")
             llm_response = "I cannot answer this question based on the provided documents."
 
         # Sanitize the response
         draft_answer = self.sanitize_response(llm_response) if llm_response else "I cannot answer this question based on the provided documents."
 
-        print(f"Generated answer: {draft_answer}")
+        logger.debug("Generated answer: %s", draft_answer)
 
         return {
             "draft_answer": draft_answer,
@@ -1,31 +1,50 @@
 import json  # Import for JSON serialization
-from ibm_watsonx_ai.foundation_models import ModelInference
-from ibm_watsonx_ai import Credentials, APIClient
+import re
 from typing import Dict, List
 from langchain.schema import Document
+from config.settings import settings
+from .concurrency import model_semaphore
+from .context_packer import ContextPacker
+from .model_registry import model_registry
+from utils.tokens import completion_tokens, count_tokens
+from utils.tracing import tracer
+import logging
 
-credentials = Credentials(
-                   url = "https://us-south.ml.cloud.ibm.com",
-                  )
-client = APIClient(credentials)
+logger = logging.getLogger(__name__)
+
+# Report fields by their capitalize()d spelling, as parsed from the model's reply
+REPORT_KEYS = {
+    "Supported": "Supported",
+    "Unsupported claims": "Unsupported Claims",
+    "Contradictions": "Contradictions",
+    "Relevant": "Relevant",
+    "Additional details": "Additional Details",
+}
+
+# "Key: value" report lines, tolerating markdown such as "- **Supported:** Yes."
+REPORT_LINE = re.compile(r"^[\s>*_#\d.)-]*([A-Za-z][A-Za-z ]*?)[\s*_]*:[\s*_]*(.*?)[\s*_]*$")
+YES_NO = re.compile(r"^\W*(yes|no)\b", re.IGNORECASE)
 
 class VerificationAgent:
-    def __init__(self):
+    def __init__(self, model=None):
         """
-        Initialize the verification agent with the IBM WatsonX ModelInference.
+        Initialize the verification agent with the IBM WatsonX ModelInference,
+        or with `model` when a stand-in exposing chat/achat is injected.
         """
         # Initialize the WatsonX ModelInference
-        print("Initializing VerificationAgent with IBM WatsonX ModelInference...")
-        self.model = ModelInference(
-            model_id="ibm/granite-3-8b-instruct", 
-            credentials=credentials,
-            project_id="skills-network",
+        logger.debug("Initializing VerificationAgent with IBM WatsonX ModelInference...")
+        self.model = model or model_registry.get(
+            "ibm/granite-3-8b-instruct",
             params={
                 "max_tokens": 200,            # Adjust based on desired response length
                 "temperature": 0.0,           # Remove randomness for consistency
             }
         )
-        print("ModelInference initialized successfully.")
+        logger.debug("ModelInference initialized successfully.")
+        self.context_packer = ContextPacker(
+            token_budget=settings.VERIFICATION_CONTEXT_TOKENS,
+            dedup_threshold=settings.CONTEXT_DEDUP_THRESHOLD
+        )
 
     def sanitize_response(self, response_text: str) -> str:
         """
@@ -73,12 +92,12 @@ class VerificationAgent:
             lines = response_text.split('\n')
             verification = {}
             for line in lines:
-                if ':' in line:
-                    key, value = line.split(':', 1)
-                    key = key.strip().capitalize()
-                    value = value.strip()
-                    if key in {"Supported", "Unsupported claims", "Contradictions", "Relevant", "Additional details"}:
-                        if key in {"Unsupported claims", "Contradictions"}:
+                match = REPORT_LINE.match(line)
+                if match:
+                    key = REPORT_KEYS.get(match.group(1).strip().capitalize())
+                    value = match.group(2)
+                    if key is not None:
+                        if key in {"Unsupported Claims", "Contradictions"}:
                             # Convert string list to actual list
                             if value.startswith('[') and value.endswith(']'):
                                 items = value[1:-1].split(',')
@@ -87,10 +106,12 @@ class VerificationAgent:
                                 verification[key] = items
                             else:
                                 verification[key] = []
-                        elif key == "Additional details":
+                        elif key == "Additional Details":
                             verification[key] = value
                         else:
-                            verification[key] = value.upper()
+                            # "Yes.", "**YES**" and "yes, fully" all read as YES
+                            answer = YES_NO.match(value)
+                            verification[key] = answer.group(1).upper() if answer else value.upper()
             # Ensure all keys are present
             for key in ["Supported", "Unsupported Claims", "Contradictions", "Relevant", "Additional Details"]:
                 if key not in verification:
@@ -103,7 +124,7 @@ class VerificationAgent:
 
             return verification
         except Exception as e:
-            print(f"Error parsing verification response: {e}")
+            logger.error(f"Error parsing verification response: {e}")
             return None
 
     def format_verification_report(self, verification: Dict) -> str:
@@ -140,38 +161,82 @@ class VerificationAgent:
         """
         Verify the answer against the provided documents.
         """
-        print(f"VerificationAgent.check called with answer='{answer}' and {len(documents)} documents.")
+        logger.debug("VerificationAgent.check called with answer=%r and %d documents.", answer, len(documents))
 
-        # Combine all document contents into one string without truncation
-        context = "\n\n".join([doc.page_content for doc in documents])
-        print(f"Combined context length: {len(context)} characters.")
-
-        # Create a prompt for the LLM to verify the answer
-        prompt = self.generate_prompt(answer, context)
-        print("Prompt created for the LLM.")
+        prompt, context = self._prepare_prompt(answer, documents)
+        prompt_tokens = count_tokens(prompt)
 
         # Call the LLM to generate the verification report
         try:
-            print("Sending prompt to the model...")
-            response = self.model.chat(
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt  # Ensure content is a string
-                    }
-                ]
-            )
-            print("LLM response received.")
+            logger.debug("Sending prompt to the model...")
+            with tracer.span("llm_call", agent="verification", model=self.model.model_id, prompt_tokens=prompt_tokens) as span:
+                response = self.model.chat(
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": prompt  # Ensure content is a string
+                        }
+                    ]
+                )
+                span.set(completion_tokens=completion_tokens(response))
+            logger.debug("LLM response received.")
         except Exception as e:
-            print(f"Error during model inference: {e}")
+            logger.error(f"Error during model inference: {e}")
             raise RuntimeError("Failed to verify answer due to a model error.") from e
 
+        result = self._build_result(response, context)
+        result["prompt_tokens"] = prompt_tokens
+        return result
+
+    async def acheck(self, answer: str, documents: List[Document]) -> Dict:
+        """
+        Async variant of `check`; waits on the per-model concurrency limit.
+        """
+        logger.debug("VerificationAgent.acheck called with answer=%r and %d documents.", answer, len(documents))
+        prompt, context = self._prepare_prompt(answer, documents)
+        prompt_tokens = count_tokens(prompt)
+
+        try:
+            async with model_semaphore(self.model.model_id):
+                with tracer.span("llm_call", agent="verification", model=self.model.model_id, prompt_tokens=prompt_tokens) as span:
+                    response = await self.model.achat(
+                        messages=[
+                            {
+                                "role": "user",
+                                "content": prompt
+                            }
+                        ]
+                    )
+                    span.set(completion_tokens=completion_tokens(response))
+        except Exception as e:
+            logger.error(f"Error during model inference: {e}")
+            raise RuntimeError("Failed to verify answer due to a model error.") from e
+
+        result = self._build_result(response, context)
+        result["prompt_tokens"] = prompt_tokens
+        return result
+
+    def _prepare_prompt(self, answer: str, documents: List[Document]):
+        """Pack the context and build the prompt; returns (prompt, context)."""
+        # Pack the best-ranked, de-duplicated chunks into the (tighter) verification budget
+        packed = self.context_packer.pack(documents)
+        context = packed.text
+        logger.debug("Packed context: %d tokens from %d chunks (%d tokens over budget, %d near-duplicates dropped).",
+                     packed.used_tokens, len(packed.documents), packed.dropped_tokens, packed.duplicate_chunks)
+
+        # Create a prompt for the LLM to verify the answer
+        prompt = self.generate_prompt(answer, context)
+        logger.debug("Prompt created for the LLM.")
+        return prompt, context
+
+    def _build_result(self, response: Dict, context: str) -> Dict:
+        """Turn a chat completion into the agent's result dict."""
         # Extract and process the LLM's response
         try:
             llm_response = response['choices'][0]['message']['content'].strip()
-            print(f"Raw LLM response:\n{llm_response}")
+            logger.debug("Raw LLM response:\n%s", llm_response)
         except (IndexError, KeyError) as e:
-            print(f"Unexpected response structure: {e}")
+            logger.error(f"Unexpected response structure: {e}")
             verification_report = {
                 "Supported": "NO",
                 "Unsupported Claims": [],
@@ -180,17 +245,14 @@ class VerificationAgent:
                 "Additional Details": "Invalid response structure from the model."
             }
             verification_report_formatted = self.format_verification_report(verification_report)
-            print(f"Verification report:\n{verification_report_formatted}")
-            print(f"Context used: {context}")
-            return {
-                "verification_report": verification_report_formatted,
-                "context_used": context
-            }
+            logger.debug("Verification report:\n%s", verification_report_formatted)
+            logger.debug("Context used: %s", context)
+            return self._result(verification_report, verification_report_formatted, context)
 
         # Sanitize the response
         sanitized_response = self.sanitize_response(llm_response) if llm_response else ""
         if not sanitized_response:
-            print("LLM returned an empty response.")
+            logger.warning("LLM returned an empty response.")
             verification_report = {
                 "Supported": "NO",
                 "Unsupported Claims": [],
@@ -202,7 +264,7 @@ class VerificationAgent:
             # Parse the response into the expected format
             verification_report = self.parse_verification_response(sanitized_response)
             if verification_report is None:
-                print("LLM did not respond with the expected format. Using default verification report.")
+                logger.warning("LLM did not respond with the expected format. Using default verification report.")
                 verification_report = {
                     "Supported": "NO",
                     "Unsupported Claims": [],
@@ -213,10 +275,16 @@ class VerificationAgent:
 
         # Format the verification report into a paragraph
         verification_report_formatted = self.format_verification_report(verification_report)
-        print(f"Verification report:\n{verification_report_formatted}")
-        print(f"Context used: {context}")
+        logger.debug("Verification report:\n%s", verification_report_formatted)
+        logger.debug("Context used: %s", context)
+
+        return self._result(verification_report, verification_report_formatted, context)
 
+    def _result(self, verification: Dict, verification_report: str, context: str) -> Dict:
         return {
-            "verification_report": verification_report_formatted,
-            "context_used": context
+            "verification_report": verification_report,
+            "context_used": context,
+            "supported": verification.get("Supported") == "YES",
+            "relevant": verification.get("Relevant") == "YES",
+            "unsupported_claims": verification.get("Unsupported Claims", [])
         }
@@ -1,11 +1,23 @@
 from langgraph.graph import StateGraph, END
-from typing import TypedDict, List, Dict
+from langgraph.types import StreamWriter
+from langchain_core.runnables import RunnableConfig
+from typing import Annotated, AsyncIterator, TypedDict, List, Dict, Tuple
 from .research_agent import ResearchAgent
 from .verification_agent import VerificationAgent
 from .relevance_checker import RelevanceChecker
 from langchain.schema import Document
-from langchain.retrievers import EnsembleRetriever
+from langchain_core.retrievers import BaseRetriever
+from retriever.hybrid import widen_retriever
+from collections import deque
+import asyncio
+import contextvars
+import operator
+from concurrent.futures import ThreadPoolExecutor
+from config.settings import settings
+from utils.tracing import tracer
 import logging
+import statistics
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -15,118 +27,501 @@ class AgentState(TypedDict):
     draft_answer: str
     verification_report: str
     is_relevant: bool
-    retriever: EnsembleRetriever
+    retriever: BaseRetriever
+    retrieval_cache: Dict[Tuple[str, int], List[Document]]  # (question, id(retriever)) -> documents
+    unsupported_claims: List[str]  # From the latest verification, fed to the next research pass
+    is_supported: bool
+    # Per-question cost; nodes return increments that LangGraph sums
+    research_passes: Annotated[int, operator.add]
+    model_calls: Annotated[int, operator.add]
+    prompt_tokens: Annotated[int, operator.add]
+
+# Summed rather than overwritten when merging node updates
+COST_FIELDS = ("research_passes", "model_calls", "prompt_tokens")
 
 class AgentWorkflow:
-    def __init__(self):
-        self.researcher = ResearchAgent()
-        self.verifier = VerificationAgent()
-        self.relevance_checker = RelevanceChecker()
+    def __init__(self, researcher=None, verifier=None, relevance_checker=None, answer_cache=None):
+        self.researcher = researcher or ResearchAgent()
+        self.verifier = verifier or VerificationAgent()
+        self.relevance_checker = relevance_checker or RelevanceChecker()
+        self.answer_cache = answer_cache  # Optional semantic cache of final answers
         self.compiled_workflow = self.build_workflow()  # Compile once during initialization
+        self.compiled_speculative_workflow = self.build_workflow(speculative=True)
+        self._speculation_pool = ThreadPoolExecutor(thread_name_prefix="speculative-research")
+        self.latencies = {
+            "sequential": deque(maxlen=1000),
+            "speculative": deque(maxlen=1000),
+            "cached": deque(maxlen=1000),
+            "first_token": deque(maxlen=1000)
+        }
         
-    def build_workflow(self):
-        """Create and compile the multi-agent workflow."""
+    def build_workflow(self, speculative: bool = False):
+        """
+        Create and compile the multi-agent workflow.
+
+        In speculative mode the first draft is generated while relevance is
+        being classified, so relevant questions go straight to verification.
+        """
         workflow = StateGraph(AgentState)
         
         # Add nodes
-        workflow.add_node("check_relevance", self._check_relevance_step)
+        if speculative:
+            workflow.add_node("check_relevance", self._speculative_relevance_step)
+        else:
+            workflow.add_node("check_relevance", self._check_relevance_step)
         workflow.add_node("research", self._research_step)
         workflow.add_node("verify", self._verification_step)
+        workflow.add_node("expand_retrieval", self._expand_retrieval_step)
         
         # Define edges
         workflow.set_entry_point("check_relevance")
-        workflow.add_conditional_edges(
-            "check_relevance",
-            self._decide_after_relevance_check,
-            {
-                "relevant": "research",
-                "irrelevant": END
-            }
-        )
+        if speculative:
+            workflow.add_conditional_edges(
+                "check_relevance",
+                self._decide_after_speculative_check,
+                {
+                    "relevant": "research",
+                    "drafted": "verify",
+                    "irrelevant": END
+                }
+            )
+        else:
+            workflow.add_conditional_edges(
+                "check_relevance",
+                self._decide_after_relevance_check,
+                {
+                    "relevant": "research",
+                    "irrelevant": END
+                }
+            )
         workflow.add_edge("research", "verify")
         workflow.add_conditional_edges(
             "verify",
             self._decide_next_step,
             {
-                "re_research": "research",
+                "re_research": "expand_retrieval",
                 "end": END
             }
         )
+        workflow.add_edge("expand_retrieval", "research")
         return workflow.compile()
     
     def _check_relevance_step(self, state: AgentState) -> Dict:
         retriever = state["retriever"]
+        documents = self._retrieve(state["question"], retriever, state["retrieval_cache"])
         classification = self.relevance_checker.check(
             question=state["question"], 
             retriever=retriever, 
-            k=20
+            k=20,
+            documents=documents
         )
+        return self._relevance_update(classification, documents)
 
+    def _relevance_update(self, classification: str, documents: List[Document]) -> Dict:
+        # The checker only calls the model when retrieval found something
+        model_calls = 1 if documents else 0
         if classification == "CAN_ANSWER":
             # We have enough info to proceed
-            return {"is_relevant": True}
+            return {"is_relevant": True, "model_calls": model_calls}
 
         elif classification == "PARTIAL":
             # There's partial coverage, but we can still proceed
             return {
-                "is_relevant": True
+                "is_relevant": True,
+                "model_calls": model_calls
             }
 
         else:  # classification == "NO_MATCH"
             return {
                 "is_relevant": False,
+                "model_calls": model_calls,
                 "draft_answer": "This question isn't related (or there's no data) for your query. Please ask another question relevant to the uploaded document(s)."
             }
 
+    @staticmethod
+    def _merge_update(state: Dict, update: Dict) -> Dict:
+        """Apply a node's partial state: cost fields are summed, others replaced."""
+        for key, value in (update or {}).items():
+            state[key] = state.get(key, 0) + value if key in COST_FIELDS else value
+        return state
+
+
+    def _speculative_relevance_step(self, state: AgentState) -> Dict:
+        """Draft an answer concurrently with the relevance check, discarding it on NO_MATCH."""
+        usage = {}
+        # Run in a copy of this context so the draft's spans join the current trace
+        draft = self._speculation_pool.submit(contextvars.copy_context().run, self._research_step, state, usage)
+        result = self._check_relevance_step(state)
+        if not result["is_relevant"]:
+            draft.cancel()  # Too late to cancel if already running; the draft is just dropped
+            logger.debug("Speculative draft discarded (NO_MATCH).")
+            return self._merge_update(result, usage)
+
+        try:
+            self._merge_update(result, draft.result())
+        except Exception as e:
+            # Fall back to the regular research node
+            logger.error(f"Speculative research failed: {e}")
+        return result
+
+    def _decide_after_speculative_check(self, state: AgentState) -> str:
+        decision = self._decide_after_relevance_check(state)
+        if decision == "relevant" and state["draft_answer"]:
+            return "drafted"
+        return decision
 
     def _decide_after_relevance_check(self, state: AgentState) -> str:
         decision = "relevant" if state["is_relevant"] else "irrelevant"
-        print(f"[DEBUG] _decide_after_relevance_check -> {decision}")
+        logger.debug(f"_decide_after_relevance_check -> {decision}")
         return decision
     
-    def full_pipeline(self, question: str, retriever: EnsembleRetriever):
+    def full_pipeline(self, question: str, retriever: BaseRetriever, speculative: bool = None, doc_set: str = None):
+        """
+        Answer `question` over the retriever's documents. Passing `doc_set`
+        (see answer_cache.document_set_key) enables the semantic answer cache.
+        """
+        if speculative is None:
+            speculative = settings.SPECULATIVE_RESEARCH
+        mode = "speculative" if speculative else "sequential"
         try:
-            print(f"[DEBUG] Starting full_pipeline with question='{question}'")
-            documents = retriever.invoke(question)
-            logger.info(f"Retrieved {len(documents)} relevant documents (from .invoke)")
-
-            initial_state = AgentState(
-                question=question,
-                documents=documents,
-                draft_answer="",
-                verification_report="",
-                is_relevant=False,
-                retriever=retriever
-            )
-            
-            final_state = self.compiled_workflow.invoke(initial_state)
-            
-            return {
-                "draft_answer": final_state["draft_answer"],
-                "verification_report": final_state["verification_report"]
-            }
+            with tracer.span("pipeline", mode=mode) as span:
+                start = time.perf_counter()
+                logger.debug(f"Starting full_pipeline with question='{question}' ({mode})")
+                vector = None
+                if self.answer_cache is not None and doc_set is not None:
+                    vector = self.answer_cache.embed(question)
+                    cached = self._cached_answer(doc_set, vector, start)
+                    if cached is not None:
+                        return cached
+
+                retrieval_cache = {}
+                documents = self._retrieve(question, retriever, retrieval_cache)
+                logger.info(f"Retrieved {len(documents)} relevant documents (from .invoke)")
+
+                initial_state = self._initial_state(question, documents, retriever, retrieval_cache)
+
+                compiled_workflow = self.compiled_speculative_workflow if speculative else self.compiled_workflow
+                final_state = compiled_workflow.invoke(initial_state)
+                result = self._final_result(final_state, mode, start, doc_set, vector)
+                span.set(**self._costs(result))
+                return result
         except Exception as e:
             logger.error(f"Workflow execution failed: {e}")
             raise
+
+    def _initial_state(self, question: str, documents: List[Document], retriever, retrieval_cache: Dict) -> AgentState:
+        return AgentState(
+            question=question,
+            documents=documents,
+            draft_answer="",
+            verification_report="",
+            is_relevant=False,
+            retriever=retriever,
+            retrieval_cache=retrieval_cache,
+            unsupported_claims=[],
+            is_supported=False,
+            research_passes=0,
+            model_calls=0,
+            prompt_tokens=0
+        )
+
+    def _final_result(self, final_state: AgentState, mode: str, start: float, doc_set: str = None, vector=None) -> Dict:
+        elapsed = time.perf_counter() - start
+        self.latencies[mode].append(elapsed)
+        logger.info(
+            f"full_pipeline ({mode}) completed in {elapsed:.2f}s: "
+            f"{final_state['research_passes']} research passes, {final_state['model_calls']} model calls, "
+            f"{final_state['prompt_tokens']} research/verification prompt tokens"
+        )
+
+        result = {
+            "draft_answer": final_state["draft_answer"],
+            "verification_report": final_state["verification_report"],
+            "research_passes": final_state["research_passes"],
+            "model_calls": final_state["model_calls"],
+            "prompt_tokens": final_state["prompt_tokens"]
+        }
+        # Only answers that passed verification are worth serving again
+        if vector is not None and final_state["is_relevant"] and final_state["is_supported"]:
+            self.answer_cache.store(doc_set, final_state["question"], vector, result)
+        result["cache_hit"] = False
+        return result
+
+    @staticmethod
+    def _costs(result: Dict) -> Dict:
+        return {key: result[key] for key in COST_FIELDS}
+
+    def _cached_answer(self, doc_set: str, vector, start: float):
+        with tracer.span("answer_cache") as span:
+            hit = self.answer_cache.lookup(doc_set, vector)
+            span.set(cache_hit=hit is not None)
+        if hit is None:
+            return None
+        result, similarity = hit
+        self.latencies["cached"].append(time.perf_counter() - start)
+        result.update({"cache_hit": True, "similarity": similarity})
+        return result
     
-    def _research_step(self, state: AgentState) -> Dict:
-        print(f"[DEBUG] Entered _research_step with question='{state['question']}'")
-        result = self.researcher.generate(state["question"], state["documents"])
-        print("[DEBUG] Researcher returned draft answer.")
-        return {"draft_answer": result["draft_answer"]}
+    def latency_summary(self) -> Dict:
+        """Per-mode pipeline latency in seconds, for comparing sequential and speculative runs."""
+        summary = {}
+        for mode, samples in self.latencies.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            summary[mode] = {
+                "count": len(ordered),
+                "mean": statistics.fmean(ordered),
+                "p50": ordered[len(ordered) // 2],
+                "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+            }
+        return summary
+
+    def _retrieve(self, question: str, retriever, cache: Dict) -> List[Document]:
+        """Run the retriever at most once per (question, retriever) within a pipeline run."""
+        key = (question, id(retriever))
+        with tracer.span("retrieval", cache_hit=key in cache) as span:
+            if key not in cache:
+                cache[key] = retriever.invoke(question)
+            else:
+                logger.debug("Reusing cached retrieval results.")
+            span.set(documents=len(cache[key]))
+        return cache[key]
+
+    def _research_step(self, state: AgentState, usage: Dict = None) -> Dict:
+        logger.debug(f"Entered _research_step with question='{state['question']}'")
+        with tracer.span("research", research_pass=state["research_passes"] + 1):
+            result = self.researcher.generate(
+                state["question"], state["documents"], unsupported_claims=state["unsupported_claims"], usage=usage
+            )
+        logger.debug("Researcher returned draft answer.")
+        return self._research_update(result)
+
+    def _research_update(self, result: Dict) -> Dict:
+        return {
+            "draft_answer": result["draft_answer"],
+            "research_passes": 1,
+            "model_calls": 1,
+            "prompt_tokens": result.get("prompt_tokens", 0)
+        }
     
     def _verification_step(self, state: AgentState) -> Dict:
-        print("[DEBUG] Entered _verification_step. Verifying the draft answer...")
-        result = self.verifier.check(state["draft_answer"], state["documents"])
-        print("[DEBUG] VerificationAgent returned a verification report.")
-        return {"verification_report": result["verification_report"]}
+        logger.debug("Entered _verification_step. Verifying the draft answer...")
+        with tracer.span("verify", research_pass=state["research_passes"]) as span:
+            result = self.verifier.check(state["draft_answer"], state["documents"])
+            update = self._verification_update(result)
+            span.set(supported=update["is_supported"], unsupported_claims=len(update["unsupported_claims"]))
+        logger.debug("VerificationAgent returned a verification report.")
+        return update
+
+    def _verification_update(self, result: Dict) -> Dict:
+        return {
+            "verification_report": result["verification_report"],
+            "is_supported": result.get("supported", True) and result.get("relevant", True),
+            "unsupported_claims": result.get("unsupported_claims", []),
+            "model_calls": 1,
+            "prompt_tokens": result.get("prompt_tokens", 0)
+        }
+
+    def _expand_retrieval_step(self, state: AgentState) -> Dict:
+        """Retrieve again with a query aimed at the unsupported claims and a wider k."""
+        query, retriever = self._expansion(state)
+        with tracer.span("expand_retrieval", research_pass=state["research_passes"] + 1) as span:
+            documents = retriever.invoke(query)
+            span.set(documents=len(documents))
+        logger.info(f"Re-research pass {state['research_passes'] + 1}: retrieved {len(documents)} documents.")
+        return {"documents": documents}
+
+    def _expansion(self, state: AgentState) -> Tuple[str, BaseRetriever]:
+        """The rewritten query and widened retriever for the next research pass."""
+        query = " ".join([state["question"], *state["unsupported_claims"]])
+        # Each pass doubles the number of chunks considered
+        retriever = widen_retriever(state["retriever"], 2 ** state["research_passes"])
+        return query, retriever
     
     def _decide_next_step(self, state: AgentState) -> str:
-        verification_report = state["verification_report"]
-        print(f"[DEBUG] _decide_next_step with verification_report='{verification_report}'")
-        if "Supported: NO" in verification_report or "Relevant: NO" in verification_report:
-            logger.info("[DEBUG] Verification indicates re-research needed.")
-            return "re_research"
-        else:
-            logger.info("[DEBUG] Verification successful, ending workflow.")
+        logger.debug(f"_decide_next_step with verification_report='{state['verification_report']}'")
+        if state["is_supported"]:
+            logger.info("Verification successful, ending workflow.")
             return "end"
+        if state["research_passes"] >= settings.RESEARCH_MAX_PASSES:
+            logger.info(f"Verification failed but the limit of {settings.RESEARCH_MAX_PASSES} research passes is reached; ending workflow.")
+            return "end"
+        logger.info("Verification indicates re-research needed.")
+        return "re_research"
+
+
+class AsyncAgentWorkflow(AgentWorkflow):
+    """
+    AgentWorkflow whose nodes await the agents' async model calls, so many
+    sessions can share one event loop. Model calls are bounded per model by
+    MODEL_MAX_CONCURRENCY. Use `afull_pipeline` from async code.
+    """
+
+    async def afull_pipeline(self, question: str, retriever: BaseRetriever, speculative: bool = None, doc_set: str = None):
+        if speculative is None:
+            speculative = settings.SPECULATIVE_RESEARCH
+        mode = "speculative" if speculative else "sequential"
+        try:
+            with tracer.span("pipeline", mode=mode) as span:
+                start = time.perf_counter()
+                logger.debug(f"Starting afull_pipeline with question='{question}' ({mode})")
+                vector = None
+                if self.answer_cache is not None and doc_set is not None:
+                    vector = await asyncio.to_thread(self.answer_cache.embed, question)
+                    cached = self._cached_answer(doc_set, vector, start)
+                    if cached is not None:
+                        return cached
+
+                initial_state = await self._ainitial_state(question, retriever)
+                compiled_workflow = self.compiled_speculative_workflow if speculative else self.compiled_workflow
+                final_state = await compiled_workflow.ainvoke(initial_state)
+                result = self._final_result(final_state, mode, start, doc_set, vector)
+                span.set(**self._costs(result))
+                return result
+        except Exception as e:
+            logger.error(f"Workflow execution failed: {e}")
+            raise
+
+    async def astream_pipeline(self, question: str, retriever: BaseRetriever, speculative: bool = None,
+                               doc_set: str = None) -> AsyncIterator[Dict]:
+        """
+        Like `afull_pipeline`, but yields events while the graph runs:
+
+        - {"type": "stage", "node": name}: a graph node finished
+        - {"type": "draft"}: a new draft answer starts; discard earlier tokens
+        - {"type": "token", "text": delta}: the next piece of the draft answer
+        - {"type": "result", "result": result}: the final result, always last
+        """
+        if speculative is None:
+            speculative = settings.SPECULATIVE_RESEARCH
+        mode = "speculative" if speculative else "sequential"
+        try:
+            start = time.perf_counter()
+            logger.debug(f"Starting astream_pipeline with question='{question}' ({mode})")
+            vector = None
+            if self.answer_cache is not None and doc_set is not None:
+                vector = await asyncio.to_thread(self.answer_cache.embed, question)
+                cached = self._cached_answer(doc_set, vector, start)
+                if cached is not None:
+                    yield {"type": "result", "result": cached}
+                    return
+
+            state = await self._ainitial_state(question, retriever)
+            compiled_workflow = self.compiled_speculative_workflow if speculative else self.compiled_workflow
+            first_token = True
+            async for stream_mode, event in compiled_workflow.astream(
+                state,
+                config={"configurable": {"stream_tokens": settings.STREAM_ANSWERS}},
+                stream_mode=["updates", "custom"]
+            ):
+                if stream_mode == "custom":
+                    if event["type"] == "token" and first_token:
+                        first_token = False
+                        self.latencies["first_token"].append(time.perf_counter() - start)
+                    yield event
+                    continue
+                for node, update in event.items():
+                    self._merge_update(state, update)
+                    yield {"type": "stage", "node": node}
+
+            result = self._final_result(state, mode, start, doc_set, vector)
+            # Recorded after the fact: a span held open across yields would leak into the consumer's context
+            tracer.record("pipeline", time.perf_counter() - start, mode=mode, streamed=True, **self._costs(result))
+            yield {"type": "result", "result": result}
+        except Exception as e:
+            logger.error(f"Workflow execution failed: {e}")
+            raise
+
+    async def _ainitial_state(self, question: str, retriever: BaseRetriever) -> AgentState:
+        retrieval_cache = {}
+        documents = await self._aretrieve(question, retriever, retrieval_cache)
+        logger.info(f"Retrieved {len(documents)} relevant documents (from .ainvoke)")
+        return self._initial_state(question, documents, retriever, retrieval_cache)
+
+    def full_pipeline(self, question: str, retriever: BaseRetriever, speculative: bool = None, doc_set: str = None):
+        """Blocking entry point for callers without an event loop."""
+        return asyncio.run(self.afull_pipeline(question, retriever, speculative, doc_set))
+
+    async def _aretrieve(self, question: str, retriever, cache: Dict) -> List[Document]:
+        key = (question, id(retriever))
+        with tracer.span("retrieval", cache_hit=key in cache) as span:
+            if key not in cache:
+                cache[key] = await retriever.ainvoke(question)
+            else:
+                logger.debug("Reusing cached retrieval results.")
+            span.set(documents=len(cache[key]))
+        return cache[key]
+
+    async def _check_relevance_step(self, state: AgentState) -> Dict:
+        retriever = state["retriever"]
+        documents = await self._aretrieve(state["question"], retriever, state["retrieval_cache"])
+        classification = await self.relevance_checker.acheck(
+            question=state["question"],
+            retriever=retriever,
+            k=20,
+            documents=documents
+        )
+        return self._relevance_update(classification, documents)
+
+    async def _speculative_relevance_step(self, state: AgentState, config: RunnableConfig = None,
+                                          writer: StreamWriter = None) -> Dict:
+        usage = {}
+        held = []  # The draft's stream events, released only once the question is known to be relevant
+
+        def hold(event: Dict) -> None:
+            if held is None:
+                writer(event)
+            else:
+                held.append(event)
+
+        draft = asyncio.ensure_future(self._research_step(state, config, hold if writer is not None else None, usage))
+        result = await self._check_relevance_step(state)
+        if not result["is_relevant"]:
+            draft.cancel()
+            logger.debug("Speculative draft discarded (NO_MATCH).")
+            # The model call may already be under way; its prompt is paid for either way
+            return self._merge_update(result, usage)
+
+        for event in held:
+            writer(event)
+        held = None
+        try:
+            self._merge_update(result, await draft)
+        except Exception as e:
+            # Fall back to the regular research node
+            logger.error(f"Speculative research failed: {e}")
+        return result
+
+    async def _research_step(self, state: AgentState, config: RunnableConfig = None,
+                             writer: StreamWriter = None, usage: Dict = None) -> Dict:
+        """Draft an answer; under `astream_pipeline` its tokens are written to the graph stream."""
+        logger.debug(f"Entered _research_step with question='{state['question']}'")
+        on_token = None
+        if writer is not None and (config or {}).get("configurable", {}).get("stream_tokens"):
+            writer({"type": "draft"})
+            on_token = lambda text: writer({"type": "token", "text": text})
+        with tracer.span("research", research_pass=state["research_passes"] + 1):
+            result = await self.researcher.agenerate(
+                state["question"], state["documents"], on_token=on_token, unsupported_claims=state["unsupported_claims"],
+                usage=usage
+            )
+        logger.debug("Researcher returned draft answer.")
+        return self._research_update(result)
+
+    async def _verification_step(self, state: AgentState) -> Dict:
+        logger.debug("Entered _verification_step. Verifying the draft answer...")
+        with tracer.span("verify", research_pass=state["research_passes"]) as span:
+            result = await self.verifier.acheck(state["draft_answer"], state["documents"])
+            update = self._verification_update(result)
+            span.set(supported=update["is_supported"], unsupported_claims=len(update["unsupported_claims"]))
+        logger.debug("VerificationAgent returned a verification report.")
+        return update
+
+    async def _expand_retrieval_step(self, state: AgentState) -> Dict:
+        query, retriever = self._expansion(state)
+        with tracer.span("expand_retrieval", research_pass=state["research_passes"] + 1) as span:
+            documents = await retriever.ainvoke(query)
+            span.set(documents=len(documents))
+        logger.info(f"Re-research pass {state['research_passes'] + 1}: retrieved {len(documents)} documents.")
+        return {"documents": documents}
@@ -1,13 +1,31 @@
 import gradio as gr
-import hashlib
 from typing import List, Dict
+import asyncio
 import os
+import sys
 
-from document_processor.file_handler import DocumentProcessor
-from retriever.builder import RetrieverBuilder
-from agents.workflow import AgentWorkflow
-from config import constants, settings
+from document_processor.file_descriptor import describe_files
+from retriever.pool import RetrieverPool, estimate_retriever_bytes
+from agents.answer_cache import AnswerCache, document_set_key
+from config import constants
+from config.settings import settings
 from utils.logging import logger
+from utils.startup import Lazy, StartupReport
+from utils.tracing import start_metrics_server
+
+# Imported by the warm-up thread in fast-start mode, heaviest dependencies first.
+# Each entry is timed separately for the startup report.
+HEAVY_MODULES = [
+    "docling.document_converter",
+    "chromadb",
+    "langchain_community.vectorstores",
+    "ibm_watsonx_ai",
+    "langchain_ibm",
+    "langgraph.graph",
+    "document_processor.file_handler",
+    "retriever.builder",
+    "agents.workflow",
+]
 
 # 1) Define some example data 
 #    (i.e. question + paths to documents relevant to that question).
@@ -22,10 +40,76 @@ EXAMPLES = {
     }
 }
 
-def main():
+# Shown in the verification box while a question is answered; keyed by the step
+# that is starting, or by the graph node that just finished
+STAGE_MESSAGES = {
+    "process": "📄 Processing documents...",
+    "retrieve": "⏳ Retrieving relevant passages...",
+    "drafting": "✍️ Drafting the answer...",
+    "check_relevance": "✍️ Drafting the answer...",
+    "research": "🔎 Verifying the draft answer...",
+    "verify": "🔎 Checking the verification result...",
+    "expand_retrieval": "🔁 Re-researching the unsupported claims...",
+}
+
+
+def build_processor():
+    from document_processor.file_handler import DocumentProcessor
     processor = DocumentProcessor()
-    retriever_builder = RetrieverBuilder()
-    workflow = AgentWorkflow()
+    if settings.CACHE_SWEEP_ON_STARTUP:
+        processor.cache.start_background_sweep()
+    return processor
+
+
+def build_retriever_builder():
+    from retriever.builder import RetrieverBuilder
+    return RetrieverBuilder()
+
+
+def main():
+    startup = StartupReport()
+
+    # Docling, Chroma, WatsonX and the agents are only built on first use (or by
+    # the warm-up thread once the UI is serving) when FAST_START is on
+    processor = Lazy("DocumentProcessor", build_processor)
+    retriever_builder = Lazy("RetrieverBuilder", build_retriever_builder)
+    # Shared across sessions so identical document sets are indexed once
+    retriever_pool = RetrieverPool(max_bytes=settings.RETRIEVER_POOL_MAX_BYTES)
+
+    def build_workflow():
+        from agents.workflow import AsyncAgentWorkflow
+
+        # Repeated or near-identical questions on the same documents skip the agents
+        answer_cache = None
+        if settings.ANSWER_CACHE_ENABLED:
+            answer_cache = AnswerCache(
+                retriever_builder.get().question_embeddings,
+                threshold=settings.ANSWER_CACHE_SIMILARITY,
+                ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+                max_entries=settings.ANSWER_CACHE_MAX_ENTRIES
+            )
+
+        # Model calls are awaited, so one event loop serves many sessions
+        return AsyncAgentWorkflow(answer_cache=answer_cache)
+
+    workflow = Lazy("AgentWorkflow", build_workflow)
+    components = [processor, retriever_builder, workflow]
+
+    def cache_stats_report() -> Dict:
+        built_processor = processor.peek()
+        built_workflow = workflow.peek()
+        model_registry = sys.modules.get("agents.model_registry")
+        return {
+            "startup": startup.as_dict(),
+            "document_cache": built_processor.cache.stats() if built_processor else None,
+            "near_duplicates_removed": built_processor.near_duplicates_removed if built_processor else None,
+            "retriever_pool": retriever_pool.stats(),
+            "answer_cache": built_workflow.answer_cache.stats() if built_workflow and built_workflow.answer_cache else None,
+            "models": model_registry.model_registry.metrics() if model_registry else {}
+        }
+
+    if not settings.FAST_START:
+        startup.warm(HEAVY_MODULES, components)
 
     # Define custom CSS for styling
     css = """
@@ -89,10 +173,14 @@ def main():
         gr.Markdown("⚠️ **Note:** DocChat only accepts documents in these formats: '.pdf', '.docx', '.txt', '.md'", elem_classes="text")
 
         # 2) Maintain the session state for retrieving doc changes
+        def release_session(state: Dict):
+            if state and state["retriever"] is not None:
+                retriever_pool.release(state["file_hashes"])
+
         session_state = gr.State({
             "file_hashes": frozenset(),
             "retriever": None
-        })
+        }, delete_callback=release_session)
 
         # 3) Layout 
         with gr.Row():
@@ -116,6 +204,10 @@ def main():
                 answer_output = gr.Textbox(label="🐥 Answer", interactive=False)
                 verification_output = gr.Textbox(label="✅ Verification Report")
 
+                with gr.Accordion("📊 Cache & Model Stats", open=False):
+                    cache_stats = gr.JSON(value=cache_stats_report)
+                    refresh_cache_btn = gr.Button("Refresh Stats 🔄")
+
         # 4) Helper function to load example into the UI
         def load_example(example_key: str):
             """
@@ -150,52 +242,92 @@ def main():
         )
 
         # 5) Standard flow for question submission
-        def process_question(question_text: str, uploaded_files: List, state: Dict):
-            """Handle questions with document caching."""
+        async def process_question(question_text: str, uploaded_files: List, state: Dict):
+            """Handle questions with document caching, streaming the draft answer as it is generated."""
             try:
                 if not question_text.strip():
                     raise ValueError("❌ Question cannot be empty")
                 if not uploaded_files:
                     raise ValueError("❌ No documents uploaded")
 
-                current_hashes = _get_file_hashes(uploaded_files)
+                # Hash and size every upload in one streaming pass, shared with the processor
+                descriptors = await asyncio.to_thread(describe_files, uploaded_files)
+                current_hashes = frozenset(d.sha256 for d in descriptors)
                 
                 if state["retriever"] is None or current_hashes != state["file_hashes"]:
                     logger.info("Processing new/changed documents...")
-                    chunks = processor.process(uploaded_files)
-                    retriever = retriever_builder.build_hybrid_retriever(chunks)
+                    yield "", STAGE_MESSAGES["process"], state
+
+                    def build():
+                        chunks = processor.get().process(descriptors)
+                        return retriever_builder.get().build_hybrid_retriever(chunks), estimate_retriever_bytes(chunks)
+
+                    # Conversion and indexing are CPU/IO bound; keep them off the event loop
+                    retriever = await asyncio.to_thread(retriever_pool.acquire, current_hashes, build)
+                    release_session(state)
                     
                     state.update({
                         "file_hashes": current_hashes,
                         "retriever": retriever
                     })
                 
-                result = workflow.full_pipeline(
+                agent_workflow = await asyncio.to_thread(workflow.get)
+                draft = ""
+                yield draft, STAGE_MESSAGES["retrieve"], state
+                async for event in agent_workflow.astream_pipeline(
                     question=question_text,
-                    retriever=state["retriever"]
-                )
+                    retriever=state["retriever"],
+                    doc_set=document_set_key(state["file_hashes"])
+                ):
+                    if event["type"] == "draft":
+                        draft = ""
+                    elif event["type"] == "token":
+                        draft += event["text"]
+                        yield draft, STAGE_MESSAGES["drafting"], state
+                    elif event["type"] == "stage":
+                        yield draft, STAGE_MESSAGES.get(event["node"], ""), state
+                    elif event["type"] == "result":
+                        result = event["result"]
+
+                verification_report = result["verification_report"]
+                if result["cache_hit"]:
+                    verification_report = f"♻️ Served from answer cache (similarity {result['similarity']:.2f})\n\n{verification_report}"
                 
-                return result["draft_answer"], result["verification_report"], state
+                yield result["draft_answer"], verification_report, state
                     
             except Exception as e:
                 logger.error(f"Processing error: {str(e)}")
-                return f"❌ Error: {str(e)}", "", state
+                yield f"❌ Error: {str(e)}", "", state
 
         submit_btn.click(
             fn=process_question,
             inputs=[question, files, session_state],
-            outputs=[answer_output, verification_output, session_state]
+            outputs=[answer_output, verification_output, session_state],
+            concurrency_limit=settings.UI_CONCURRENCY_LIMIT
+        )
+
+        refresh_cache_btn.click(
+            fn=cache_stats_report,
+            inputs=[],
+            outputs=[cache_stats]
         )
 
-    demo.launch(server_name="127.0.0.1", server_port=5000, share=True)
+    if settings.METRICS_PORT:
+        start_metrics_server(settings.METRICS_PORT)
 
-def _get_file_hashes(uploaded_files: List) -> frozenset:
-    """Generate SHA-256 hashes for uploaded files."""
-    hashes = set()
-    for file in uploaded_files:
-        with open(file.name, "rb") as f:
-            hashes.add(hashlib.sha256(f.read()).hexdigest())
-    return frozenset(hashes)
+    # Return once the server is listening, so "UI ready" is measured then and
+    # the warm-up imports do not compete with Gradio's own startup
+    demo.launch(server_name="127.0.0.1", server_port=5000, share=True, prevent_thread_lock=True)
+    startup.mark_ui_ready()
+    if settings.FAST_START:
+        startup.warm_in_background(HEAVY_MODULES, components)
+    try:
+        demo.block_thread()
+    finally:
+        # Shut down the Docling conversion workers with the server
+        built_processor = processor.peek()
+        if built_processor is not None:
+            built_processor.close()
 
 if __name__ == "__main__":
     main()
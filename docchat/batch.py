@@ -0,0 +1,176 @@
+"""
+Answer a file of questions over a fixed document set, without the UI.
+
+The documents are converted and indexed once and every question is embedded
+in one batched call. The agent workflow then answers up to `--concurrency`
+questions at a time. Each result is written as one JSON line as soon as its
+question finishes, with its index in the questions file and its timings.
+
+Questions are read one per line; blank lines and lines starting with # are
+skipped. A .jsonl file of {"question": ...} objects also works.
+
+Run from the docchat directory:
+    python batch.py --documents report.pdf appendix.pdf --questions checklist.txt --output results.jsonl
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Callable, Dict, List, Tuple
+from langchain_core.retrievers import BaseRetriever
+from agents.answer_cache import AnswerCache, document_set_key
+from config.settings import settings
+from document_processor.file_descriptor import describe_files
+from utils.logging import logger
+
+
+def load_questions(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        lines = [line.strip() for line in f]
+    if path.endswith(".jsonl"):
+        return [json.loads(line)["question"] for line in lines if line]
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+class BatchRunner:
+    """
+    Runs many questions against one document set. The processor, retriever
+    builder and workflow are created on demand unless stand-ins are injected.
+    """
+
+    def __init__(self, processor=None, retriever_builder=None, workflow=None, concurrency: int = None):
+        if processor is None:
+            from document_processor.file_handler import DocumentProcessor
+            processor = DocumentProcessor()
+        if retriever_builder is None:
+            from retriever.builder import RetrieverBuilder
+            retriever_builder = RetrieverBuilder()
+        if workflow is None:
+            from agents.workflow import AsyncAgentWorkflow
+            answer_cache = None
+            if settings.ANSWER_CACHE_ENABLED:
+                answer_cache = AnswerCache(
+                    retriever_builder.question_embeddings,
+                    threshold=settings.ANSWER_CACHE_SIMILARITY,
+                    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+                    max_entries=settings.ANSWER_CACHE_MAX_ENTRIES
+                )
+            workflow = AsyncAgentWorkflow(answer_cache=answer_cache)
+        self.processor = processor
+        self.retriever_builder = retriever_builder
+        self.workflow = workflow
+        self.concurrency = max(1, concurrency or settings.BATCH_CONCURRENCY)
+
+    def build_retriever(self, documents: List[str]) -> Tuple[BaseRetriever, str]:
+        """Convert and index the documents once; returns the retriever and the document set key."""
+        descriptors = describe_files(documents)
+        chunks = self.processor.process(descriptors)
+        retriever = self.retriever_builder.build_hybrid_retriever(chunks)
+        return retriever, document_set_key(d.sha256 for d in descriptors)
+
+    def embed_questions(self, questions: List[str]) -> None:
+        """
+        Embed every question in one batched call. The vectors land in the
+        embedding cache, where retrieval and the answer cache look them up.
+        """
+        embedders = [self.retriever_builder.embeddings]
+        answer_cache = getattr(self.workflow, "answer_cache", None)
+        if answer_cache is not None and answer_cache.embeddings is not embedders[0]:
+            # The answer cache embeds whole questions with its own model settings
+            embedders.append(answer_cache.embeddings)
+        for embeddings in embedders:
+            if hasattr(embeddings, "embed_queries"):
+                embeddings.embed_queries(questions)
+            else:
+                logger.warning("Embedding cache disabled; questions will be embedded one at a time.")
+                break
+
+    async def arun(self, questions: List[str], retriever: BaseRetriever, doc_set: str = None,
+                   on_result: Callable[[Dict], None] = None) -> List[Dict]:
+        """Answer the questions with bounded concurrency; results keep the questions' order."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def answer(index: int, question: str) -> Dict:
+            queued = time.perf_counter()
+            async with semaphore:
+                start = time.perf_counter()
+                record = {"index": index, "question": question}
+                try:
+                    result = await self.workflow.afull_pipeline(question, retriever, doc_set=doc_set)
+                    record.update({
+                        "answer": result["draft_answer"],
+                        "verification_report": result["verification_report"],
+                        "cache_hit": result["cache_hit"],
+                        "research_passes": result.get("research_passes", 0),
+                        "model_calls": result.get("model_calls", 0),
+                        "prompt_tokens": result.get("prompt_tokens", 0),
+                        "error": None
+                    })
+                except Exception as e:
+                    logger.error(f"Question {index} failed: {e}")
+                    record["error"] = str(e)
+                record["timings"] = {
+                    "wait_seconds": round(start - queued, 4),
+                    "seconds": round(time.perf_counter() - start, 4)
+                }
+            if on_result is not None:
+                on_result(record)
+            return record
+
+        return list(await asyncio.gather(*(answer(i, question) for i, question in enumerate(questions))))
+
+    def run(self, documents: List[str], questions: List[str], output_path: str) -> Dict:
+        """Index, embed and answer, writing JSONL to `output_path`; returns a timing summary."""
+        start = time.perf_counter()
+        retriever, doc_set = self.build_retriever(documents)
+        indexed = time.perf_counter()
+        self.embed_questions(questions)
+        embedded = time.perf_counter()
+
+        with open(output_path, "w", encoding="utf-8") as f:
+            def write(record: Dict) -> None:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+
+            records = asyncio.run(self.arun(questions, retriever, doc_set, on_result=write))
+        finished = time.perf_counter()
+
+        seconds = sorted(record["timings"]["seconds"] for record in records)
+        return {
+            "questions": len(records),
+            "failed": sum(1 for record in records if record["error"]),
+            "cache_hits": sum(1 for record in records if record.get("cache_hit")),
+            "concurrency": self.concurrency,
+            "index_seconds": round(indexed - start, 3),
+            "embed_seconds": round(embedded - indexed, 3),
+            "answer_seconds": round(finished - embedded, 3),
+            "question_p50_seconds": seconds[len(seconds) // 2] if seconds else None,
+            "question_p95_seconds": seconds[min(len(seconds) - 1, int(len(seconds) * 0.95))] if seconds else None,
+            "question_mean_seconds": round(statistics.fmean(seconds), 4) if seconds else None
+        }
+
+    def close(self) -> None:
+        self.processor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a file of questions over a fixed document set")
+    parser.add_argument("--documents", nargs="+", required=True, help="Files to answer from")
+    parser.add_argument("--questions", required=True, help="One question per line, or .jsonl with a 'question' field")
+    parser.add_argument("--output", required=True, help="JSONL file to write one result per question to")
+    parser.add_argument("--concurrency", type=int, default=settings.BATCH_CONCURRENCY,
+                        help=f"Questions answered at once (default: {settings.BATCH_CONCURRENCY})")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    runner = BatchRunner(concurrency=args.concurrency)
+    try:
+        summary = runner.run(args.documents, questions, args.output)
+    finally:
+        runner.close()
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
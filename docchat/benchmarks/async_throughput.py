@@ -0,0 +1,87 @@
+"""
+Throughput of the async docchat pipeline against the blocking one under many
+concurrent sessions, using FakeModelInference with simulated model latency.
+
+Run from the docchat directory:
+    python -m benchmarks.async_throughput --sessions 50 --latency 0.5
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from langchain.schema import Document
+from agents.relevance_checker import RelevanceChecker
+from agents.research_agent import ResearchAgent
+from agents.verification_agent import VerificationAgent
+from agents.workflow import AgentWorkflow, AsyncAgentWorkflow
+from benchmarks.fakes import FakeModelInference, StaticRetriever
+
+
+def build_workflow(cls, latency: float):
+    return cls(
+        researcher=ResearchAgent(model=FakeModelInference("fake/research", latency)),
+        verifier=VerificationAgent(model=FakeModelInference("fake/verify", latency)),
+        relevance_checker=RelevanceChecker(model=FakeModelInference("fake/relevance", latency))
+    )
+
+
+def summarize(mode: str, latencies, wall: float) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "mode": mode,
+        "sessions": len(ordered),
+        "wall_seconds": round(wall, 3),
+        "throughput_qps": round(len(ordered) / wall, 2),
+        "p50_seconds": round(ordered[len(ordered) // 2], 3),
+        "p99_seconds": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 3),
+        "mean_seconds": round(statistics.fmean(ordered), 3)
+    }
+
+
+async def run_async(workflow, retriever, sessions: int) -> dict:
+    async def one(i):
+        start = time.perf_counter()
+        await workflow.afull_pipeline(f"Question {i}?", retriever)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(one(i) for i in range(sessions)))
+    return summarize("async", latencies, time.perf_counter() - start)
+
+
+def run_blocking(workflow, retriever, sessions: int, threads: int) -> dict:
+    def one(i):
+        start = time.perf_counter()
+        workflow.full_pipeline(f"Question {i}?", retriever)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        latencies = list(pool.map(one, range(sessions)))
+    return summarize(f"blocking({threads} threads)", latencies, time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark async vs blocking docchat pipelines")
+    parser.add_argument("--sessions", type=int, default=50, help="Concurrent sessions (default: 50)")
+    parser.add_argument("--latency", type=float, default=0.5, help="Simulated seconds per model call")
+    parser.add_argument("--threads", type=int, default=4, help="Worker threads for the blocking baseline")
+    parser.add_argument("--chunks", type=int, default=20, help="Documents returned by the retriever")
+    args = parser.parse_args()
+
+    retriever = StaticRetriever(documents=[
+        Document(page_content=f"Section {i}: synthetic benchmark passage number {i}.")
+        for i in range(args.chunks)
+    ])
+
+    results = [
+        asyncio.run(run_async(build_workflow(AsyncAgentWorkflow, args.latency), retriever, args.sessions)),
+        run_blocking(build_workflow(AgentWorkflow, args.latency), retriever, args.sessions, args.threads)
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Effect of token-capped sub-splitting on chunk sizes, retrieval precision and
+prompt size for one document, compared with header-only splitting.
+
+Retrieval uses BM25 alone so no embedding service is needed. Precision is
+measured against --keywords: chunk precision is the share of retrieved
+chunks mentioning one, token precision the share of retrieved tokens on
+lines mentioning one. The defaults target the DeepSeek-R1 coding benchmarks
+asked about in the app's example.
+
+Run from the docchat directory:
+    python -m benchmarks.chunking --file "examples/DeepSeek Technical Report.pdf"
+"""
+import argparse
+import json
+import tempfile
+from docling.document_converter import DocumentConverter
+from langchain.schema import Document
+from langchain_text_splitters import MarkdownHeaderTextSplitter
+from agents.context_packer import ContextPacker
+from config.settings import settings
+from document_processor.file_handler import _chunk_stats, _split_oversized
+from retriever.bm25_index import BM25Index
+from utils.tokens import count_tokens
+
+DEFAULT_QUESTION = "Summarize DeepSeek-R1 model's performance evaluation on all coding tasks against OpenAI o1-mini model"
+DEFAULT_KEYWORDS = ["LiveCodeBench", "Codeforces", "SWE-bench", "Aider", "o1-mini"]
+HEADERS = [("#", "Header 1"), ("##", "Header 2")]
+
+
+def evaluate(name: str, sections, chunks, question: str, keywords, k: int, index_dir: str) -> dict:
+    docs = [Document(page_content=chunk.page_content, metadata=dict(chunk.metadata)) for chunk in chunks]
+    retrieved = BM25Index(index_dir).retriever(docs, k=k).invoke(question)
+    packed = ContextPacker(token_budget=10 ** 9).pack(retrieved)
+    relevant_chunks = sum(mentions(doc.page_content, keywords) for doc in retrieved)
+    relevant_tokens = sum(
+        count_tokens(line) for doc in retrieved for line in doc.page_content.splitlines() if mentions(line, keywords)
+    )
+    return {
+        "splitting": name,
+        **_chunk_stats(sections, chunks),
+        f"chunk_precision_at_{k}": round(relevant_chunks / len(retrieved), 3) if retrieved else 0.0,
+        "token_precision": round(relevant_tokens / packed.used_tokens, 3) if packed.used_tokens else 0.0,
+        "prompt_context_tokens": packed.used_tokens
+    }
+
+
+def mentions(text: str, keywords) -> bool:
+    text = text.lower()
+    return any(keyword.lower() in text for keyword in keywords)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark token-capped chunking")
+    parser.add_argument("--file", default="examples/DeepSeek Technical Report.pdf")
+    parser.add_argument("--question", default=DEFAULT_QUESTION)
+    parser.add_argument("--keywords", nargs="+", default=DEFAULT_KEYWORDS)
+    parser.add_argument("--k", type=int, default=settings.BM25_SEARCH_K, help="Chunks retrieved per question")
+    parser.add_argument("--max-tokens", type=int, default=settings.CHUNK_MAX_TOKENS or 512)
+    parser.add_argument("--overlap", type=int, default=settings.CHUNK_OVERLAP_TOKENS)
+    args = parser.parse_args()
+
+    markdown = DocumentConverter().convert(args.file).document.export_to_markdown()
+    sections = MarkdownHeaderTextSplitter(HEADERS).split_text(markdown)
+    capped = _split_oversized(sections, args.max_tokens, args.overlap)
+
+    # Scratch BM25 index so the app's persisted one is left alone
+    with tempfile.TemporaryDirectory() as index_dir:
+        print(json.dumps([
+            evaluate("headers", sections, sections, args.question, args.keywords, args.k, index_dir),
+            evaluate(f"headers+{args.max_tokens} tokens", sections, capped, args.question, args.keywords, args.k, index_dir)
+        ], indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Local, deterministic stand-ins for the IBM WatsonX services used by docchat,
+so the pipeline can be exercised and timed without cloud access.
+"""
+import asyncio
+import hashlib
+import random
+import re
+import time
+from typing import Dict, List
+import numpy as np
+from langchain.schema import Document
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+
+VERIFICATION_REPLY = (
+    "Supported: YES\n"
+    "Unsupported Claims: []\n"
+    "Contradictions: []\n"
+    "Relevant: YES\n"
+    "Additional Details: Verified against the provided context."
+)
+
+
+class FakeModelInference:
+    """
+    Mimics ModelInference.chat/achat, answering each agent's prompt
+    deterministically after `latency` seconds. achat_stream yields the same
+    answer word by word, `token_latency` seconds apart, after `latency`.
+    """
+
+    def __init__(self, model_id: str = "fake/model", latency: float = 0.0, params: Dict = None,
+                 token_latency: float = 0.0):
+        self.model_id = model_id
+        self.latency = latency
+        self.token_latency = token_latency
+        self.params = params or {}
+        self.calls = 0
+
+    def chat(self, messages: List[Dict], **kwargs) -> Dict:
+        time.sleep(self.latency)
+        return self._reply(messages)
+
+    async def achat(self, messages: List[Dict], **kwargs) -> Dict:
+        await asyncio.sleep(self.latency)
+        return self._reply(messages)
+
+    async def achat_stream(self, messages: List[Dict], **kwargs):
+        content = self._reply(messages)["choices"][0]["message"]["content"]
+
+        async def stream():
+            await asyncio.sleep(self.latency)
+            for i, word in enumerate(content.split(" ")):
+                if i:
+                    await asyncio.sleep(self.token_latency)
+                yield {"choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}}]}
+
+        return stream()
+
+    def _reply(self, messages: List[Dict]) -> Dict:
+        self.calls += 1
+        prompt = messages[-1]["content"]
+        if "relevance checker" in prompt:
+            content = "CAN_ANSWER"
+        elif "verify the accuracy" in prompt:
+            content = VERIFICATION_REPLY
+        else:
+            context = prompt.split("**Context:**", 1)[-1].split()
+            content = "Based on the context: " + " ".join(context[:40])
+        return {"choices": [{"message": {"role": "assistant", "content": content}}]}
+
+
+class StaticRetriever(BaseRetriever):
+    """Returns the same documents for every query."""
+    documents: List[Document]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return self.documents
+
+
+class RankedRetriever(BaseRetriever):
+    """
+    Returns `k` documents drawn pseudo-randomly per query after `latency`
+    seconds, standing in for a real search over a large corpus.
+    """
+    documents: List[Document]
+    k: int = 10
+    latency: float = 0.0
+    seed: int = 0
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        time.sleep(self.latency)
+        rng = random.Random(f"{self.seed}:{query}")
+        return [self.documents[i] for i in rng.sample(range(len(self.documents)), self.k)]
+
+
+class FakeWatsonxEmbeddings(Embeddings):
+    """
+    Mimics WatsonxEmbeddings with hashed bag-of-words vectors, so texts sharing
+    words are close. Each request sleeps `latency` seconds plus
+    `latency_per_text` per text, with documents sent in batches of `batch_size`.
+    """
+
+    def __init__(self, model_id: str = "fake/embedding", size: int = 768, latency: float = 0.0,
+                 latency_per_text: float = 0.0, batch_size: int = 1000):
+        self.model_id = model_id
+        self.size = size
+        self.latency = latency
+        self.latency_per_text = latency_per_text
+        self.batch_size = batch_size
+        self.calls = 0
+        self.texts = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = []
+        for i in range(0, len(texts), self.batch_size):
+            batch = texts[i:i + self.batch_size]
+            self._wait(len(batch))
+            vectors.extend(self._vector(text) for text in batch)
+        return vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        self._wait(1)
+        return self._vector(text)
+
+    def _wait(self, texts: int) -> None:
+        self.calls += 1
+        self.texts += texts
+        time.sleep(self.latency + self.latency_per_text * texts)
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            digest = hashlib.blake2b(word.encode(), digest_size=8).digest()
+            bucket = int.from_bytes(digest, "little")
+            vector[bucket % self.size] += 1.0 if bucket & (1 << 63) else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
@@ -0,0 +1,195 @@
+"""
+End-to-end docchat benchmark that needs no IBM cloud access.
+
+DocumentProcessor, RetrieverBuilder and AgentWorkflow run unchanged, with
+FakeWatsonxEmbeddings and FakeModelInference standing in for WatsonX. The
+bundled example PDF and synthetic markdown corpora of increasing size are
+ingested, indexed, searched and answered. For each corpus the report has:
+- ingestion throughput, cold and from the document cache
+- retriever build time
+- retrieval p50/p99
+- end-to-end pipeline p50/p99
+
+Everything runs in a scratch directory, so the app's caches and Chroma
+store are left alone.
+
+Run from the docchat directory:
+    python -m benchmarks.pipeline --sizes 100 1000 10000 --output benchmark.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import tempfile
+import time
+from typing import Dict, List
+from agents.relevance_checker import RelevanceChecker
+from agents.research_agent import ResearchAgent
+from agents.verification_agent import VerificationAgent
+from agents.workflow import AgentWorkflow
+from benchmarks.fakes import FakeModelInference, FakeWatsonxEmbeddings
+from document_processor.file_handler import DocumentProcessor
+from retriever.builder import RetrieverBuilder
+
+EXAMPLE_PDF = "examples/DeepSeek Technical Report.pdf"
+EXAMPLE_QUESTIONS = [
+    "Summarize DeepSeek-R1 model's performance evaluation on all coding tasks against OpenAI o1-mini model",
+    "How was DeepSeek-R1-Zero trained with reinforcement learning?",
+    "What distilled models were released and how do they perform on AIME 2024?",
+    "What are the limitations of DeepSeek-R1?",
+]
+SECTIONS_PER_FILE = 50
+
+
+def latency_stats(samples: List[float]) -> Dict:
+    ordered = sorted(samples)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+        "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 3)
+    }
+
+
+def write_corpus(directory: str, sections: int, seed: int) -> List[str]:
+    """Write `sections` markdown sections of pseudo-random prose, SECTIONS_PER_FILE per file."""
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(5000)]
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for start in range(0, sections, SECTIONS_PER_FILE):
+        lines = [f"# Synthetic document {start // SECTIONS_PER_FILE}"]
+        for section in range(start, min(start + SECTIONS_PER_FILE, sections)):
+            lines.append(f"\n## Section {section}\n")
+            for _ in range(rng.randint(3, 8)):
+                lines.append(" ".join(rng.choices(vocabulary, k=rng.randint(12, 30))) + ".")
+        path = os.path.join(directory, f"synthetic_{start // SECTIONS_PER_FILE:05d}.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+        paths.append(path)
+    return paths
+
+
+def synthetic_questions(count: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    return [f"What does the document say about term{rng.randrange(5000)} and term{rng.randrange(5000)}?"
+            for _ in range(count)]
+
+
+def build_workflow(args) -> AgentWorkflow:
+    return AgentWorkflow(
+        researcher=ResearchAgent(model=FakeModelInference("fake/research", args.llm_latency)),
+        verifier=VerificationAgent(model=FakeModelInference("fake/verify", args.llm_latency)),
+        relevance_checker=RelevanceChecker(model=FakeModelInference("fake/relevance", args.llm_latency))
+    )
+
+
+def run_corpus(name: str, paths: List[str], questions: List[str], args) -> Dict:
+    size_bytes = sum(os.path.getsize(path) for path in paths)
+    processor = DocumentProcessor()
+    try:
+        start = time.perf_counter()
+        chunks = processor.process(paths)
+        cold_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        processor.process(paths)
+        cached_seconds = time.perf_counter() - start
+    finally:
+        processor.close()
+
+    embeddings = FakeWatsonxEmbeddings(latency=args.embed_latency, latency_per_text=args.embed_latency_per_text)
+    builder = RetrieverBuilder(embeddings=embeddings)
+    start = time.perf_counter()
+    retriever = builder.build_hybrid_retriever(chunks)
+    index_seconds = time.perf_counter() - start
+
+    retrieval = []
+    for question in questions:
+        start = time.perf_counter()
+        retriever.invoke(question)
+        retrieval.append(time.perf_counter() - start)
+
+    workflow = build_workflow(args)
+    pipeline = []
+    for question in questions[:args.pipeline_questions]:
+        start = time.perf_counter()
+        workflow.full_pipeline(question, retriever)
+        pipeline.append(time.perf_counter() - start)
+
+    return {
+        "corpus": name,
+        "files": len(paths),
+        "bytes": size_bytes,
+        "chunks": len(chunks),
+        "ingestion": {
+            "cold_seconds": round(cold_seconds, 3),
+            "cold_chunks_per_second": round(len(chunks) / cold_seconds, 1) if cold_seconds else None,
+            "cold_mb_per_second": round(size_bytes / 1e6 / cold_seconds, 3) if cold_seconds else None,
+            "cached_seconds": round(cached_seconds, 3)
+        },
+        "index_seconds": round(index_seconds, 3),
+        "embedding_calls": embeddings.calls,
+        "retrieval": latency_stats(retrieval),
+        "pipeline": latency_stats(pipeline) if pipeline else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark docchat ingestion, retrieval and answering offline")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[100, 1000, 10000],
+                        help="Sections per synthetic corpus (default: 100 1000 10000)")
+    parser.add_argument("--skip-example", action="store_true", help="Do not benchmark the bundled example PDF")
+    parser.add_argument("--questions", type=int, default=100, help="Retrieval queries per corpus")
+    parser.add_argument("--pipeline-questions", type=int, default=20, help="Full pipeline runs per corpus")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Simulated seconds per model call")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="Simulated seconds per embedding request")
+    parser.add_argument("--embed-latency-per-text", type=float, default=0.0, help="Simulated seconds per embedded text")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    example_pdf = os.path.abspath(EXAMPLE_PDF)
+    output = os.path.abspath(args.output) if args.output else None
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            # Keep anything libraries print to stdout out of the JSON report
+            with contextlib.redirect_stdout(io.StringIO()):
+                if not args.skip_example:
+                    questions = (EXAMPLE_QUESTIONS * (args.questions // len(EXAMPLE_QUESTIONS) + 1))[:args.questions]
+                    results.append(run_corpus("example_pdf", [example_pdf], questions, args))
+                for size in args.sizes:
+                    paths = write_corpus(os.path.join(workdir, f"corpus_{size}"), size, args.seed + size)
+                    questions = synthetic_questions(args.questions, args.seed + size)
+                    results.append(run_corpus(f"synthetic_{size}", paths, questions, args))
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "settings": {
+            "llm_latency": args.llm_latency,
+            "embed_latency": args.embed_latency,
+            "embed_latency_per_text": args.embed_latency_per_text
+        },
+        "results": results
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -14,17 +14,67 @@ class Settings(BaseSettings):
     # Database settings
     CHROMA_DB_PATH: str = "./chroma_db"
     CHROMA_COLLECTION_NAME: str = "documents"
+    CHROMA_INCREMENTAL_INDEX: bool = True  # Reuse persisted embeddings keyed by chunk hash
 
     # Retrieval settings
     VECTOR_SEARCH_K: int = 10
     HYBRID_RETRIEVER_WEIGHTS: list = [0.4, 0.6]
+    HYBRID_RETRIEVER_K: int = 10  # Chunks returned after rank fusion
+    HYBRID_RRF_C: int = 60  # Reciprocal rank fusion constant, as in EnsembleRetriever
+    BM25_SEARCH_K: int = 4
+    BM25_SPARSE_INDEX: bool = True  # Persistent CSR BM25 index instead of rebuilding BM25Retriever
+    BM25_INDEX_PATH: str = "./chroma_db/bm25"
+    BM25_INDEX_MAX_CHUNKS: int = 500_000  # Least recently used chunks are pruned past this
+    RETRIEVER_POOL_MAX_BYTES: int = 1024 * 1024 * 1024
+
+    # Embedding cache settings
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "embedding_cache/embeddings.sqlite"
+    EMBEDDING_CACHE_MEMORY_ITEMS: int = 10000
+    EMBEDDING_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+
+    # Document conversion settings
+    CHUNK_MAX_TOKENS: int = 512  # Header sections above this are split further; 0 disables
+    CHUNK_OVERLAP_TOKENS: int = 64
+    NEAR_DUPLICATE_THRESHOLD: float = 0.9  # Word-shingle Jaccard at which a later chunk is dropped; 0 disables
+    NEAR_DUPLICATE_NUM_PERM: int = 128  # MinHash permutations per chunk
+    CONVERSION_WORKERS: int = os.cpu_count() or 1  # 1 converts files serially in-process
+
+    # WatsonX settings
+    WATSONX_URL: str = "https://us-south.ml.cloud.ibm.com"
+    WATSONX_PROJECT_ID: str = "skills-network"
+
+    # Agent workflow settings
+    STREAM_ANSWERS: bool = True  # Stream draft-answer tokens into the UI as they arrive
+    RESEARCH_MAX_PASSES: int = 2  # Drafts per question, including re-research after failed verification
+    SPECULATIVE_RESEARCH: bool = False  # Draft the answer while relevance is being checked
+    RESEARCH_CONTEXT_TOKENS: int = 3000
+    VERIFICATION_CONTEXT_TOKENS: int = 2000
+    CONTEXT_DEDUP_THRESHOLD: float = 0.9  # Shingle Jaccard similarity treated as a duplicate
+    ANSWER_CACHE_ENABLED: bool = False  # Serve verified answers to repeated or near-identical questions
+    ANSWER_CACHE_SIMILARITY: float = 0.95  # Cosine similarity between questions counted as a hit
+    ANSWER_CACHE_TTL_SECONDS: int = 24 * 60 * 60
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000
+    MODEL_MAX_CONCURRENCY: int = 8  # In-flight async calls per model
+    UI_CONCURRENCY_LIMIT: int = 50  # Concurrent question submissions handled by Gradio
+    BATCH_CONCURRENCY: int = 8  # Questions answered at once by batch.py
+
+    # Startup settings
+    FAST_START: bool = True  # Serve the UI first; import and build heavy components in the background
 
     # Logging settings
-    LOG_LEVEL: str = "INFO"
+    LOG_LEVEL: str = "INFO"  # DEBUG also logs prompts, raw model responses and packed contexts
+
+    # Tracing settings
+    TRACING_ENABLED: bool = True
+    TRACE_FILE: str = "traces/spans.jsonl"  # One JSON span per line; empty disables the file
+    METRICS_PORT: int = 0  # Port for Prometheus-style /metrics on localhost, e.g. 9464; 0 (the default) disables
 
     # New cache settings with type annotations
     CACHE_DIR: str = "document_cache"
     CACHE_EXPIRE_DAYS: int = 7
+    CACHE_MAX_BYTES: int = 2 * 1024 * 1024 * 1024
+    CACHE_SWEEP_ON_STARTUP: bool = True
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+from utils.logging import logger
+
+CACHE_SUFFIXES = (".chunks", ".pkl")
+
+
+class CacheManager:
+    """
+    Keeps the document cache directory within a byte budget.
+
+    Entries expire CACHE_EXPIRE_DAYS after they were written (file mtime) and
+    are evicted least-recently-used first when the directory grows past
+    `max_bytes`. Last access is tracked through the file's atime, which is
+    set explicitly so it also works on noatime mounts.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int, expire_days: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.expire_seconds = expire_days * 24 * 60 * 60
+        self._lock = threading.Lock()
+        self._entries: Dict[Path, list] = {}  # path -> [size, last_access]
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._sweep_thread: Optional[threading.Thread] = None
+        self._scan()
+
+    def is_valid(self, path: Path) -> bool:
+        """Return whether `path` holds a fresh entry, counting the lookup as a hit or miss."""
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            with self._lock:
+                self._misses += 1
+            return False
+
+        if time.time() - stat.st_mtime >= self.expire_seconds:
+            with self._lock:
+                self._misses += 1
+                self._remove(path)
+            return False
+
+        with self._lock:
+            self._hits += 1
+        self.touch(path)
+        return True
+
+    def touch(self, path: Path) -> None:
+        """Mark an entry as just used without changing its write time."""
+        now = time.time()
+        try:
+            os.utime(path, (now, path.stat().st_mtime))
+        except OSError:
+            return
+        with self._lock:
+            if path in self._entries:
+                self._entries[path][1] = now
+
+    def record(self, path: Path) -> None:
+        """Register a newly written entry and evict others if over budget."""
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            return
+        with self._lock:
+            self._entries[path] = [size, time.time()]
+            self._evict(protect=path)
+
+    def forget(self, path: Path) -> None:
+        with self._lock:
+            self._entries.pop(path, None)
+
+    def sweep(self) -> None:
+        """Drop expired entries and leftover temp files, then enforce the byte budget."""
+        self._scan()
+        now = time.time()
+        for tmp_path in self.cache_dir.glob("*.tmp"):
+            try:
+                if now - tmp_path.stat().st_mtime > 60 * 60:
+                    tmp_path.unlink()
+            except OSError:
+                continue
+
+        with self._lock:
+            for path in list(self._entries):
+                try:
+                    expired = now - path.stat().st_mtime >= self.expire_seconds
+                except FileNotFoundError:
+                    self._entries.pop(path, None)
+                    continue
+                if expired:
+                    self._remove(path)
+            self._evict()
+        logger.info(f"Cache sweep finished: {self.stats()}")
+
+    def start_background_sweep(self) -> threading.Thread:
+        """Run `sweep` once in a daemon thread so startup is not delayed."""
+        if self._sweep_thread is None or not self._sweep_thread.is_alive():
+            self._sweep_thread = threading.Thread(target=self.sweep, name="cache-sweep", daemon=True)
+            self._sweep_thread.start()
+        return self._sweep_thread
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "bytes": sum(size for size, _ in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+            }
+
+    def _scan(self) -> None:
+        entries = {}
+        for path in self.cache_dir.iterdir():
+            if path.suffix not in CACHE_SUFFIXES:
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries[path] = [stat.st_size, max(stat.st_atime, stat.st_mtime)]
+        with self._lock:
+            self._entries = entries
+
+    def _evict(self, protect: Optional[Path] = None) -> None:
+        """Remove least recently used entries until the budget is met. Caller holds the lock."""
+        total = sum(size for size, _ in self._entries.values())
+        for path, (size, _) in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes:
+                break
+            if path == protect:
+                continue
+            if self._remove(path):
+                total -= size
+                self._evictions += 1
+
+    def _remove(self, path: Path) -> bool:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            # Still mapped by a live ChunkStore on platforms that lock open files
+            logger.warning(f"Could not remove cache entry {path.name}: {e}")
+            return False
+        self._entries.pop(path, None)
+        return True
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import mmap
+import os
+import struct
+from collections.abc import Sequence
+from pathlib import Path
+from typing import Dict, List
+import numpy as np
+from langchain.schema import Document
+
+# magic, format version, reserved, chunk count, creation timestamp
+_HEADER = struct.Struct("<4sHHId")
+_MAGIC = b"DCCS"
+_VERSION = 1
+_HASH_SIZE = 32
+
+
+def write_chunk_store(path: Path, chunks: List[Document], timestamp: float) -> None:
+    """
+    Write chunks to a single file laid out as:
+    header | SHA-256 per chunk | text offsets | metadata offsets | text blob | metadata blob
+
+    Offsets are little-endian uint64 (count + 1 entries) into their blob, so
+    any chunk can be read without decoding the others.
+    """
+    texts = [chunk.page_content.encode("utf-8") for chunk in chunks]
+    metas = [json.dumps(chunk.metadata, default=str).encode("utf-8") for chunk in chunks]
+
+    tmp_path = Path(f"{path}.tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, 0, len(chunks), timestamp))
+        for text in texts:
+            f.write(hashlib.sha256(text).digest())
+        for column in (texts, metas):
+            offsets = np.zeros(len(column) + 1, dtype="<u8")
+            np.cumsum([len(item) for item in column], out=offsets[1:])
+            f.write(offsets.tobytes())
+        for column in (texts, metas):
+            f.write(b"".join(column))
+    os.replace(tmp_path, path)
+
+
+class ChunkStore(Sequence):
+    """
+    Read-only, memory-mapped view over a chunk store file.
+
+    Indexing returns a freshly built Document; nothing is decoded until a
+    chunk is actually accessed.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+        if self._mm is None or size < _HEADER.size:
+            raise ValueError(f"Truncated chunk store: {self.path}")
+        magic, version, _, count, timestamp = _HEADER.unpack_from(self._mm, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"Unsupported chunk store format: {self.path}")
+
+        self.timestamp = timestamp
+        self._count = count
+        self._hashes_at = _HEADER.size
+        offsets_at = self._hashes_at + count * _HASH_SIZE
+        self._text_offsets = np.frombuffer(self._mm, dtype="<u8", count=count + 1, offset=offsets_at)
+        self._meta_offsets = np.frombuffer(
+            self._mm, dtype="<u8", count=count + 1, offset=offsets_at + (count + 1) * 8
+        )
+        self._text_at = offsets_at + 2 * (count + 1) * 8
+        self._meta_at = self._text_at + int(self._text_offsets[-1])
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("chunk index out of range")
+        return Document(page_content=self.page_content(index), metadata=self.metadata(index))
+
+    def page_content(self, index: int) -> str:
+        start, end = self._text_offsets[index], self._text_offsets[index + 1]
+        return self._mm[self._text_at + int(start):self._text_at + int(end)].decode("utf-8")
+
+    def metadata(self, index: int) -> Dict:
+        start, end = self._meta_offsets[index], self._meta_offsets[index + 1]
+        return json.loads(self._mm[self._meta_at + int(start):self._meta_at + int(end)])
+
+    def chunk_hash(self, index: int) -> str:
+        """SHA-256 of the chunk's page_content, stored at write time."""
+        start = self._hashes_at + index * _HASH_SIZE
+        return self._mm[start:start + _HASH_SIZE].hex()
@@ -0,0 +1,43 @@
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import List
+from utils.tracing import tracer
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class FileDescriptor:
+    """An uploaded file hashed and sized in a single streaming pass."""
+    name: str
+    sha256: str
+    size: int
+
+
+def describe_file(file) -> FileDescriptor:
+    """Hash a file in fixed-size blocks, recording its size on the way."""
+    if isinstance(file, FileDescriptor):
+        return file
+
+    path = os.fspath(getattr(file, "name", file))
+    digest = hashlib.sha256()
+    size = 0
+    buffer = bytearray(HASH_BLOCK_SIZE)
+    view = memoryview(buffer)
+    with open(path, "rb", buffering=0) as f:
+        while True:
+            read = f.readinto(buffer)
+            if not read:
+                break
+            digest.update(view[:read])
+            size += read
+    return FileDescriptor(name=path, sha256=digest.hexdigest(), size=size)
+
+
+def describe_files(files: List) -> List[FileDescriptor]:
+    """Describe Gradio uploads, plain paths or existing descriptors."""
+    with tracer.span("hashing", files=len(files)) as span:
+        descriptors = [describe_file(file) for file in files]
+        span.set(bytes=sum(descriptor.size for descriptor in descriptors))
+    return descriptors
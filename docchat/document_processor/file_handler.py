@@ -1,92 +1,304 @@
 import os
 import hashlib
+import multiprocessing
 import pickle
-from datetime import datetime, timedelta
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
 from pathlib import Path
-from typing import List
+from typing import Dict, List, Tuple
 from docling.document_converter import DocumentConverter
-from langchain_text_splitters import MarkdownHeaderTextSplitter
+from langchain_text_splitters import MarkdownHeaderTextSplitter, RecursiveCharacterTextSplitter
 from config import constants
 from config.settings import settings
 from utils.logging import logger
+from utils.tokens import count_tokens
+from utils.tracing import tracer
+from .cache_manager import CacheManager
+from .chunk_store import ChunkStore, write_chunk_store
+from .file_descriptor import FileDescriptor, describe_files
+from .near_duplicates import NearDuplicateFilter
+
+SUPPORTED_EXTENSIONS = ('.pdf', '.docx', '.txt', '.md')
+
+# Upper bucket edges, in tokens, of the chunk-size histogram written to the log
+HISTOGRAM_EDGES = (64, 128, 256, 512, 1024, 2048)
+
+# One long-lived converter per conversion worker process
+_worker_converter = None
+
+
+def _init_conversion_worker():
+    global _worker_converter
+    _worker_converter = DocumentConverter()
+
+
+def _convert_in_worker(path: str, headers: List, max_tokens: int, overlap: int) -> Tuple[List, Dict]:
+    return _convert_to_chunks(_worker_converter, path, headers, max_tokens, overlap)
+
+
+def _convert_to_chunks(converter: DocumentConverter, path: str, headers: List,
+                       max_tokens: int = 0, overlap: int = 0) -> Tuple[List, Dict]:
+    """
+    Convert a file to markdown with Docling, split it on headers, then split
+    sections longer than `max_tokens` with `overlap` tokens of overlap.
+    Returns the chunks and their size statistics, including how long
+    conversion and chunking took, for the caller to trace.
+    """
+    start = time.perf_counter()
+    markdown = converter.convert(path).document.export_to_markdown()
+    converted = time.perf_counter()
+    sections = MarkdownHeaderTextSplitter(headers).split_text(markdown)
+    chunks = _split_oversized(sections, max_tokens, overlap)
+    stats = _chunk_stats(sections, chunks)
+    stats["convert_seconds"] = round(converted - start, 4)
+    stats["chunk_seconds"] = round(time.perf_counter() - converted, 4)
+    return chunks, stats
+
+
+def _split_oversized(sections: List, max_tokens: int, overlap: int) -> List:
+    """Split sections over the token cap; pieces keep their section's header metadata."""
+    if max_tokens <= 0:
+        return sections
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=max_tokens,
+        chunk_overlap=overlap,
+        length_function=count_tokens
+    )
+    chunks = []
+    for section in sections:
+        if count_tokens(section.page_content) <= max_tokens:
+            chunks.append(section)
+        else:
+            chunks.extend(splitter.split_documents([section]))
+    return chunks
+
+
+def _chunk_stats(sections: List, chunks: List) -> Dict:
+    sizes = [count_tokens(chunk.page_content) for chunk in chunks]
+    histogram = {}
+    lower = 0
+    for edge in HISTOGRAM_EDGES:
+        histogram[f"{lower + 1}-{edge}"] = sum(1 for size in sizes if lower < size <= edge)
+        lower = edge
+    histogram[f">{lower}"] = sum(1 for size in sizes if size > lower)
+    return {
+        "sections": len(sections),
+        "chunks": len(chunks),
+        "total_tokens": sum(sizes),
+        "max_tokens": max(sizes, default=0),
+        "mean_tokens": round(sum(sizes) / len(sizes), 1) if sizes else 0,
+        "histogram": histogram
+    }
+
 
 class DocumentProcessor:
     def __init__(self):
         self.headers = [("#", "Header 1"), ("##", "Header 2")]
         self.cache_dir = Path(settings.CACHE_DIR)
         self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.cache = CacheManager(self.cache_dir, settings.CACHE_MAX_BYTES, settings.CACHE_EXPIRE_DAYS)
+        self.workers = max(1, settings.CONVERSION_WORKERS)
+        self.max_chunk_tokens = settings.CHUNK_MAX_TOKENS
+        self.chunk_overlap_tokens = settings.CHUNK_OVERLAP_TOKENS
+        self.near_duplicate_filter = None
+        if settings.NEAR_DUPLICATE_THRESHOLD > 0:
+            self.near_duplicate_filter = NearDuplicateFilter(
+                settings.NEAR_DUPLICATE_THRESHOLD, settings.NEAR_DUPLICATE_NUM_PERM
+            )
+        self.near_duplicates_removed = 0  # Across all process() calls
+        self._converter = None
+        self._pool = None
         
-    def validate_files(self, files: List) -> None:
+    def validate_files(self, files: List[FileDescriptor]) -> None:
         """Validate the total size of the uploaded files."""
-        total_size = sum(os.path.getsize(f.name) for f in files)
+        total_size = sum(f.size for f in files)
         if total_size > constants.MAX_TOTAL_SIZE:
             raise ValueError(f"Total size exceeds {constants.MAX_TOTAL_SIZE//1024//1024}MB limit")
 
     def process(self, files: List) -> List:
         """Process files with caching for subsequent queries"""
+        # Each file is read once here; descriptors from the caller are reused as-is
+        files = describe_files(files)
         self.validate_files(files)
-        all_chunks = []
-        seen_hashes = set()
-        
+
+        # Hash every file and start conversions for cache misses right away
+        pending = []
         for file in files:
             try:
-                # Generate content-based hash for caching
-                with open(file.name, "rb") as f:
-                    file_hash = self._generate_hash(f.read())
-                
-                cache_path = self.cache_dir / f"{file_hash}.pkl"
-                
-                if self._is_cache_valid(cache_path):
-                    logger.info(f"Loading from cache: {file.name}")
-                    chunks = self._load_from_cache(cache_path)
+                cache_path = self._cache_path(file)
+                with tracer.span("document_cache", file=file.name) as span:
+                    cached = self._is_cache_valid(file, cache_path)
+                    span.set(cache_hit=cached)
+
+                if cached:
+                    pending.append((file, cache_path, None))
                 else:
                     logger.info(f"Processing and caching: {file.name}")
-                    chunks = self._process_file(file)
-                    self._save_to_cache(chunks, cache_path)
-                
-                # Deduplicate chunks across files
-                for chunk in chunks:
-                    chunk_hash = self._generate_hash(chunk.page_content.encode())
-                    if chunk_hash not in seen_hashes:
-                        all_chunks.append(chunk)
-                        seen_hashes.add(chunk_hash)
-                        
+                    pending.append((file, cache_path, self._submit(file)))
             except Exception as e:
                 logger.error(f"Failed to process {file.name}: {str(e)}")
+
+        # Load cached files while the pool converts the rest
+        file_chunks = [None] * len(pending)
+        for i, (file, cache_path, future) in enumerate(pending):
+            if future is not None:
                 continue
+            try:
+                logger.info(f"Loading from cache: {file.name}")
+                file_chunks[i] = self._load_from_cache(file, cache_path)
+            except Exception as e:
+                # Another session may have evicted the entry since it was validated
+                logger.warning(f"Cache entry for {file.name} could not be read ({e}); converting it again.")
+                pending[i] = (file, cache_path, self._submit(file))
+
+        for i, (file, cache_path, future) in enumerate(pending):
+            if future is None:
+                continue
+            try:
+                file_chunks[i], stats = future.result()
+                logger.info(f"Chunked {file.name}: {stats}")
+                self._trace_conversion(file, stats)
+                self._save_to_cache(file_chunks[i], cache_path)
+            except Exception as e:
+                logger.error(f"Failed to process {file.name}: {str(e)}")
+
+        # Deduplicate chunks across files, keeping upload order
+        all_chunks = []
+        seen_hashes = set()
+        for chunks in file_chunks:
+            for i in range(len(chunks or [])):
+                if isinstance(chunks, ChunkStore):
+                    # Cached chunks carry their hash, so duplicates are never decoded
+                    chunk_hash = chunks.chunk_hash(i)
+                else:
+                    chunk_hash = self._generate_hash(chunks[i].page_content.encode())
+                if chunk_hash not in seen_hashes:
+                    chunk = chunks[i]
+                    # Stable ID used by the retriever's incremental index
+                    chunk.metadata["chunk_id"] = chunk_hash
+                    all_chunks.append(chunk)
+                    seen_hashes.add(chunk_hash)
+
+        # Versions of a report that differ only in whitespace or footers survive
+        # the exact-hash pass; drop their chunks by shingle similarity
+        if self.near_duplicate_filter is not None and all_chunks:
+            with tracer.span("near_dedup", chunks=len(all_chunks)) as span:
+                keep = self.near_duplicate_filter.keep([chunk.page_content for chunk in all_chunks])
+                removed = len(all_chunks) - len(keep)
+                all_chunks = [all_chunks[i] for i in keep]
+                span.set(removed=removed)
+            self.near_duplicates_removed += removed
+            logger.info(
+                f"Removed {removed} near-duplicate chunks "
+                f"(Jaccard >= {self.near_duplicate_filter.threshold})."
+            )
                 
         logger.info(f"Total unique chunks: {len(all_chunks)}")
         return all_chunks
 
-    def _process_file(self, file) -> List:
+    def close(self) -> None:
+        """Shut down the conversion worker pool, if one was started."""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def _submit(self, file) -> Future:
+        """Convert a file in the worker pool, or inline when running with one worker."""
+        if self.workers > 1 and file.name.endswith(SUPPORTED_EXTENSIONS):
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_conversion_worker
+                )
+            return self._pool.submit(
+                _convert_in_worker, file.name, self.headers, self.max_chunk_tokens, self.chunk_overlap_tokens
+            )
+
+        future = Future()
+        try:
+            future.set_result(self._process_file(file))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _trace_conversion(self, file: FileDescriptor, stats: Dict) -> None:
+        """Record the spans of a conversion, which may have run in a worker process."""
+        if "convert_seconds" not in stats:
+            return
+        tracer.record("docling_convert", stats["convert_seconds"], file=file.name, bytes=file.size)
+        tracer.record("chunking", stats["chunk_seconds"], file=file.name, sections=stats["sections"],
+                      chunks=stats["chunks"], chunk_tokens=stats["total_tokens"])
+
+    def _process_file(self, file) -> Tuple[List, Dict]:
         """Original processing logic with Docling"""
-        if not file.name.endswith(('.pdf', '.docx', '.txt', '.md')):
+        if not file.name.endswith(SUPPORTED_EXTENSIONS):
             logger.warning(f"Skipping unsupported file type: {file.name}")
-            return []
+            return [], {}
+
+        if self._converter is None:
+            self._converter = DocumentConverter()
+        return _convert_to_chunks(
+            self._converter, file.name, self.headers, self.max_chunk_tokens, self.chunk_overlap_tokens
+        )
 
-        converter = DocumentConverter()
-        markdown = converter.convert(file.name).document.export_to_markdown()
-        splitter = MarkdownHeaderTextSplitter(self.headers)
-        return splitter.split_text(markdown)
+    def _cache_path(self, file: FileDescriptor) -> Path:
+        """Cache entries are keyed by content and, when sub-splitting, by the token limits."""
+        if self.max_chunk_tokens > 0:
+            return self.cache_dir / f"{file.sha256}.t{self.max_chunk_tokens}-{self.chunk_overlap_tokens}.chunks"
+        return self.cache_dir / f"{file.sha256}.chunks"
 
     def _generate_hash(self, content: bytes) -> str:
         return hashlib.sha256(content).hexdigest()
 
     def _save_to_cache(self, chunks: List, cache_path: Path):
-        with open(cache_path, "wb") as f:
-            pickle.dump({
-                "timestamp": datetime.now().timestamp(),
-                "chunks": chunks
-            }, f)
-
-    def _load_from_cache(self, cache_path: Path) -> List:
-        with open(cache_path, "rb") as f:
-            data = pickle.load(f)
-        return data["chunks"]
-
-    def _is_cache_valid(self, cache_path: Path) -> bool:
-        if not cache_path.exists():
-            return False
-            
-        cache_age = datetime.now() - datetime.fromtimestamp(cache_path.stat().st_mtime)
-        return cache_age < timedelta(days=settings.CACHE_EXPIRE_DAYS)
\ No newline at end of file
+        write_chunk_store(cache_path, chunks, datetime.now().timestamp())
+        self.cache.record(cache_path)
+
+    def _load_from_cache(self, file: FileDescriptor, cache_path: Path) -> ChunkStore:
+        source = self._cache_source(file, cache_path)
+        if source != cache_path:
+            self._migrate_cache_entry(source, cache_path)
+        return ChunkStore(cache_path)
+
+    def _header_cache_path(self, file: FileDescriptor) -> Path:
+        """Entry of header sections only, written with token limits off or before they existed."""
+        return self.cache_dir / f"{file.sha256}.chunks"
+
+    def _legacy_cache_path(self, file: FileDescriptor) -> Path:
+        """Pickled entry written before chunk stores."""
+        return self.cache_dir / f"{file.sha256}.pkl"
+
+    def _cache_source(self, file: FileDescriptor, cache_path: Path) -> Path:
+        """The entry to load: the current one, else an older one that can be migrated to it."""
+        for path in (cache_path, self._header_cache_path(file), self._legacy_cache_path(file)):
+            if path.exists():
+                return path
+        return cache_path
+
+    def _migrate_cache_entry(self, source: Path, cache_path: Path) -> None:
+        """
+        Rewrite an older entry as a chunk store at `cache_path`, keeping its age.
+        Older entries hold header sections, so they are split to the current
+        token limits here instead of converting the document again.
+        """
+        logger.info(f"Migrating cache entry {source.name} to {cache_path.name}")
+        if source.suffix == ".pkl":
+            with open(source, "rb") as f:
+                data = pickle.load(f)
+            sections, timestamp = data["chunks"], data["timestamp"]
+        else:
+            store = ChunkStore(source)
+            sections, timestamp = list(store), store.timestamp
+            del store  # Release the mapping before the file is removed
+        chunks = _split_oversized(sections, self.max_chunk_tokens, self.chunk_overlap_tokens)
+        write_chunk_store(cache_path, chunks, timestamp)
+        mtime = source.stat().st_mtime
+        os.utime(cache_path, (mtime, mtime))
+        source.unlink()
+        self.cache.forget(source)
+        self.cache.record(cache_path)
+
+    def _is_cache_valid(self, file: FileDescriptor, cache_path: Path) -> bool:
+        return self.cache.is_valid(self._cache_source(file, cache_path))
@@ -0,0 +1,97 @@
+import re
+import zlib
+from typing import List, Sequence, Tuple
+import numpy as np
+
+_SHINGLE_SIZE = 5
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def shingles(text: str, size: int = _SHINGLE_SIZE) -> set:
+    """
+    Lower-cased word shingles, so whitespace and case changes do not matter.
+    Text without words (separators, tables of dashes) has no shingles.
+    """
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return set()
+    if len(words) < size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a: set, b: set) -> float:
+    """Jaccard similarity of two shingle sets; 0.0 when either is empty."""
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def lsh_bands(threshold: float, num_perm: int, recall: float = 0.99) -> Tuple[int, int]:
+    """
+    (bands, rows) with the most rows per band, i.e. the fewest false candidates,
+    that still make a pair at exactly `threshold` a candidate with probability
+    `recall`. Candidates are verified exactly, so only missed pairs cost accuracy.
+    """
+    best = (num_perm, 1)
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if 1 - (1 - threshold ** rows) ** bands >= recall:
+            best = (bands, rows)
+    return best
+
+
+class NearDuplicateFilter:
+    """
+    MinHash/LSH filter for chunks whose word-shingle Jaccard similarity to an
+    earlier chunk reaches `threshold`.
+
+    Every chunk gets a `num_perm` MinHash signature, cut into bands. A chunk is
+    only compared with the kept chunks it shares a band with, at most one per
+    band. The comparison is its exact shingle Jaccard, so LSH can miss a few
+    pairs near the threshold but never removes a chunk below it. The work is
+    linear in the number of chunks. The first chunk of a near-duplicate group
+    is the one kept, so upload order decides which version survives. Chunks
+    without words are always kept.
+    """
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 128, seed: int = 1):
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands, self.rows = lsh_bands(threshold, num_perm)
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, int(_MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+    def signature(self, shingle_set: set) -> np.ndarray:
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode()) for shingle in shingle_set),
+            dtype=np.uint64,
+            count=len(shingle_set)
+        )
+        # Universal hashing as in datasketch; uint64 products wrap, which keeps them well mixed
+        permuted = (hashes[:, None] * self._a + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0)
+
+    def keep(self, texts: Sequence[str]) -> List[int]:
+        """Indexes of the texts to keep, in order."""
+        buckets = [{} for _ in range(self.bands)]
+        kept_shingles = {}
+        kept = []
+        for i, text in enumerate(texts):
+            shingle_set = shingles(text)
+            if not shingle_set:
+                # Nothing to compare, so never a near-duplicate of anything
+                kept.append(i)
+                continue
+            signature = self.signature(shingle_set)
+            keys = [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+            candidates = {buckets[band][key] for band, key in enumerate(keys) if key in buckets[band]}
+            if any(jaccard(shingle_set, kept_shingles[j]) >= self.threshold for j in candidates):
+                continue
+
+            kept.append(i)
+            kept_shingles[i] = shingle_set
+            for band, key in enumerate(keys):
+                buckets[band].setdefault(key, i)
+        return kept
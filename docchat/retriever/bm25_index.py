@@ -0,0 +1,324 @@
+import json
+import os
+import threading
+from typing import Callable, Dict, List
+import numpy as np
+import scipy.sparse as sp
+from langchain.schema import Document
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict, PrivateAttr
+from .hybrid import chunk_id
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def default_tokenizer(text: str) -> List[str]:
+    """Same tokenization as LangChain's BM25Retriever."""
+    return text.split()
+
+
+# Written by the single-file format that segments replaced
+_UNSEGMENTED_FILES = ("vocabulary.json", "chunk_ids.json", "term_frequencies.npz")
+
+
+class BM25Index:
+    """
+    Persistent term-frequency index over recently used chunks.
+
+    Chunks are tokenized once, when first added, into a CSR document-term
+    matrix whose columns follow a persisted vocabulary. `add` only processes
+    unseen chunk IDs and appends their rows. Retrievers for a document set
+    slice their rows out of the matrix instead of re-tokenizing anything.
+
+    The index lives in `path` (next to the Chroma store) as segments: each
+    `add` writes one segment-NNNNNN.npz/.json pair holding its rows, chunk
+    IDs and the vocabulary terms it introduced, then commits it by replacing
+    manifest.json. The manifest names the live segments and carries a format
+    version, so a crash never leaves a half-written index, and an index from
+    another version is rebuilt instead of misread. Past `max_segments` the
+    segments are merged into one. Past `max_chunks` the least recently used
+    chunks (since startup; oldest first after a restart) are pruned along
+    with terms no remaining chunk uses, and are simply re-tokenized if they
+    come back.
+    """
+
+    FORMAT_VERSION = 2
+
+    def __init__(self, path: str, tokenizer: Callable[[str], List[str]] = default_tokenizer,
+                 max_chunks: int = 500_000, max_segments: int = 16):
+        self.path = path
+        self.tokenizer = tokenizer
+        self.max_chunks = max_chunks
+        self.max_segments = max_segments
+        self.vocabulary: Dict[str, int] = {}
+        self.chunk_ids: List[str] = []
+        self._terms: List[str] = []  # Vocabulary in column order
+        self._positions: Dict[str, int] = {}
+        self._last_used: List[int] = []  # Per row, the `_clock` tick of its latest add
+        self._clock = 0
+        self._matrix = sp.csr_matrix((0, 0), dtype=np.float32)
+        self._pending: List[sp.csr_matrix] = []
+        self._segments: List[str] = []
+        self._next_segment = 1
+        self._lock = threading.RLock()
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    def add(self, docs: List[Document]) -> int:
+        """Index chunks not seen before, persist them and return how many were added."""
+        with self._lock:
+            self._clock += 1
+            new_docs, seen = [], set()
+            for doc in docs:
+                doc_id = chunk_id(doc)
+                position = self._positions.get(doc_id)
+                if position is not None:
+                    self._last_used[position] = self._clock
+                elif doc_id not in seen:
+                    seen.add(doc_id)
+                    new_docs.append(doc)
+            if not new_docs:
+                return 0
+
+            first_term = len(self._terms)
+            rows, columns = [], []
+            for row, doc in enumerate(new_docs):
+                tokens = self.tokenizer(doc.page_content)
+                for token in tokens:
+                    column = self.vocabulary.get(token)
+                    if column is None:
+                        column = self.vocabulary[token] = len(self._terms)
+                        self._terms.append(token)
+                    columns.append(column)
+                rows.extend([row] * len(tokens))
+            # Duplicate (row, column) pairs are summed into term frequencies
+            block = sp.csr_matrix(
+                (np.ones(len(rows), dtype=np.float32), (rows, columns)),
+                shape=(len(new_docs), len(self.vocabulary))
+            )
+            self._pending.append(block)
+            new_ids = [doc.metadata["chunk_id"] for doc in new_docs]
+            for doc_id in new_ids:
+                self._positions[doc_id] = len(self.chunk_ids)
+                self.chunk_ids.append(doc_id)
+                self._last_used.append(self._clock)
+
+            if len(self.chunk_ids) > self.max_chunks:
+                self._prune()
+                self._rewrite()
+            else:
+                self._append_segment(block, new_ids, self._terms[first_term:])
+                if len(self._segments) > self.max_segments:
+                    self._rewrite()
+            logger.info(f"BM25 index: {len(new_docs)} chunks added, {len(self.chunk_ids)} total.")
+            return len(new_docs)
+
+    def term_frequencies(self, docs: List[Document]) -> sp.csr_matrix:
+        """Document-term frequency rows for `docs`, in order. Every chunk must already be indexed."""
+        with self._lock:
+            matrix = self._consolidate()
+            rows = np.fromiter((self._positions[chunk_id(doc)] for doc in docs), dtype=np.int64, count=len(docs))
+            return matrix[rows]
+
+    def retriever(self, docs: List[Document], k: int = 4) -> "SparseBM25Retriever":
+        """Index any new chunks, then return a BM25 retriever over exactly `docs`."""
+        # Held throughout so a concurrent add cannot prune these chunks or swap the vocabulary in between
+        with self._lock:
+            self.add(docs)
+            return SparseBM25Retriever(documents=docs, index=self, term_frequencies=self.term_frequencies(docs), tokenizer=self.tokenizer, k=k)
+
+    def _consolidate(self) -> sp.csr_matrix:
+        """Fold appended blocks into the main matrix, widened to the current vocabulary. Caller holds the lock."""
+        if self._pending or self._matrix.shape[1] != len(self.vocabulary):
+            blocks = [self._matrix] + self._pending
+            for block in blocks:
+                block.resize((block.shape[0], len(self.vocabulary)))
+            self._matrix = sp.vstack(blocks, format="csr")
+            self._pending = []
+        return self._matrix
+
+    def _prune(self) -> None:
+        """
+        Drop the least recently used chunks down to 3/4 of `max_chunks`, never
+        those of the current add, then the terms left without chunks. Caller
+        holds the lock.
+        """
+        last_used = np.asarray(self._last_used)
+        excess = len(self.chunk_ids) - self.max_chunks * 3 // 4
+        # Least recently used first, older rows first among equals
+        order = np.lexsort((np.arange(len(last_used)), last_used))
+        dropped = order[last_used[order] < self._clock][:excess]
+        keep = np.setdiff1d(np.arange(len(last_used)), dropped)
+
+        matrix = self._consolidate()[keep]
+        terms = np.flatnonzero(np.diff(matrix.tocsc().indptr))
+        self._matrix = matrix[:, terms].tocsr()
+        self._terms = [self._terms[term] for term in terms]
+        # A new dict: retrievers built earlier keep the one matching their columns
+        self.vocabulary = {term: column for column, term in enumerate(self._terms)}
+        self.chunk_ids = [self.chunk_ids[row] for row in keep]
+        self._positions = {doc_id: i for i, doc_id in enumerate(self.chunk_ids)}
+        self._last_used = last_used[keep].tolist()
+        logger.info(f"BM25 index pruned {len(dropped)} least recently used chunks.")
+
+    def _load(self) -> None:
+        try:
+            with open(os.path.join(self.path, "manifest.json"), encoding="utf-8") as f:
+                manifest = json.load(f)
+            if manifest.get("version") != self.FORMAT_VERSION:
+                logger.warning(f"Ignoring BM25 index at {self.path} with format version {manifest.get('version')}.")
+                return
+            chunk_ids, terms, blocks = [], [], []
+            for name in manifest["segments"]:
+                with open(os.path.join(self.path, name + ".json"), encoding="utf-8") as f:
+                    segment = json.load(f)
+                block = sp.load_npz(os.path.join(self.path, name + ".npz")).tocsr()
+                terms.extend(segment["terms"])
+                if block.shape[0] != len(segment["chunk_ids"]) or block.shape[1] > len(terms):
+                    raise ValueError(f"segment {name} does not match its chunk IDs and terms")
+                chunk_ids.extend(segment["chunk_ids"])
+                blocks.append(block)
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable BM25 index at {self.path}: {e}")
+            return
+
+        if len(chunk_ids) != manifest["chunks"] or len(terms) != manifest["terms"]:
+            logger.warning(f"Ignoring inconsistent BM25 index at {self.path}.")
+            return
+        self._terms = terms
+        self.vocabulary = {term: column for column, term in enumerate(terms)}
+        self.chunk_ids = chunk_ids
+        self._positions = {doc_id: i for i, doc_id in enumerate(chunk_ids)}
+        self._last_used = [0] * len(chunk_ids)
+        self._pending = blocks
+        self._segments = list(manifest["segments"])
+        self._next_segment = manifest["next_segment"]
+        self._remove_orphans()
+        logger.info(f"Loaded BM25 index with {len(chunk_ids)} chunks from {self.path}.")
+
+    def _append_segment(self, block: sp.csr_matrix, chunk_ids: List[str], terms: List[str]) -> None:
+        """Persist one add as a new segment and commit it. Caller holds the lock."""
+        name = self._write_segment(block, chunk_ids, terms)
+        self._commit(self._segments + [name])
+
+    def _rewrite(self) -> None:
+        """Replace every segment with one holding the whole index. Caller holds the lock."""
+        name = self._write_segment(self._consolidate(), self.chunk_ids, self._terms)
+        self._commit([name])
+        self._remove_orphans()
+
+    def _write_segment(self, block: sp.csr_matrix, chunk_ids: List[str], terms: List[str]) -> str:
+        os.makedirs(self.path, exist_ok=True)
+        name = f"segment-{self._next_segment:06d}"
+        self._next_segment += 1
+        self._write(name + ".npz", lambda f: sp.save_npz(f, block))
+        self._write(name + ".json", lambda f: f.write(json.dumps({"chunk_ids": chunk_ids, "terms": terms}).encode("utf-8")))
+        return name
+
+    def _commit(self, segments: List[str]) -> None:
+        """Make `segments` the index by replacing the manifest, the only file a reader trusts."""
+        manifest = {
+            "version": self.FORMAT_VERSION,
+            "segments": segments,
+            "chunks": len(self.chunk_ids),
+            "terms": len(self._terms),
+            "next_segment": self._next_segment,
+        }
+        self._write("manifest.json", lambda f: f.write(json.dumps(manifest).encode("utf-8")))
+        self._segments = segments
+
+    def _write(self, name: str, write: Callable) -> None:
+        target = os.path.join(self.path, name)
+        with open(target + ".tmp", "wb") as f:
+            write(f)
+        os.replace(target + ".tmp", target)
+
+    def _remove_orphans(self) -> None:
+        """Delete segments the manifest no longer lists, left by a merge or a crash, and pre-segment files."""
+        live = set(self._segments)
+        for name in os.listdir(self.path):
+            stale = name.startswith("segment-") and name.split(".", 1)[0] not in live
+            if stale or name in _UNSEGMENTED_FILES:
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError as e:
+                    logger.warning(f"Could not remove stale BM25 segment {name}: {e}")
+
+
+class SparseBM25Retriever(BaseRetriever):
+    """
+    Okapi BM25 over a fixed chunk set, scored with a sparse matrix product.
+
+    Term weights tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl)) are
+    precomputed into a CSR term-document matrix. A query then only touches the
+    rows of its own terms. IDF, including the epsilon floor for very common
+    terms, follows rank_bm25's BM25Okapi, so rankings match BM25Retriever.
+    Query terms are looked up in the shared index's vocabulary, which is
+    referenced rather than copied into every retriever; pruning the index
+    swaps in a new vocabulary and leaves the referenced one untouched.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    documents: List[Document]
+    index: BM25Index
+    term_frequencies: sp.csr_matrix
+    tokenizer: Callable[[str], List[str]] = default_tokenizer
+    k: int = 4
+    k1: float = 1.5
+    b: float = 0.75
+    epsilon: float = 0.25
+
+    _vocabulary: Dict[str, int] = PrivateAttr()
+    _weights: sp.csr_matrix = PrivateAttr()
+    _idf: np.ndarray = PrivateAttr()
+
+    def model_post_init(self, __context) -> None:
+        self._vocabulary = self.index.vocabulary
+        tf = self.term_frequencies.tocsr().astype(np.float64)
+        doc_lengths = np.asarray(tf.sum(axis=1)).ravel()
+        average_length = doc_lengths.mean() if len(doc_lengths) else 0.0
+
+        weights = tf.copy()
+        if average_length:
+            lengths = np.repeat(doc_lengths, np.diff(tf.indptr))
+            norm = self.k1 * (1 - self.b + self.b * lengths / average_length)
+            weights.data = tf.data * (self.k1 + 1) / (tf.data + norm)
+        # Rows are terms so a query selects only its own postings
+        self._weights = weights.T.tocsr()
+
+        corpus_size = tf.shape[0]
+        document_frequency = np.diff(self._weights.indptr)
+        present = document_frequency > 0
+        idf = np.log(corpus_size - document_frequency + 0.5) - np.log(document_frequency + 0.5)
+        idf[~present] = 0.0
+        if present.any():
+            floor = self.epsilon * idf[present].mean()
+            idf[present & (idf < 0)] = floor
+        self._idf = idf
+
+    def get_scores(self, query: str) -> np.ndarray:
+        vocabulary = self._vocabulary
+        term_ids = [vocabulary[token] for token in self.tokenizer(query) if token in vocabulary]
+        # Terms added to the index after this retriever was built have no column here
+        term_ids = [term for term in term_ids if term < self._weights.shape[0]]
+        if not term_ids:
+            return np.zeros(len(self.documents))
+        terms, counts = np.unique(term_ids, return_counts=True)
+        return self._weights[terms].T @ (self._idf[terms] * counts)
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        scores = self.get_scores(query)
+        if len(scores) > self.k:
+            candidates = np.argpartition(-scores, self.k - 1)[:self.k]
+        else:
+            candidates = np.arange(len(scores))
+        # Highest score first, later chunk first on ties, as in rank_bm25's get_top_n
+        top = candidates[np.lexsort((-candidates, -scores[candidates]))]
+        return [self.documents[i] for i in top]
@@ -1,56 +1,176 @@
+from typing import Iterable
+from langchain.schema import Document
 from langchain_community.vectorstores import Chroma
 from langchain_openai import OpenAIEmbeddings
 from ibm_watsonx_ai.metanames import EmbedTextParamsMetaNames
 from langchain_ibm import WatsonxEmbeddings
 from langchain_community.retrievers import BM25Retriever
-from langchain.retrievers import EnsembleRetriever
 from config.settings import settings
+from utils.tracing import tracer
+from .bm25_index import BM25Index
+from .embedding_cache import CachedEmbeddings
+from .hybrid import HybridRetriever, chunk_id
+import hashlib
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+def watsonx_embeddings(truncate_input_tokens: int) -> WatsonxEmbeddings:
+    """The slate retriever model, keeping the first `truncate_input_tokens` tokens of each input."""
+    embed_params = {
+        EmbedTextParamsMetaNames.TRUNCATE_INPUT_TOKENS: truncate_input_tokens,
+        EmbedTextParamsMetaNames.RETURN_OPTIONS: {"input_text": True},
+    }
+
+    return WatsonxEmbeddings(
+        model_id="ibm/slate-125m-english-rtrvr",
+        url="https://us-south.ml.cloud.ibm.com",
+        project_id="skills-network",
+        params=embed_params
+    )
+
+
+def embedding_namespace(embeddings) -> str:
+    """Embedding cache namespace; vectors differ per model and per input truncation."""
+    namespace = getattr(embeddings, "model_id", type(embeddings).__name__)
+    truncation = (getattr(embeddings, "params", None) or {}).get(EmbedTextParamsMetaNames.TRUNCATE_INPUT_TOKENS)
+    # The original truncation keeps the namespace it always had, so existing caches stay valid
+    if truncation is not None and truncation != 3:
+        namespace = f"{namespace}:truncate={truncation}"
+    return namespace
+
+
 class RetrieverBuilder:
-    def __init__(self):
-        """Initialize the retriever builder with embeddings."""
-        embed_params = {
-            EmbedTextParamsMetaNames.TRUNCATE_INPUT_TOKENS: 3,
-            EmbedTextParamsMetaNames.RETURN_OPTIONS: {"input_text": True},
-        }
-
-        watsonx_embedding = WatsonxEmbeddings(
-            model_id="ibm/slate-125m-english-rtrvr",
-            url="https://us-south.ml.cloud.ibm.com",
-            project_id="skills-network",
-            params=embed_params
-        )
-        self.embeddings = watsonx_embedding
+    def __init__(self, embeddings=None):
+        """
+        Initialize the retriever builder with WatsonX embeddings, or with
+        `embeddings` when a stand-in Embeddings implementation is injected.
+
+        `question_embeddings` embeds whole questions for the answer cache: the
+        retrieval embedder keeps only the first few input tokens, so questions
+        sharing an opening would look identical to the cache.
+        """
+        if embeddings is None:
+            self.embeddings = self._cached(watsonx_embeddings(truncate_input_tokens=3))
+            self.question_embeddings = self._cached(watsonx_embeddings(truncate_input_tokens=512))
+        else:
+            self.embeddings = self.question_embeddings = self._cached(embeddings)
+
+        # Tokenized once per chunk and persisted next to the Chroma store
+        self.bm25_index = BM25Index(settings.BM25_INDEX_PATH, max_chunks=settings.BM25_INDEX_MAX_CHUNKS) if settings.BM25_SPARSE_INDEX else None
         
+    @staticmethod
+    def _cached(embeddings):
+        if not settings.EMBEDDING_CACHE_ENABLED:
+            return embeddings
+        # Serve repeated documents and questions without calling WatsonX
+        return CachedEmbeddings(
+            embeddings,
+            cache_path=settings.EMBEDDING_CACHE_PATH,
+            namespace=embedding_namespace(embeddings),
+            memory_items=settings.EMBEDDING_CACHE_MEMORY_ITEMS,
+            max_bytes=settings.EMBEDDING_CACHE_MAX_BYTES
+        )
+
     def build_hybrid_retriever(self, docs):
         """Build a hybrid retriever using BM25 and vector-based retrieval."""
         try:
-            # Create Chroma vector store
-            vector_store = Chroma.from_documents(
-                documents=docs,
-                embedding=self.embeddings,
-                persist_directory=settings.CHROMA_DB_PATH
-            )
-            logger.info("Vector store created successfully.")
-            
+            for doc in docs:
+                chunk_id(doc)
+
+            with tracer.span("vector_index", chunks=len(docs)) as span:
+                if settings.CHROMA_INCREMENTAL_INDEX:
+                    vector_retriever, new_chunks = self._build_incremental_vector_retriever(docs)
+                else:
+                    # Create Chroma vector store
+                    vector_store = Chroma.from_documents(
+                        documents=docs,
+                        embedding=self.embeddings,
+                        persist_directory=settings.CHROMA_DB_PATH
+                    )
+                    logger.info("Vector store created successfully.")
+
+                    # Create vector-based retriever
+                    vector_retriever = vector_store.as_retriever(search_kwargs={"k": settings.VECTOR_SEARCH_K})
+                    logger.info("Vector retriever created successfully.")
+                    new_chunks = len(docs)
+                span.set(new_chunks=new_chunks)
+
             # Create BM25 retriever
-            bm25 = BM25Retriever.from_documents(docs)
+            with tracer.span("bm25_build", chunks=len(docs)) as span:
+                if self.bm25_index is not None:
+                    span.set(new_chunks=self.bm25_index.add(docs))
+                    bm25 = self.bm25_index.retriever(docs, k=settings.BM25_SEARCH_K)
+                else:
+                    bm25 = BM25Retriever.from_documents(docs, k=settings.BM25_SEARCH_K)
             logger.info("BM25 retriever created successfully.")
             
-            # Create vector-based retriever
-            vector_retriever = vector_store.as_retriever(search_kwargs={"k": settings.VECTOR_SEARCH_K})
-            logger.info("Vector retriever created successfully.")
-            
-            # Combine retrievers into a hybrid retriever
-            hybrid_retriever = EnsembleRetriever(
+            # Combine retrievers into a hybrid retriever, searched concurrently
+            hybrid_retriever = HybridRetriever(
                 retrievers=[bm25, vector_retriever],
-                weights=settings.HYBRID_RETRIEVER_WEIGHTS
+                weights=settings.HYBRID_RETRIEVER_WEIGHTS,
+                documents=docs,
+                k=settings.HYBRID_RETRIEVER_K,
+                c=settings.HYBRID_RRF_C
             )
             logger.info("Hybrid retriever created successfully.")
             return hybrid_retriever
         except Exception as e:
             logger.error(f"Failed to build hybrid retriever: {e}")
-            raise
\ No newline at end of file
+            raise
+
+    def _build_incremental_vector_retriever(self, docs):
+        """
+        Add only unseen chunks to the persisted Chroma collection and return
+        a retriever restricted to the chunks of the current upload set, with
+        the number of chunks that had to be embedded.
+
+        Each chunk is stored once. Belonging to a document set is a boolean
+        metadata key on its chunks, named after a hash of the set's chunk IDs,
+        so queries filter on that one key instead of listing chunk IDs.
+        """
+        vector_store = Chroma(
+            collection_name=settings.CHROMA_COLLECTION_NAME,
+            embedding_function=self.embeddings,
+            persist_directory=settings.CHROMA_DB_PATH
+        )
+        # Chroma rejects requests larger than this
+        batch_size = vector_store._client.get_max_batch_size()
+
+        docs_by_id = {chunk_id(doc): doc for doc in docs}
+        ids = list(docs_by_id)
+        set_key = document_set_field(ids)
+
+        existing = {}
+        for start in range(0, len(ids), batch_size):
+            found = vector_store.get(ids=ids[start:start + batch_size], include=["metadatas"])
+            existing.update(zip(found["ids"], found["metadatas"]))
+
+        # Stored copies carry the set key; the session's Documents are left as they are
+        new_docs = [
+            Document(page_content=doc.page_content, metadata={**doc.metadata, set_key: True})
+            for doc_id, doc in docs_by_id.items() if doc_id not in existing
+        ]
+        for start in range(0, len(new_docs), batch_size):
+            batch = new_docs[start:start + batch_size]
+            vector_store.add_documents(batch, ids=[doc.metadata["chunk_id"] for doc in batch])
+
+        # Chunks stored for other sets join this one; Chroma merges the new key into their metadata
+        joining = [doc_id for doc_id, metadata in existing.items() if not (metadata or {}).get(set_key)]
+        for start in range(0, len(joining), batch_size):
+            batch = joining[start:start + batch_size]
+            vector_store._collection.update(ids=batch, metadatas=[{set_key: True}] * len(batch))
+
+        logger.info(
+            f"Incremental index: {len(new_docs)} new chunks embedded, "
+            f"{len(existing)} reused from {settings.CHROMA_DB_PATH}."
+        )
+        search_kwargs = {"k": settings.VECTOR_SEARCH_K, "filter": {set_key: True}}
+        return vector_store.as_retriever(search_kwargs=search_kwargs), len(new_docs)
+
+
+def document_set_field(chunk_ids: Iterable[str]) -> str:
+    """Metadata key marking the chunks of one document set, named by its chunk IDs."""
+    digest = hashlib.sha256("\n".join(sorted(chunk_ids)).encode()).hexdigest()
+    return f"set_{digest[:32]}"
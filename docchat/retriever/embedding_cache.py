@@ -0,0 +1,226 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+from langchain_core.embeddings import Embeddings
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+import numpy as np
+from utils.tokens import count_tokens
+from utils.tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Backends whose embed_query is embed_documents([text])[0], so a batch of
+# queries can go through embed_documents in one call
+SYMMETRIC_QUERY_BACKENDS = {
+    "langchain_ibm.embeddings.WatsonxEmbeddings.embed_query",
+    "langchain_openai.embeddings.base.OpenAIEmbeddings.embed_query",
+    "langchain_core.embeddings.fake.DeterministicFakeEmbedding.embed_query",
+}
+QUERY_EMBEDDING_THREADS = 8
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Content-addressed cache in front of another Embeddings implementation.
+
+    Vectors are stored as float32 blobs in a SQLite file keyed by the SHA-256
+    of (namespace, kind, text), with an in-memory LRU in front of it. The disk
+    store is bounded by `max_bytes` and evicts least recently used rows first.
+    Any Embeddings works as the backend, e.g. langchain_core's
+    DeterministicFakeEmbedding for local runs.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cache_path: str,
+        namespace: str = "",
+        memory_items: int = 10000,
+        max_bytes: int = 512 * 1024 * 1024,
+    ):
+        self.embeddings = embeddings
+        self.namespace = namespace
+        self.memory_items = memory_items
+        self.max_bytes = max_bytes
+
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+        Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(cache_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings(last_access)")
+        self._conn.commit()
+        self._disk_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings"
+        ).fetchone()[0]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents, sending only uncached texts to the backend in one batch."""
+        return self._embed_many("doc", texts, self.embeddings.embed_documents)
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, reusing the cached vector for repeated questions."""
+        with tracer.span("embedding", kind="query", texts=1) as span:
+            key = self._key("query", text)
+            vector = self._lookup([key])[0]
+            span.set(cache_hit=vector is not None)
+            if vector is None:
+                span.set(input_tokens=count_tokens(text))
+                vector = self._store({key: self.embeddings.embed_query(text)})[key]
+        return vector.tolist()
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed many queries up front, so later `embed_query` calls for them are
+        cache hits. Uncached texts go to the backend in one `embed_documents`
+        call when its queries and documents are embedded alike; otherwise
+        (asymmetric models) its `embed_query` calls run concurrently.
+        """
+        if self._symmetric_queries():
+            return self._embed_many("query", texts, self.embeddings.embed_documents)
+        return self._embed_many("query", texts, self._embed_each_query)
+
+    def stats(self) -> Dict:
+        """Return hit/miss counters and current cache sizes."""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / total if total else 0.0,
+                "evictions": self._evictions,
+                "memory_items": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def _embed_many(self, kind: str, texts: List[str],
+                    embed: Callable[[List[str]], List[List[float]]]) -> List[List[float]]:
+        with tracer.span("embedding", kind=kind, texts=len(texts)) as span:
+            keys = [self._key(kind, text) for text in texts]
+            vectors = self._lookup(keys)
+
+            missing = {}
+            for key, text, vector in zip(keys, texts, vectors):
+                if vector is None and key not in missing:
+                    missing[key] = text
+            span.set(cache_hit=not missing, embedded=len(missing),
+                     input_tokens=sum(count_tokens(text) for text in missing.values()))
+            if missing:
+                logger.debug(f"Embedding cache: {len(texts) - len(missing)} cached, {len(missing)} sent to backend.")
+                computed = self._store(dict(zip(missing, embed(list(missing.values())))))
+                vectors = [computed[key] if vector is None else vector for key, vector in zip(keys, vectors)]
+
+        return [vector.tolist() for vector in vectors]
+
+    def _symmetric_queries(self) -> bool:
+        embed_query = getattr(type(self.embeddings), "embed_query", None)
+        name = f"{getattr(embed_query, '__module__', '')}.{getattr(embed_query, '__qualname__', '')}"
+        return name in SYMMETRIC_QUERY_BACKENDS
+
+    def _embed_each_query(self, texts: List[str]) -> List[List[float]]:
+        if len(texts) == 1:
+            return [self.embeddings.embed_query(texts[0])]
+        with ThreadPoolExecutor(max_workers=min(QUERY_EMBEDDING_THREADS, len(texts)),
+                                thread_name_prefix="embed-query") as pool:
+            return list(pool.map(self.embeddings.embed_query, texts))
+
+    def _key(self, kind: str, text: str) -> str:
+        return hashlib.sha256(f"{self.namespace}\0{kind}\0{text}".encode()).hexdigest()
+
+    def _lookup(self, keys: List[str], count: bool = True) -> List[Optional[np.ndarray]]:
+        """Resolve keys from memory first, then disk, promoting disk hits into memory."""
+        with self._lock:
+            results: List[Optional[np.ndarray]] = []
+            disk_keys = {}
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                else:
+                    disk_keys[key] = None
+                results.append(vector)
+            disk_keys = list(disk_keys)
+
+            from_disk = {}
+            now = time.time()
+            for start in range(0, len(disk_keys), 500):
+                batch = disk_keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    from_disk[key] = np.frombuffer(blob, dtype=np.float32)
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                    [(now, key) for key, _ in rows]
+                )
+            if from_disk:
+                self._conn.commit()
+
+            for i, key in enumerate(keys):
+                if results[i] is None and key in from_disk:
+                    results[i] = from_disk[key]
+                    self._remember(key, from_disk[key])
+
+            if count:
+                hits = sum(1 for vector in results if vector is not None)
+                self._hits += hits
+                self._misses += len(results) - hits
+            return results
+
+    def _store(self, vectors: Dict[str, List[float]]) -> Dict[str, np.ndarray]:
+        """Persist freshly computed vectors and return them as float32 arrays."""
+        arrays = {key: np.asarray(vector, dtype=np.float32) for key, vector in vectors.items()}
+        with self._lock:
+            now = time.time()
+            for key, array in arrays.items():
+                blob = array.tobytes()
+                # A concurrent miss may have stored the same text already; only new rows add bytes
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)", (key, blob, now)
+                )
+                if cursor.rowcount == 1:
+                    self._disk_bytes += len(blob)
+                self._remember(key, array)
+            self._conn.commit()
+            self._evict_disk()
+        return arrays
+
+    def _remember(self, key: str, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self) -> None:
+        """Delete least recently used rows until the store fits in max_bytes."""
+        while self._disk_bytes > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_access LIMIT 256"
+            ).fetchall()
+            if not rows:
+                self._disk_bytes = 0
+                break
+            evicted = []
+            for key, size in rows:
+                if self._disk_bytes <= self.max_bytes:
+                    break
+                evicted.append((key,))
+                self._memory.pop(key, None)
+                self._disk_bytes -= size
+                self._evictions += 1
+            self._conn.executemany("DELETE FROM embeddings WHERE key = ?", evicted)
+        self._conn.commit()
@@ -0,0 +1,131 @@
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+import numpy as np
+from langchain.schema import Document
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict, PrivateAttr
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Shared by every HybridRetriever; each query submits one task per sub-retriever
+_search_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hybrid-search")
+
+
+def chunk_id(doc: Document) -> str:
+    """Return the chunk's content hash, computing it if the processor did not."""
+    if "chunk_id" not in doc.metadata:
+        doc.metadata["chunk_id"] = hashlib.sha256(doc.page_content.encode()).hexdigest()
+    return doc.metadata["chunk_id"]
+
+
+def widen_retriever(retriever: BaseRetriever, factor: int) -> BaseRetriever:
+    """Copy of `retriever` returning `factor` times as many results, when it exposes a k."""
+    if isinstance(retriever, HybridRetriever):
+        return retriever.widened(factor)
+    search_kwargs = getattr(retriever, "search_kwargs", None)
+    if isinstance(search_kwargs, dict) and "k" in search_kwargs:
+        return retriever.model_copy(update={"search_kwargs": {**search_kwargs, "k": search_kwargs["k"] * factor}})
+    if isinstance(getattr(retriever, "k", None), int):
+        return retriever.model_copy(update={"k": retriever.k * factor})
+    return retriever
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Weighted reciprocal-rank fusion of several retrievers over a fixed chunk set.
+
+    Sub-retrievers are queried concurrently. Their results are mapped to
+    positions in `documents` by chunk ID, and each chunk scores
+    sum(weight / (rank + c)) as in LangChain's EnsembleRetriever. The fused
+    scores are computed with NumPy. The `k` best chunks are returned with their
+    score in metadata["score"]. Results whose chunk is not in `documents` are
+    ignored.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    retrievers: List[BaseRetriever]
+    weights: List[float]
+    documents: List[Document]
+    k: int = 10
+    c: int = 60
+
+    _positions: Dict[str, int] = PrivateAttr(default_factory=dict)
+
+    def model_post_init(self, __context) -> None:
+        if len(self.weights) != len(self.retrievers):
+            raise ValueError("HybridRetriever needs one weight per retriever")
+        self._positions = {chunk_id(doc): i for i, doc in enumerate(self.documents)}
+
+    def widened(self, factor: int) -> "HybridRetriever":
+        """A copy returning `factor` times as many chunks, from each sub-retriever and after fusion."""
+        return self.model_copy(update={
+            "k": self.k * factor,
+            "retrievers": [widen_retriever(retriever, factor) for retriever in self.retrievers]
+        })
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        futures = [
+            _search_pool.submit(retriever.invoke, query, config={"callbacks": run_manager.get_child(f"retriever_{i + 1}")})
+            for i, retriever in enumerate(self.retrievers)
+        ]
+        return self.fuse([future.result() for future in futures])
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun) -> List[Document]:
+        results = await asyncio.gather(*(
+            retriever.ainvoke(query, config={"callbacks": run_manager.get_child(f"retriever_{i + 1}")})
+            for i, retriever in enumerate(self.retrievers)
+        ))
+        return self.fuse(list(results))
+
+    def fuse(self, results: List[List[Document]]) -> List[Document]:
+        """Combine ranked result lists into the top `k` chunks by weighted RRF score."""
+        positions, contributions = [], []
+        for weight, docs in zip(self.weights, results):
+            ids = self._to_positions(docs)
+            if ids is None:
+                continue
+            ranks = np.arange(1, len(docs) + 1, dtype=np.float64)
+            known = ids >= 0
+            positions.append(ids[known])
+            contributions.append(weight / (ranks[known] + self.c))
+        if not positions:
+            return []
+
+        positions = np.concatenate(positions)
+        contributions = np.concatenate(contributions)
+        # Sum the contributions per chunk; np.unique keeps this O(results), not O(corpus)
+        unique, first_seen, inverse = np.unique(positions, return_index=True, return_inverse=True)
+        scores = np.bincount(inverse, weights=contributions)
+        # Ties keep the order chunks first appear in the result lists, as EnsembleRetriever does
+        order = np.lexsort((first_seen, -scores))[:self.k]
+
+        # Scores go on copies since the corpus Documents are shared across queries.
+        # model_construct skips pydantic validation, which would dominate fusion time.
+        fused = []
+        for index in order:
+            doc = self.documents[unique[index]]
+            fused.append(Document.model_construct(
+                id=doc.id,
+                page_content=doc.page_content,
+                metadata={**doc.metadata, "score": float(scores[index])}
+            ))
+        return fused
+
+    def _to_positions(self, docs: List[Document]) -> Optional[np.ndarray]:
+        if not docs:
+            return None
+        positions = self._positions
+        ids = np.fromiter(
+            (positions.get(chunk_id(doc), -1) for doc in docs),
+            dtype=np.int64,
+            count=len(docs)
+        )
+        missing = int((ids < 0).sum())
+        if missing:
+            logger.debug(f"Ignoring {missing} retrieved chunks outside the current document set.")
+        return ids
@@ -0,0 +1,128 @@
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# In-memory copies per chunk: the Document itself, BM25's tokenized corpus and index
+_BYTES_PER_TEXT_BYTE = 3
+
+
+def estimate_retriever_bytes(docs: List) -> int:
+    """Rough in-memory footprint of a hybrid retriever built over `docs`."""
+    return sum(len(doc.page_content.encode("utf-8")) for doc in docs) * _BYTES_PER_TEXT_BYTE
+
+
+@dataclass
+class _Entry:
+    retriever: Any
+    size: int
+    refs: int = 0
+
+
+@dataclass
+class _Build:
+    done: threading.Event = field(default_factory=threading.Event)
+    error: Optional[BaseException] = None
+
+
+class RetrieverPool:
+    """
+    Process-wide pool of hybrid retrievers keyed by the uploaded files' hashes.
+
+    Sessions `acquire` a retriever for their document set and `release` it when
+    they move on. Concurrent requests for a set that is being built wait for
+    that single build. Unreferenced retrievers are evicted least recently used
+    first once the pool exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[FrozenSet[str], _Entry]" = OrderedDict()
+        self._building: Dict[FrozenSet[str], _Build] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._builds = 0
+        self._waits = 0
+        self._evictions = 0
+
+    def acquire(self, key: FrozenSet[str], build: Callable[[], Tuple[Any, int]]):
+        """
+        Return the retriever for `key`, building it with `build` if needed.
+
+        `build` returns (retriever, estimated_bytes). Every successful call must
+        be paired with a `release(key)`.
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry.refs += 1
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return entry.retriever
+
+                pending = self._building.get(key)
+                owner = pending is None
+                if owner:
+                    pending = self._building[key] = _Build()
+                else:
+                    self._waits += 1
+
+            if not owner:
+                logger.info("Waiting for an in-flight retriever build of the same documents.")
+                pending.done.wait()
+                if pending.error is not None:
+                    raise pending.error
+                continue
+
+            try:
+                retriever, size = build()
+            except BaseException as e:
+                with self._lock:
+                    del self._building[key]
+                    pending.error = e
+                pending.done.set()
+                raise
+
+            with self._lock:
+                self._entries[key] = _Entry(retriever=retriever, size=size, refs=1)
+                del self._building[key]
+                self._builds += 1
+                self._evict()
+            pending.done.set()
+            return retriever
+
+    def release(self, key: FrozenSet[str]) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.refs > 0:
+                entry.refs -= 1
+                self._evict()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": sum(entry.size for entry in self._entries.values()),
+                "max_bytes": self.max_bytes,
+                "in_use": sum(1 for entry in self._entries.values() if entry.refs),
+                "hits": self._hits,
+                "builds": self._builds,
+                "waits": self._waits,
+                "evictions": self._evictions,
+            }
+
+    def _evict(self) -> None:
+        """Drop unreferenced retrievers, oldest first, until within budget. Caller holds the lock."""
+        total = sum(entry.size for entry in self._entries.values())
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            entry = self._entries[key]
+            if entry.refs == 0:
+                del self._entries[key]
+                total -= entry.size
+                self._evictions += 1
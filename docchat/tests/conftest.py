@@ -0,0 +1,8 @@
+import os
+import sys
+from pathlib import Path
+
+# docchat runs from its own directory and imports its packages top-level
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+# Required by config.settings; no test calls OpenAI
+os.environ.setdefault("OPENAI_API_KEY", "test")
@@ -0,0 +1,117 @@
+import json
+import random
+
+import numpy as np
+import pytest
+from langchain.schema import Document
+from langchain_community.retrievers import BM25Retriever
+
+from retriever.bm25_index import BM25Index
+
+WORDS = [f"term{i}" for i in range(200)]
+QUERIES = ["term1 term2 term3", "term7 term7 term150", "term42", "absent words only", "term0 term199 doc5"]
+
+
+def make_docs(count: int, tag: str, seed: int = 0):
+    rng = random.Random(f"{tag}:{seed}")
+    return [
+        Document(page_content=" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 40))) + f" {tag}{i}")
+        for i in range(count)
+    ]
+
+
+def reference_scores(docs, query):
+    return BM25Retriever.from_documents(docs).vectorizer.get_scores(query.split())
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    return str(tmp_path / "bm25")
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_scores_match_bm25_retriever(index_path, query):
+    docs = make_docs(120, "doc")
+    retriever = BM25Index(index_path).retriever(docs, k=10)
+    np.testing.assert_allclose(retriever.get_scores(query), reference_scores(docs, query))
+
+
+@pytest.mark.parametrize("query", QUERIES[:3])
+def test_top_k_matches_bm25_retriever(index_path, query):
+    docs = make_docs(120, "doc")
+    results = BM25Index(index_path).retriever(docs, k=10).invoke(query)
+    expected = sorted(reference_scores(docs, query), reverse=True)[:10]
+    scores = reference_scores(docs, query)
+    by_content = {doc.page_content: i for i, doc in enumerate(docs)}
+    np.testing.assert_allclose([scores[by_content[doc.page_content]] for doc in results], expected)
+
+
+def test_round_trip_through_disk(index_path):
+    first, second = make_docs(60, "a"), make_docs(40, "b")
+    index = BM25Index(index_path)
+    assert index.add(first) == 60
+    assert index.add(second + first[:5]) == 40
+    assert index.add(first) == 0
+
+    reloaded = BM25Index(index_path)
+    assert len(reloaded) == 100
+    assert reloaded.chunk_ids == index.chunk_ids
+    assert reloaded.vocabulary == index.vocabulary
+    # Nothing is re-tokenized for chunks already on disk
+    assert reloaded.add(first + second) == 0
+    for query in QUERIES:
+        np.testing.assert_allclose(reloaded.retriever(second).get_scores(query), reference_scores(second, query))
+
+
+def test_segments_are_merged(index_path, tmp_path):
+    index = BM25Index(index_path, max_segments=3)
+    docs = make_docs(50, "doc")
+    for start in range(0, 50, 10):
+        index.add(docs[start:start + 10])
+    with open(tmp_path / "bm25" / "manifest.json") as f:
+        manifest = json.load(f)
+    assert len(manifest["segments"]) <= 3
+    segment_files = {path.name.split(".")[0] for path in (tmp_path / "bm25").glob("segment-*")}
+    assert segment_files == set(manifest["segments"])
+    assert len(BM25Index(index_path)) == 50
+
+
+def test_other_format_version_is_rebuilt(index_path, tmp_path):
+    BM25Index(index_path).add(make_docs(10, "doc"))
+    manifest_path = tmp_path / "bm25" / "manifest.json"
+    manifest = json.loads(manifest_path.read_text())
+    manifest["version"] = BM25Index.FORMAT_VERSION + 1
+    manifest_path.write_text(json.dumps(manifest))
+    assert len(BM25Index(index_path)) == 0
+
+
+def test_uncommitted_segment_is_ignored(index_path, tmp_path):
+    index = BM25Index(index_path)
+    index.add(make_docs(10, "a"))
+    manifest = (tmp_path / "bm25" / "manifest.json").read_text()
+    index.add(make_docs(10, "b"))
+    # A crash before the manifest was replaced leaves the new segment unreferenced
+    (tmp_path / "bm25" / "manifest.json").write_text(manifest)
+    assert len(BM25Index(index_path)) == 10
+
+
+def test_prunes_least_recently_used_chunks(index_path):
+    a, b, c = make_docs(40, "a"), make_docs(40, "b"), make_docs(40, "c")
+    index = BM25Index(index_path, max_chunks=110)
+    index.add(a)
+    index.add(b)
+    old_retriever = index.retriever(a)  # Uses a again, so b is now the least recently used
+    index.add(c)
+
+    # Pruned to 3/4 of the bound, taking only chunks of b
+    assert len(index) == 110 * 3 // 4
+    indexed = set(index.chunk_ids)
+    assert all(doc.metadata["chunk_id"] in indexed for doc in a + c)
+    assert sum(doc.metadata["chunk_id"] in indexed for doc in b) == len(index) - 80
+    # Retrievers built before pruning keep scoring against their own vocabulary
+    np.testing.assert_allclose(old_retriever.get_scores("term1 term2"), reference_scores(a, "term1 term2"))
+    np.testing.assert_allclose(index.retriever(c).get_scores("term1 term2"), reference_scores(c, "term1 term2"))
+    # Pruned chunks come back when they are used again
+    missing = [doc for doc in b if doc.metadata["chunk_id"] not in indexed]
+    assert index.add(missing[:5]) == 5
+    assert len(BM25Index(index_path, max_chunks=110)) == len(index) == 87
@@ -0,0 +1,177 @@
+import hashlib
+import os
+import pickle
+import time
+
+import pytest
+from langchain.schema import Document
+
+from document_processor.cache_manager import CacheManager
+from document_processor.chunk_store import ChunkStore, write_chunk_store
+
+CHUNKS = [
+    Document(page_content="First section text.", metadata={"Header 1": "Intro"}),
+    Document(page_content="Zweiter Abschnitt, non-ASCII: äöü ß 漢字", metadata={"Header 1": "Body", "Header 2": "Détails"}),
+    Document(page_content="", metadata={}),
+]
+
+
+def write_entry(path, size: int, accessed: float):
+    path.write_bytes(b"x" * size)
+    os.utime(path, (accessed, accessed))
+
+
+def test_chunk_store_round_trip(tmp_path):
+    path = tmp_path / "doc.chunks"
+    write_chunk_store(path, CHUNKS, timestamp=1234.5)
+    store = ChunkStore(path)
+
+    assert len(store) == 3
+    assert store.timestamp == 1234.5
+    assert [doc.page_content for doc in store] == [doc.page_content for doc in CHUNKS]
+    assert [doc.metadata for doc in store] == [doc.metadata for doc in CHUNKS]
+    assert store[-1].page_content == ""
+    assert [doc.page_content for doc in store[1:]] == [doc.page_content for doc in CHUNKS[1:]]
+    assert store.chunk_hash(1) == hashlib.sha256(CHUNKS[1].page_content.encode()).hexdigest()
+    with pytest.raises(IndexError):
+        store[3]
+
+
+def test_chunk_store_rejects_truncated_and_foreign_files(tmp_path):
+    empty = tmp_path / "empty.chunks"
+    empty.write_bytes(b"")
+    with pytest.raises(ValueError):
+        ChunkStore(empty)
+    foreign = tmp_path / "foreign.chunks"
+    foreign.write_bytes(b"NOPE" + b"\0" * 64)
+    with pytest.raises(ValueError):
+        ChunkStore(foreign)
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    now = time.time()
+    for age, name in enumerate(["newest", "middle", "oldest"]):
+        write_entry(tmp_path / f"{name}.chunks", 100, now - 100 * (age + 1))
+    cache = CacheManager(tmp_path, max_bytes=250, expire_days=7)
+
+    write_entry(tmp_path / "new.chunks", 100, now)
+    cache.record(tmp_path / "new.chunks")
+
+    remaining = {path.name for path in tmp_path.iterdir()}
+    assert remaining == {"newest.chunks", "new.chunks"}
+    assert cache.stats()["evictions"] == 2
+    assert cache.stats()["bytes"] <= 250
+
+
+def test_cache_never_evicts_the_entry_just_recorded(tmp_path):
+    cache = CacheManager(tmp_path, max_bytes=50, expire_days=7)
+    write_entry(tmp_path / "big.chunks", 100, time.time() - 1000)
+    cache.record(tmp_path / "big.chunks")
+    assert (tmp_path / "big.chunks").exists()
+
+
+def test_touch_protects_an_entry_from_eviction(tmp_path):
+    now = time.time()
+    write_entry(tmp_path / "old.chunks", 100, now - 500)
+    write_entry(tmp_path / "recent.chunks", 100, now - 100)
+    cache = CacheManager(tmp_path, max_bytes=250, expire_days=7)
+
+    assert cache.is_valid(tmp_path / "old.chunks")
+    write_entry(tmp_path / "new.chunks", 100, now)
+    cache.record(tmp_path / "new.chunks")
+    assert (tmp_path / "old.chunks").exists()
+    assert not (tmp_path / "recent.chunks").exists()
+
+
+def test_expired_entries_are_invalid_and_removed(tmp_path):
+    path = tmp_path / "stale.chunks"
+    path.write_bytes(b"x")
+    eight_days_ago = time.time() - 8 * 24 * 60 * 60
+    os.utime(path, (eight_days_ago, eight_days_ago))
+    cache = CacheManager(tmp_path, max_bytes=1000, expire_days=7)
+
+    assert not cache.is_valid(path)
+    assert not path.exists()
+    assert not cache.is_valid(tmp_path / "missing.chunks")
+    assert cache.stats()["misses"] == 2
+
+
+def test_sweep_removes_old_temp_files_and_enforces_budget(tmp_path):
+    now = time.time()
+    temp = tmp_path / "partial.chunks.tmp"
+    temp.write_bytes(b"x")
+    os.utime(temp, (now - 2 * 60 * 60, now - 2 * 60 * 60))
+    cache = CacheManager(tmp_path, max_bytes=100, expire_days=7)
+    write_entry(tmp_path / "a.chunks", 80, now - 10)
+    write_entry(tmp_path / "b.chunks", 80, now)
+
+    cache.sweep()
+    assert {path.name for path in tmp_path.iterdir()} == {"b.chunks"}
+
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    pytest.importorskip("docling")
+    from config.settings import settings
+    from document_processor.file_handler import DocumentProcessor
+
+    monkeypatch.setattr(settings, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(settings, "CONVERSION_WORKERS", 1)
+    monkeypatch.setattr(settings, "CHUNK_MAX_TOKENS", 8)
+    monkeypatch.setattr(settings, "CHUNK_OVERLAP_TOKENS", 0)
+    processor = DocumentProcessor()
+    processor._submit = lambda file: pytest.fail(f"{file.name} was converted instead of read from the cache")
+    return processor
+
+
+@pytest.fixture
+def upload(tmp_path):
+    path = tmp_path / "report.md"
+    path.write_text("# Report\n\nSome content.")
+    return str(path)
+
+
+LONG_SECTION = Document(
+    page_content=" ".join(f"word{i}" for i in range(40)),
+    metadata={"Header 1": "Report"}
+)
+
+
+def sha256_of(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def test_pickled_entry_is_migrated_to_a_split_chunk_store(processor, upload):
+    legacy = processor.cache_dir / f"{sha256_of(upload)}.pkl"
+    with open(legacy, "wb") as f:
+        pickle.dump({"chunks": [LONG_SECTION], "timestamp": time.time()}, f)
+    processor.cache.record(legacy)
+
+    chunks = processor.process([upload])
+
+    assert len(chunks) > 1
+    assert all(chunk.metadata["Header 1"] == "Report" for chunk in chunks)
+    assert not legacy.exists()
+    assert [path.suffix for path in processor.cache_dir.iterdir()] == [".chunks"]
+    # The second run loads the migrated entry directly
+    assert [chunk.page_content for chunk in processor.process([upload])] == [chunk.page_content for chunk in chunks]
+
+
+def test_header_entry_is_migrated_keeping_its_age(processor, upload):
+    header_entry = processor.cache_dir / f"{sha256_of(upload)}.chunks"
+    write_chunk_store(header_entry, [LONG_SECTION], time.time())
+    written = time.time() - 3600
+    os.utime(header_entry, (written, written))
+
+    chunks = processor.process([upload])
+
+    assert len(chunks) > 1
+    assert not header_entry.exists()
+    migrated = processor._cache_path(processor_file(upload))
+    assert migrated.stat().st_mtime == pytest.approx(written)
+
+
+def processor_file(path: str):
+    from document_processor.file_descriptor import describe_files
+    return describe_files([path])[0]
@@ -0,0 +1,57 @@
+import hashlib
+import random
+
+import pytest
+from langchain.retrievers import EnsembleRetriever
+from langchain.schema import Document
+
+from benchmarks.fakes import RankedRetriever
+from retriever.hybrid import HybridRetriever
+
+
+def corpus(size: int):
+    return [
+        Document(page_content=f"passage {i}", metadata={"chunk_id": hashlib.sha256(str(i).encode()).hexdigest()})
+        for i in range(size)
+    ]
+
+
+@pytest.mark.parametrize("weights", [[0.4, 0.6], [0.5, 0.5], [1.0, 0.0]])
+@pytest.mark.parametrize("seed", range(5))
+def test_fuse_orders_like_ensemble_retriever(weights, seed):
+    documents = corpus(500)
+    retrievers = [RankedRetriever(documents=documents, k=40, seed=seed), RankedRetriever(documents=documents, k=40, seed=seed + 100)]
+    ensemble = EnsembleRetriever(retrievers=retrievers, weights=weights, c=60)
+    hybrid = HybridRetriever(retrievers=retrievers, weights=weights, documents=documents, k=80, c=60)
+
+    for query in ("alpha", "beta", "gamma"):
+        expected = [doc.page_content for doc in ensemble.invoke(query)]
+        fused = hybrid.invoke(query)
+        assert [doc.page_content for doc in fused] == expected
+        scores = [doc.metadata["score"] for doc in fused]
+        assert scores == sorted(scores, reverse=True)
+
+
+def test_fuse_keeps_top_k_and_ignores_unknown_chunks():
+    documents = corpus(20)
+    hybrid = HybridRetriever(retrievers=[], weights=[], documents=documents[:10], k=3, c=60)
+    hybrid.weights = [1.0, 1.0]
+    outside = Document(page_content="not in this document set")
+    fused = hybrid.fuse([[documents[4], outside, documents[2]], [documents[2], documents[15]]])
+
+    assert [doc.page_content for doc in fused] == ["passage 2", "passage 4"]
+    assert fused[0].metadata["score"] == pytest.approx(1 / 63 + 1 / 61)
+    # Scores go on copies; the shared corpus documents are untouched
+    assert "score" not in documents[2].metadata
+
+
+def test_fuse_of_empty_results():
+    documents = corpus(5)
+    hybrid = HybridRetriever(retrievers=[], weights=[], documents=documents, k=3)
+    assert hybrid.fuse([]) == []
+
+
+def test_weights_must_match_retrievers():
+    documents = corpus(5)
+    with pytest.raises(ValueError):
+        HybridRetriever(retrievers=[RankedRetriever(documents=documents, k=2)], weights=[0.5, 0.5], documents=documents)
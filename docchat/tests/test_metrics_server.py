@@ -0,0 +1,27 @@
+import socket
+import urllib.request
+
+from config.settings import settings
+from utils.tracing import start_metrics_server
+
+
+def test_metrics_are_off_by_default():
+    assert settings.METRICS_PORT == 0
+
+
+def test_serves_metrics():
+    server = start_metrics_server(0)
+    try:
+        port = server.server_address[1]
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            assert response.status == 200
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_port_in_use_does_not_raise():
+    with socket.socket() as taken:
+        taken.bind(("127.0.0.1", 0))
+        taken.listen()
+        assert start_metrics_server(taken.getsockname()[1]) is None
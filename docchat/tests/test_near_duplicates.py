@@ -0,0 +1,74 @@
+import pytest
+from langchain.schema import Document
+
+from agents.context_packer import ContextPacker
+from document_processor.near_duplicates import NearDuplicateFilter, jaccard, shingles
+
+REPORT = " ".join(f"word{i}" for i in range(300))
+
+
+def test_shingles_ignore_case_and_whitespace():
+    assert shingles("Alpha  beta\nGAMMA delta epsilon") == shingles("alpha beta gamma delta epsilon")
+
+
+@pytest.mark.parametrize("text", ["", "   ", "-----", "| --- | --- |", "***"])
+def test_text_without_words_has_no_shingles(text):
+    assert shingles(text) == set()
+
+
+def test_short_text_is_one_shingle():
+    assert shingles("two words") == {"two words"}
+
+
+def test_jaccard_of_empty_sets_is_zero():
+    assert jaccard(set(), set()) == 0.0
+    assert jaccard({"a"}, set()) == 0.0
+    assert jaccard({"a", "b"}, {"a", "b"}) == 1.0
+
+
+def test_filter_keeps_first_of_each_near_duplicate_group():
+    texts = [REPORT, REPORT.upper(), REPORT + " footer", "something else entirely", REPORT.replace("word150", "changed")]
+    assert NearDuplicateFilter(threshold=0.9).keep(texts) == [0, 3]
+
+
+def test_filter_keeps_every_chunk_without_words():
+    texts = ["-----", "-----", "| --- |", REPORT, "====="]
+    assert NearDuplicateFilter(threshold=0.9).keep(texts) == [0, 1, 2, 3, 4]
+
+
+def test_filter_keeps_chunks_below_threshold():
+    half = " ".join(REPORT.split()[:150])
+    assert NearDuplicateFilter(threshold=0.9).keep([REPORT, half]) == [0, 1]
+
+
+def docs(*texts, scores=None):
+    return [
+        Document(page_content=text, metadata={} if scores is None else {"score": score})
+        for text, score in zip(texts, scores or [None] * len(texts))
+    ]
+
+
+def test_packer_drops_near_duplicates():
+    packed = ContextPacker(token_budget=10_000).pack(docs(REPORT, REPORT.lower(), "unrelated text here"))
+    assert [doc.page_content for doc in packed.documents] == [REPORT, "unrelated text here"]
+    assert packed.duplicate_chunks == 1
+
+
+def test_packer_never_treats_wordless_chunks_as_duplicates():
+    packed = ContextPacker(token_budget=10_000).pack(docs("-----", "| --- | --- |", "====="))
+    assert len(packed.documents) == 3
+    assert packed.duplicate_chunks == 0
+
+
+def test_packer_fills_budget_best_first():
+    texts = ("low score chunk", "high score chunk with more words", "middle score chunk")
+    packer = ContextPacker(token_budget=10)
+    packed = packer.pack(docs(*texts, scores=[0.1, 0.9, 0.5]))
+    assert packed.documents[0].page_content == "high score chunk with more words"
+    assert packed.used_tokens <= 10
+    assert packed.dropped_chunks == 3 - len(packed.documents)
+
+
+def test_packer_with_threshold_above_one_keeps_duplicates():
+    packed = ContextPacker(token_budget=10_000, dedup_threshold=1.01).pack(docs(REPORT, REPORT))
+    assert len(packed.documents) == 2
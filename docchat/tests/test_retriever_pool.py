@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+
+from retriever.pool import RetrieverPool
+
+
+def key(*hashes):
+    return frozenset(hashes)
+
+
+def builder(name: str, size: int, calls: list = None):
+    def build():
+        if calls is not None:
+            calls.append(name)
+        return name, size
+    return build
+
+
+def test_acquire_builds_once_and_counts_references():
+    pool = RetrieverPool(max_bytes=1000)
+    calls = []
+    assert pool.acquire(key("a"), builder("A", 100, calls)) == "A"
+    assert pool.acquire(key("a"), builder("A2", 100, calls)) == "A"
+    assert calls == ["A"]
+    assert pool.stats()["in_use"] == 1
+    assert pool.stats()["hits"] == 1
+
+    pool.release(key("a"))
+    assert pool.stats()["in_use"] == 1
+    pool.release(key("a"))
+    assert pool.stats()["in_use"] == 0
+    # Extra releases are ignored
+    pool.release(key("a"))
+    pool.release(key("unknown"))
+    assert pool.stats()["entries"] == 1
+
+
+def test_referenced_retrievers_are_never_evicted():
+    pool = RetrieverPool(max_bytes=150)
+    pool.acquire(key("a"), builder("A", 100))
+    pool.acquire(key("b"), builder("B", 100))
+    # Over budget, but both are in use
+    assert pool.stats()["entries"] == 2
+
+    pool.release(key("a"))
+    assert pool.stats()["entries"] == 1
+    calls = []
+    assert pool.acquire(key("b"), builder("B2", 100, calls)) == "B"
+    assert calls == []
+
+
+def test_eviction_is_least_recently_used_first():
+    pool = RetrieverPool(max_bytes=250)
+    for name in "abc":
+        pool.acquire(key(name), builder(name.upper(), 100))
+        pool.release(key(name))
+    # c pushed the pool over budget, so a (least recently used) went first
+    assert pool.stats()["entries"] == 2
+    assert pool.stats()["evictions"] == 1
+
+    pool.acquire(key("b"), builder("B2", 100))  # b is now the most recent
+    pool.release(key("b"))
+    calls = []
+    pool.acquire(key("a"), builder("A2", 100, calls))
+    assert calls == ["A2"]
+    pool.release(key("a"))
+    assert pool.acquire(key("b"), builder("B3", 100)) == "B"
+
+
+def test_key_is_order_independent():
+    pool = RetrieverPool(max_bytes=1000)
+    pool.acquire(frozenset(["x", "y"]), builder("XY", 10))
+    assert pool.acquire(frozenset(["y", "x"]), builder("YX", 10)) == "XY"
+
+
+def test_concurrent_requests_share_one_build():
+    pool = RetrieverPool(max_bytes=1000)
+    calls = []
+    started = threading.Event()
+
+    def slow_build():
+        calls.append("build")
+        started.set()
+        time.sleep(0.2)
+        return "R", 10
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(pool.acquire(key("a"), slow_build))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == ["build"]
+    assert results == ["R"] * 4
+    assert pool.stats()["in_use"] == 1
+    assert pool.stats()["builds"] == 1
+
+
+def test_failed_build_is_raised_to_waiters_and_retried():
+    pool = RetrieverPool(max_bytes=1000)
+
+    def failing():
+        raise RuntimeError("conversion failed")
+
+    with pytest.raises(RuntimeError):
+        pool.acquire(key("a"), failing)
+    assert pool.stats()["entries"] == 0
+    assert pool.acquire(key("a"), builder("A", 10)) == "A"
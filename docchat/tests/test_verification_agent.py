@@ -0,0 +1,63 @@
+import pytest
+
+from agents.verification_agent import VerificationAgent
+from benchmarks.fakes import FakeModelInference
+
+
+@pytest.fixture
+def agent():
+    return VerificationAgent(model=FakeModelInference())
+
+
+def reply(supported: str, relevant: str = "Relevant: YES") -> dict:
+    content = "\n".join([supported, "Unsupported Claims: []", "Contradictions: []", relevant, "Additional Details: none"])
+    return {"choices": [{"message": {"role": "assistant", "content": content}}]}
+
+
+@pytest.mark.parametrize("line", [
+    "Supported: YES",
+    "Supported: Yes.",
+    "supported: yes",
+    "**Supported:** YES",
+    "**Supported**: Yes",
+    "- **Supported:** YES, the answer is backed by the context.",
+    "1. Supported: YES",
+    "  Supported :  yes!",
+    "__Supported:__ **YES**",
+])
+def test_supported_formats(agent, line):
+    result = agent._build_result(reply(line), context="")
+    assert result["supported"] is True
+    assert result["relevant"] is True
+
+
+@pytest.mark.parametrize("line", [
+    "Supported: NO",
+    "**Supported:** No.",
+    "Supported: not really",
+    "Supported:",
+    "Unsupported: YES",
+    "Supported: yesterday's figures only",
+])
+def test_unsupported_formats(agent, line):
+    assert agent._build_result(reply(line), context="")["supported"] is False
+
+
+def test_markdown_relevance_and_lists(agent):
+    response = {"choices": [{"message": {"content": (
+        "**Supported:** Yes\n"
+        "**Unsupported Claims:** [revenue grew 10%, 'margins fell']\n"
+        "**Contradictions:** []\n"
+        "**Relevant:** No.\n"
+    )}}]}
+    result = agent._build_result(response, context="")
+    assert result["supported"] is True
+    assert result["relevant"] is False
+    assert result["unsupported_claims"] == ["revenue grew 10%", "margins fell"]
+    assert "**Supported:** YES" in result["verification_report"]
+
+
+def test_missing_fields_default_to_no(agent):
+    result = agent._build_result({"choices": [{"message": {"content": "I cannot verify this."}}]}, context="")
+    assert result["supported"] is False
+    assert result["relevant"] is False
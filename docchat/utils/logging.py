@@ -1,8 +1,30 @@
+import logging
+import sys
 from loguru import logger
+from config.settings import settings
 
+# Top-level packages of the app. Modules are imported from the docchat
+# directory, so their standard-library loggers are named e.g. "agents.workflow"
+APP_PACKAGES = ("agents", "config", "document_processor", "retriever", "utils")
+
+# Both the loguru sinks and the standard-library loggers used by the agents
+# and retrievers honour LOG_LEVEL
+logger.remove()
+logger.add(sys.stderr, level=settings.LOG_LEVEL)
 logger.add(
     "app.log",
+    level=settings.LOG_LEVEL,
     rotation="10 MB",
     retention="30 days",
     format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {message}"
-)
\ No newline at end of file
+)
+
+# Only the app's own loggers get LOG_LEVEL; the root logger is left alone so
+# DEBUG does not also turn on httpx, chromadb or gradio debug output
+_handler = logging.StreamHandler()
+_handler.setFormatter(logging.Formatter("%(asctime)s | %(levelname)s | %(name)s | %(message)s"))
+for _package in APP_PACKAGES:
+    _package_logger = logging.getLogger(_package)
+    _package_logger.setLevel(settings.LOG_LEVEL)
+    _package_logger.addHandler(_handler)
+    _package_logger.propagate = False
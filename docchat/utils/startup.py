@@ -0,0 +1,106 @@
+import importlib
+import sys
+import threading
+import time
+from typing import Callable, Dict, Generic, Iterable, Optional, TypeVar
+from utils.logging import logger
+
+T = TypeVar("T")
+
+
+class Lazy(Generic[T]):
+    """
+    A component built on first use. Concurrent callers wait for the one build;
+    a failed build is retried on the next call.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T]):
+        self.name = name
+        self._factory = factory
+        self._value: Optional[T] = None
+        self._ready = False
+        self._lock = threading.Lock()
+        self.build_seconds: Optional[float] = None
+
+    def get(self) -> T:
+        if self._ready:
+            return self._value
+        with self._lock:
+            if not self._ready:
+                start = time.perf_counter()
+                self._value = self._factory()
+                self.build_seconds = time.perf_counter() - start
+                self._ready = True
+                logger.info(f"Initialized {self.name} in {self.build_seconds:.2f}s")
+        return self._value
+
+    def peek(self) -> Optional[T]:
+        """The component if it has been built, without building it."""
+        return self._value if self._ready else None
+
+
+class StartupReport:
+    """Import and initialization timings collected while the app starts."""
+
+    def __init__(self):
+        self.process_start = time.perf_counter()
+        self.imports: Dict[str, float] = {}
+        self.components: Dict[str, float] = {}
+        self.ui_ready_seconds: Optional[float] = None
+        self.warm_seconds: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def time_imports(self, modules: Iterable[str]) -> None:
+        """
+        Import `modules` in order, recording each one's incremental cost. A module
+        only pays for dependencies not already pulled in by an earlier entry.
+        """
+        for name in modules:
+            already_loaded = name in sys.modules
+            start = time.perf_counter()
+            try:
+                importlib.import_module(name)
+            except ImportError as e:
+                logger.warning(f"Could not import {name} during warm-up: {e}")
+                continue
+            if not already_loaded:
+                with self._lock:
+                    self.imports[name] = time.perf_counter() - start
+
+    def mark_ui_ready(self) -> None:
+        self.ui_ready_seconds = time.perf_counter() - self.process_start
+
+    def warm(self, modules: Iterable[str], components: Iterable[Lazy]) -> None:
+        """Import heavy modules, then build components, recording how long each took."""
+        start = time.perf_counter()
+        self.time_imports(modules)
+        for component in components:
+            try:
+                component.get()
+            except Exception as e:
+                logger.error(f"Warm-up of {component.name} failed: {e}")
+                continue
+            with self._lock:
+                self.components[component.name] = component.build_seconds
+        self.warm_seconds = time.perf_counter() - start
+        logger.info(f"Startup report: {self.as_dict()}")
+
+    def warm_in_background(self, modules: Iterable[str], components: Iterable[Lazy]) -> threading.Thread:
+        thread = threading.Thread(
+            target=self.warm,
+            args=(list(modules), list(components)),
+            name="docchat-warmup",
+            daemon=True
+        )
+        thread.start()
+        return thread
+
+    def as_dict(self) -> Dict:
+        with self._lock:
+            imports = dict(sorted(self.imports.items(), key=lambda item: item[1], reverse=True))
+            return {
+                "ui_ready_seconds": self.ui_ready_seconds,
+                "warm_seconds": self.warm_seconds,
+                "imports": imports,
+                "components": dict(self.components),
+            }
@@ -0,0 +1,23 @@
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken missing or its encoding file unavailable offline
+    _ENCODING = None
+
+
+def count_tokens(text: str) -> int:
+    """Token count with tiktoken when available, else ~4 characters per token."""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def completion_tokens(response: dict) -> int:
+    """Completion tokens of a chat response, from its usage block when the model reports one."""
+    usage = response.get("usage") or {}
+    if isinstance(usage.get("completion_tokens"), int):
+        return usage["completion_tokens"]
+    try:
+        return count_tokens(response["choices"][0]["message"]["content"] or "")
+    except (IndexError, KeyError, TypeError):
+        return 0
@@ -0,0 +1,202 @@
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, Optional
+from config.settings import settings
+from utils.logging import logger
+
+# Upper bounds, in seconds, of the span duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("docchat_span", default=None)
+
+
+class Span:
+    """One timed stage. Attributes ending in `_tokens` and a `cache_hit` flag also feed the metrics."""
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.start = time.time()
+        self.duration: Optional[float] = None
+        self.error: Optional[str] = None
+        self.attributes = dict(attributes)
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class _StageMetrics:
+    def __init__(self):
+        self.buckets = [0] * (len(DURATION_BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self.tokens: Dict[str, float] = defaultdict(int)
+        self.cache = {"hit": 0, "miss": 0}
+
+
+class Tracer:
+    """
+    Records spans for the docchat stages, aggregates them into Prometheus-style
+    metrics and appends them to a JSONL trace file.
+
+    Spans nest through a context variable, so a span opened inside another, in
+    the same thread or asyncio task, shares its trace ID. Work done in other
+    processes is reported afterwards with `record`.
+    """
+
+    def __init__(self, trace_path: str = "", enabled: bool = True):
+        self.enabled = enabled
+        self.trace_path = trace_path
+        self._stages: Dict[str, _StageMetrics] = defaultdict(_StageMetrics)
+        self._lock = threading.Lock()
+        self._trace_file = None
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Span]:
+        span = Span(name, _current_span.get(), attributes)
+        if not self.enabled:
+            yield span
+            return
+
+        token = _current_span.set(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span.error = type(e).__name__
+            raise
+        finally:
+            span.duration = time.perf_counter() - start
+            _current_span.reset(token)
+            self._finish(span)
+
+    def record(self, name: str, duration: float, **attributes) -> None:
+        """Add a span measured elsewhere, e.g. in a worker process, under the current span."""
+        if not self.enabled:
+            return
+        span = Span(name, _current_span.get(), attributes)
+        span.start -= duration
+        span.duration = duration
+        self._finish(span)
+
+    def render_metrics(self) -> str:
+        """Current metrics in the Prometheus text exposition format."""
+        lines = [
+            "# HELP docchat_stage_duration_seconds Duration of docchat pipeline stages.",
+            "# TYPE docchat_stage_duration_seconds histogram",
+        ]
+        with self._lock:
+            stages = sorted(self._stages.items())
+            for stage, metrics in stages:
+                cumulative = 0
+                for bound, count in zip(DURATION_BUCKETS, metrics.buckets):
+                    cumulative += count
+                    lines.append(f'docchat_stage_duration_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'docchat_stage_duration_seconds_bucket{{stage="{stage}",le="+Inf"}} {metrics.count}')
+                lines.append(f'docchat_stage_duration_seconds_sum{{stage="{stage}"}} {metrics.total}')
+                lines.append(f'docchat_stage_duration_seconds_count{{stage="{stage}"}} {metrics.count}')
+
+            lines += ["# HELP docchat_stage_errors_total Stages that raised.", "# TYPE docchat_stage_errors_total counter"]
+            lines += [f'docchat_stage_errors_total{{stage="{stage}"}} {metrics.errors}' for stage, metrics in stages]
+
+            lines += ["# HELP docchat_stage_tokens_total Tokens processed by stage.", "# TYPE docchat_stage_tokens_total counter"]
+            for stage, metrics in stages:
+                for kind, total in sorted(metrics.tokens.items()):
+                    lines.append(f'docchat_stage_tokens_total{{stage="{stage}",kind="{kind}"}} {total}')
+
+            lines += ["# HELP docchat_stage_cache_total Cache lookups by stage and result.", "# TYPE docchat_stage_cache_total counter"]
+            for stage, metrics in stages:
+                if metrics.cache["hit"] or metrics.cache["miss"]:
+                    for result, count in metrics.cache.items():
+                        lines.append(f'docchat_stage_cache_total{{stage="{stage}",result="{result}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def _finish(self, span: Span) -> None:
+        with self._lock:
+            metrics = self._stages[span.name]
+            metrics.count += 1
+            metrics.total += span.duration
+            metrics.errors += span.error is not None
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if span.duration <= bound:
+                    metrics.buckets[i] += 1
+                    break
+            else:
+                metrics.buckets[-1] += 1
+            for key, value in span.attributes.items():
+                if key.endswith("_tokens") and isinstance(value, (int, float)):
+                    metrics.tokens[key[:-len("_tokens")]] += value
+            if isinstance(span.attributes.get("cache_hit"), bool):
+                metrics.cache["hit" if span.attributes["cache_hit"] else "miss"] += 1
+            self._write(span)
+
+    def _write(self, span: Span) -> None:
+        """Append the span to the trace file. Caller holds the lock."""
+        if not self.trace_path:
+            return
+        try:
+            if self._trace_file is None:
+                os.makedirs(os.path.dirname(os.path.abspath(self.trace_path)), exist_ok=True)
+                self._trace_file = open(self.trace_path, "a", encoding="utf-8", buffering=1)
+            self._trace_file.write(json.dumps(span.to_dict(), default=str) + "\n")
+        except OSError as e:
+            logger.error(f"Disabling trace file {self.trace_path}: {e}")
+            self.trace_path = ""
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = tracer.render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes would otherwise be written to stderr
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> Optional[ThreadingHTTPServer]:
+    """
+    Serve `tracer` metrics at http://host:port/metrics from a daemon thread.
+    Returns None, after logging why, if the port cannot be bound.
+    """
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        # Metrics are optional; a taken port must not stop the app from starting
+        logger.warning(f"Metrics disabled: cannot listen on {host}:{port} ({e})")
+        return None
+    threading.Thread(target=server.serve_forever, name="docchat-metrics", daemon=True).start()
+    logger.info(f"Serving metrics at http://{host}:{port}/metrics")
+    return server
+
+
+# Shared by every stage in the process
+tracer = Tracer(trace_path=settings.TRACE_FILE, enabled=settings.TRACING_ENABLED)